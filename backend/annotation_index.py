@@ -0,0 +1,75 @@
+from sqlalchemy import text, column
+
+# Overlap queries for annotations.
+#
+# "Which annotations intersect [start, end]" cannot be answered from a B-tree on
+# start_time alone: every annotation that starts before the window is a
+# candidate. An SQLite R*Tree (annotation_rtree) holds one box per live
+# annotation, (dataset_id, dataset_id) x (start, end) in epoch seconds, and
+# triggers keep it in step with the annotation table, whichever code path
+# writes it. R*Tree coordinates are 32-bit floats rounded outwards, so a box
+# query returns a superset; the exact time comparison on the table rows does
+# the rest. Without the R*Tree module (an SQLite build without RTREE), queries
+# use the (dataset_id, start_time, end_time) index instead.
+
+RTREE = 'annotation_rtree'
+
+# Seconds since 1970 of a stored DATETIME, kept fractional
+_SECONDS = "(julianday({}) - 2440587.5) * 86400.0"
+
+
+def _box(row):
+    start, end = _SECONDS.format(f'{row}.start_time'), _SECONDS.format(f'{row}.end_time')
+    return f"{row}.id, {row}.dataset_id, {row}.dataset_id, MIN({start}, {end}), MAX({start}, {end})"
+
+
+def install(conn, table='annotation'):
+    """Create the R*Tree and its triggers and index rows missing from it (idempotent).
+
+    Returns False when SQLite has no R*Tree module.
+    """
+    try:
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE} USING rtree(id, dataset_min, dataset_max, start_s, end_s)")
+    except Exception as e:
+        if 'no such module' in str(e):
+            return False
+        raise
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS {RTREE}_insert AFTER INSERT ON {table}
+        WHEN new.deleted_at IS NULL BEGIN
+            INSERT INTO {RTREE} SELECT {_box('new')};
+        END""")
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS {RTREE}_update
+        AFTER UPDATE OF dataset_id, start_time, end_time, deleted_at ON {table} BEGIN
+            DELETE FROM {RTREE} WHERE id = old.id;
+            INSERT INTO {RTREE} SELECT {_box('new')} WHERE new.deleted_at IS NULL;
+        END""")
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS {RTREE}_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM {RTREE} WHERE id = old.id;
+        END""")
+    # Annotations written before the R*Tree existed
+    conn.exec_driver_sql(f"""
+        INSERT INTO {RTREE} SELECT {_box(table)} FROM {table}
+        WHERE {table}.deleted_at IS NULL AND {table}.id NOT IN (SELECT id FROM {RTREE})""")
+    return True
+
+
+def epoch_seconds(value):
+    """Seconds since 1970 of a naive datetime, as the R*Tree stores them."""
+    return (value - value.__class__(1970, 1, 1)).total_seconds()
+
+
+def candidate_ids(dataset_id, start=None, end=None):
+    """R*Tree subquery: ids of the dataset's live annotations whose box meets [start, end]."""
+    where = ["dataset_min <= :dataset_id", "dataset_max >= :dataset_id"]
+    params = {'dataset_id': dataset_id}
+    if start is not None:
+        where.append("end_s >= :start_s")
+        params['start_s'] = epoch_seconds(start)
+    if end is not None:
+        where.append("start_s <= :end_s")
+        params['end_s'] = epoch_seconds(end)
+    return text(f"SELECT id FROM {RTREE} WHERE {' AND '.join(where)}").bindparams(**params).columns(column('id'))
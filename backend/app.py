@@ -1,16 +1,40 @@
 import os
-import pandas as pd
-import shutil
+import io
+import base64
+import json
+import csv
+import math
+import time
+import zlib
+import numpy as np
 import threading
-from flask import Flask, request, jsonify
+from collections import namedtuple
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.datastructures import MultiDict
 from datetime import datetime
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
+from storage import EAVStorage, ColumnarStorage, SharedRead, to_datetime64, isoformat_timestamps, EMPTY_TIMESTAMPS, EMPTY_VALUES
+from downsample import downsample, MODES as DOWNSAMPLE_MODES
+from rollup import RollupBuilder, RollupStore, envelope as rollup_envelope, whole_buckets as rollup_whole_buckets
+from cache import ResponseCache
+from metric_stats import MetricStatsBuilder, PERCENTILES
+from jobs import JobQueue, JobLost
+from reclaim import Reclaimer
+import ingest
+import archive
+import wire
+import tiles
+import telemetry
+import annotation_index
+from uploads import UploadStore, UploadError, hash_file
+from sqlite_engines import SQLiteEngines
 
 app = Flask(__name__)
-CORS(app)
+# The annotation list's paging headers must be readable by cross-origin frontends
+CORS(app, expose_headers=['X-Annotation-Revision', 'X-Next-Cursor'])
 
 # Config
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -26,10 +50,64 @@ if not os.path.exists(DATA_DIR):
 
 TEMP_DIR = os.path.join(DATA_DIR, 'temp_chunks')
 UPLOAD_DIR = os.path.join(DATA_DIR, 'uploads')
+COLUMNAR_DIR = os.path.join(DATA_DIR, 'columnar')
+ROLLUP_DIR = os.path.join(DATA_DIR, 'rollups')
 os.makedirs(TEMP_DIR, exist_ok=True)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(COLUMNAR_DIR, exist_ok=True)
+os.makedirs(ROLLUP_DIR, exist_ok=True)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(DATA_DIR, 'dataview.db')
+# Unfinished uploads idle for longer than this are removed from TEMP_DIR
+UPLOAD_EXPIRE_HOURS = float(os.environ.get('UPLOAD_EXPIRE_HOURS', 24))
+# Ingest-while-uploading: clients may ask /api/upload/stream to parse chunks as
+# they arrive; a streamed upload that stalls for STREAM_INGEST_IDLE_SECONDS fails and is dropped
+STREAM_INGEST = os.environ.get('STREAM_INGEST', '').lower() in ('1', 'true', 'yes')
+STREAM_INGEST_IDLE_SECONDS = int(os.environ.get('STREAM_INGEST_IDLE_SECONDS', 600))
+# Ingested uploads are kept for re-ingest, gzip-compressed at UPLOAD_COMPRESS_LEVEL
+# (0 keeps them uncompressed), until older than UPLOAD_RETENTION_DAYS or, oldest
+# first, past UPLOAD_RETENTION_BYTES in total (0: no limit)
+UPLOAD_COMPRESS_LEVEL = int(os.environ.get('UPLOAD_COMPRESS_LEVEL', 1))
+UPLOAD_RETENTION_DAYS = float(os.environ.get('UPLOAD_RETENTION_DAYS', 0))
+UPLOAD_RETENTION_BYTES = int(os.environ.get('UPLOAD_RETENTION_BYTES', 0))
+
+# Storage backend for newly uploaded datasets: 'columnar' or 'eav'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'columnar')
+
+# Ingest jobs: executor ('process' parses on other cores, 'thread' stays in the
+# worker) and the maximum number of jobs running at once across all workers
+INGEST_EXECUTOR = os.environ.get('INGEST_EXECUTOR', 'process')
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+# Files of at least INGEST_PARALLEL_MIN_BYTES are parsed by INGEST_PARSE_WORKERS
+# processes per job (1 disables parallel parsing); by default the cores are
+# shared between the jobs that may run at once
+INGEST_PARSE_WORKERS = int(os.environ.get('INGEST_PARSE_WORKERS', max((os.cpu_count() or 1) // max(INGEST_WORKERS, 1), 1)))
+INGEST_PARALLEL_MIN_BYTES = int(os.environ.get('INGEST_PARALLEL_MIN_BYTES', 64 * 1024 * 1024))
+
+# Response cache for /api/data and /api/stats: in-process LRU plus an optional
+# on-disk tier (RESPONSE_CACHE_DIR) shared by all workers
+RESPONSE_CACHE_BYTES = int(os.environ.get('RESPONSE_CACHE_BYTES', 64 * 1024 * 1024))
+RESPONSE_CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR')
+RESPONSE_CACHE_DISK_BYTES = int(os.environ.get('RESPONSE_CACHE_DISK_BYTES', 1024 * 1024 * 1024))
+RESPONSE_CACHE_MAX_AGE = int(os.environ.get('RESPONSE_CACHE_MAX_AGE', 60))
+
+# SQLite connections for dataset values: a query-only read pool (memory-mapped,
+# larger page cache) and one serialized writer per process. The WAL is checkpointed
+# once it grows past SQLITE_CHECKPOINT_WAL_BYTES (truncated when no ingest runs)
+SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', 8))
+SQLITE_MMAP_BYTES = int(os.environ.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))
+SQLITE_CACHE_KIB = int(os.environ.get('SQLITE_CACHE_KIB', 16384))
+SQLITE_CHECKPOINT_WAL_BYTES = int(os.environ.get('SQLITE_CHECKPOINT_WAL_BYTES', 64 * 1024 * 1024))
+SQLITE_CHECKPOINT_INTERVAL = float(os.environ.get('SQLITE_CHECKPOINT_INTERVAL', 30))
+
+# Deleted datasets disappear at once; their data points are removed in the
+# background, RECLAIM_BATCH_ROWS per write transaction
+RECLAIM_BATCH_ROWS = int(os.environ.get('RECLAIM_BATCH_ROWS', 20000))
+
+# Add a Server-Timing header (db / transform / serialize / sql breakdown) to every response
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+DB_PATH = os.path.join(DATA_DIR, 'dataview.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + DB_PATH
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024 * 1024 * 5  # 5GB max upload
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
@@ -40,11 +118,19 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 }
 
 db = SQLAlchemy(app)
+sqlite = SQLiteEngines(
+    DB_PATH, read_pool_size=SQLITE_READ_POOL_SIZE,
+    mmap_bytes=SQLITE_MMAP_BYTES, cache_kib=SQLITE_CACHE_KIB, journal_size_limit=SQLITE_CHECKPOINT_WAL_BYTES
+)
 
 @event.listens_for(Engine, 'connect')
 def _set_sqlite_pragmas(dbapi_connection, connection_record):
     try:
         cursor = dbapi_connection.cursor()
+        # Lets deletes hand free pages back to the filesystem (sqlite.incremental_vacuum).
+        # Must precede journal_mode on a new database; an existing one keeps its mode
+        # until `init_db.py --vacuum` rewrites it
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
         cursor.execute('PRAGMA journal_mode=WAL')
         cursor.execute('PRAGMA synchronous=NORMAL')
         cursor.execute('PRAGMA busy_timeout=30000')
@@ -52,29 +138,150 @@ def _set_sqlite_pragmas(dbapi_connection, connection_record):
     except Exception:
         pass
 
+# Instrumentation, served by /api/metrics
+metrics_registry = telemetry.Registry()
+request_metrics = telemetry.RequestMetrics(app, Engine, metrics_registry, server_timing=SERVER_TIMING)
+cache_requests = metrics_registry.register(telemetry.Counter(
+    'dataview_response_cache_requests_total', 'Cacheable responses by outcome (hit, miss, not_modified)', ('result',)))
+
 # Models
 class Dataset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='pending') # pending, processing, ready, failed
+    status = db.Column(db.String(20), default='pending') # pending, processing, ready, failed, deleting
+    storage = db.Column(db.String(20), default='eav') # eav, columnar
+    version = db.Column(db.Integer, default=0) # bumped on every (re-)ingest
+    # Background deletion (status 'deleting'): data points to remove and removed so far
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    reclaim_at = db.Column(db.DateTime, nullable=True) # last progress of the worker reclaiming it
+    reclaim_total = db.Column(db.BigInteger, nullable=True)
+    reclaim_done = db.Column(db.BigInteger, default=0)
+    # Last revision handed out to one of its annotations (see /api/annotations/<id>/changes)
+    annotation_revision = db.Column(db.Integer, default=0)
+    # uploads.content_hash() of the uploaded file, to recognise the same file uploaded again
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
     
+    def cache_version(self):
+        # created_at guards against SQLite reusing the id of a deleted dataset
+        return f"{self.created_at.timestamp()}.{self.version or 0}"
+
     def to_dict(self):
-        return {
+        result = {
             'id': self.id,
             'filename': self.filename,
             'created_at': self.created_at.isoformat(),
-            'status': self.status
+            'status': self.status,
+            # Part of /api/tiles URLs: a tile of this version never changes
+            'version': self.cache_version()
         }
+        if self.content_hash:
+            result['content_hash'] = self.content_hash
+        if self.status == 'deleting':
+            result['reclaim'] = {'done': self.reclaim_done or 0, 'total': self.reclaim_total or 0}
+        return result
 
 class DataPoint(db.Model):
+    __table_args__ = (
+        # Covering index: dataset + metric + time range reads come back already in time order
+        db.Index('ix_data_point_dataset_metric_ts', 'dataset_id', 'metric', 'timestamp', 'value'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False, index=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, index=True)
     metric = db.Column(db.String(50), nullable=False)
     value = db.Column(db.Float, nullable=True)
 
+class DatasetMetricStats(db.Model):
+    # Whole-dataset aggregates per metric, computed once during ingest
+    __tablename__ = 'dataset_metric_stats'
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False, index=True)
+    metric = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    null_count = db.Column(db.Integer, nullable=False, default=0)
+    min = db.Column(db.Float, nullable=True)
+    max = db.Column(db.Float, nullable=True)
+    mean = db.Column(db.Float, nullable=True)
+    std = db.Column(db.Float, nullable=True)
+    first_ts = db.Column(db.DateTime, nullable=True)
+    last_ts = db.Column(db.DateTime, nullable=True)
+    # Approximate percentiles (t-digest)
+    p25 = db.Column(db.Float, nullable=True)
+    p50 = db.Column(db.Float, nullable=True)
+    p75 = db.Column(db.Float, nullable=True)
+    p95 = db.Column(db.Float, nullable=True)
+    p99 = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'metric': self.metric,
+            'min': self.min,
+            'max': self.max,
+            'avg': self.mean,
+            'count': self.count,
+            'null_count': self.null_count,
+            'std': self.std,
+            'first_timestamp': self.first_ts.isoformat() if self.first_ts else None,
+            'last_timestamp': self.last_ts.isoformat() if self.last_ts else None,
+            'percentiles': {f'p{p}': getattr(self, f'p{p}') for p in PERCENTILES}
+        }
+
+class IngestJob(db.Model):
+    # One CSV ingest; rows survive worker restarts so interrupted jobs can be re-queued
+    __tablename__ = 'ingest_job'
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False, index=True)
+    file_path = db.Column(db.String(500), nullable=False)
+    upload_id = db.Column(db.String(200), nullable=True) # set while the file is still being uploaded
+    status = db.Column(db.String(20), default='queued', index=True) # queued, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    worker = db.Column(db.String(50), nullable=True) # token of the dispatcher running it
+    error = db.Column(db.String(500), nullable=True)
+    rows_ingested = db.Column(db.Integer, default=0)
+    points_ingested = db.Column(db.BigInteger, default=0)
+    phase_seconds = db.Column(db.Text, nullable=True) # JSON: ingest time per phase (parse, write, rollup, stats)
+    time_options = db.Column(db.Text, nullable=True) # JSON: user overrides of the time column, format and timezone
+    time_format = db.Column(db.String(100), nullable=True) # format the time column was parsed with
+    rows_dropped = db.Column(db.BigInteger, default=0) # rows skipped for an unparseable timestamp
+    bytes_read = db.Column(db.BigInteger, default=0)
+    total_bytes = db.Column(db.BigInteger, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        progress = min(self.bytes_read / self.total_bytes, 1.0) if self.total_bytes else 0
+        eta_seconds = None
+        if self.status == 'running' and self.started_at and 0 < progress < 1:
+            elapsed = ((self.heartbeat_at or datetime.utcnow()) - self.started_at).total_seconds()
+            eta_seconds = round(elapsed * (1 - progress) / progress, 1)
+        return {
+            'id': self.id,
+            'dataset_id': self.dataset_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'rows_ingested': self.rows_ingested,
+            'rows_dropped': self.rows_dropped or 0,
+            'time_format': self.time_format,
+            'bytes_read': self.bytes_read,
+            'total_bytes': self.total_bytes,
+            'progress': 1.0 if self.status == 'done' else round(progress, 4),
+            'eta_seconds': eta_seconds,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class Annotation(db.Model):
+    __table_args__ = (
+        # Time-ordered pages of a dataset's annotations; overlap queries without the R*Tree
+        db.Index('ix_annotation_dataset_start_end', 'dataset_id', 'start_time', 'end_time'),
+        # Delta fetches: everything changed after a revision
+        db.Index('ix_annotation_dataset_revision', 'dataset_id', 'revision'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False, index=True)
     start_time = db.Column(db.DateTime, nullable=False)
@@ -83,6 +290,8 @@ class Annotation(db.Model):
     status = db.Column(db.String(50), default='info')
     color = db.Column(db.String(20), default='#1890ff')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    revision = db.Column(db.Integer, default=0) # dataset's annotation_revision when last changed
+    deleted_at = db.Column(db.DateTime, nullable=True) # tombstone, so delta fetches see deletes
 
     def to_dict(self):
         return {
@@ -93,90 +302,508 @@ class Annotation(db.Model):
             'content': self.content,
             'status': self.status,
             'color': self.color,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat(),
+            'revision': self.revision or 0
         }
 
-# Helper: Parse CSV (Background Task)
-def process_csv_task(file_path, dataset_id):
+# Storage backends, looked up by Dataset.storage
+STORAGES = {
+    'eav': EAVStorage(DataPoint, sqlite),
+    'columnar': ColumnarStorage(COLUMNAR_DIR)
+}
+
+def get_storage(dataset):
+    return STORAGES.get(dataset.storage or 'eav', STORAGES['eav'])
+
+def get_live_dataset(dataset_id):
+    """The dataset, or None if it does not exist or is being deleted."""
+    dataset = Dataset.query.get(dataset_id)
+    if dataset is None or dataset.status == 'deleting':
+        return None
+    return dataset
+
+# Pre-aggregated rollup levels, shared by every storage backend
+rollups = RollupStore(ROLLUP_DIR)
+
+def save_metric_stats(dataset_id, builder):
+    """Replace the dataset's DatasetMetricStats rows with the builder's results (caller commits)."""
+    DatasetMetricStats.query.filter_by(dataset_id=dataset_id).delete()
+    db.session.add_all(DatasetMetricStats(dataset_id=dataset_id, **row) for row in builder.results())
+
+response_cache = ResponseCache(RESPONSE_CACHE_BYTES, RESPONSE_CACHE_DIR, RESPONSE_CACHE_DISK_BYTES)
+
+def cached_response(dataset, build, mimetype='application/json'):
+    """Serve build()'s body through the response cache, with ETag / Cache-Control headers.
+
+    Only ready datasets are cached; the key covers the dataset version, path, query
+    string and the content type build() produces.
+    """
+    if dataset.status != 'ready':
+        return build()
+
+    key = response_cache.make_key(dataset.id, dataset.cache_version(), request.path, request.args, mimetype)
+    etag = response_cache.etag(key)
+    if etag in request.if_none_match:
+        cache_requests.inc(result='not_modified')
+        response = Response(status=304)
+    else:
+        body = cached_body(key, build)
+        if isinstance(body, Response):
+            return body
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={RESPONSE_CACHE_MAX_AGE}'
+    return response
+
+def cached_body(key, build):
+    """build()'s body from the response cache, built and stored on a miss (key None: never cached).
+
+    A response other than 200 is returned as is and not cached.
+    """
+    body = response_cache.get(key) if key else None
+    if key:
+        cache_requests.inc(result='miss' if body is None else 'hit')
+    if body is None:
+        response = app.make_response(build())
+        if response.status_code != 200:
+            return response
+        body = response.get_data()
+        if key:
+            response_cache.put(key, body)
+    return body
+
+# Schema: create tables and add columns that older databases are missing
+SCHEMA_UPGRADES = [
+    ('dataset', 'status', "VARCHAR(20) DEFAULT 'ready'"),
+    ('dataset', 'storage', "VARCHAR(20) DEFAULT 'eav'"),
+    ('dataset', 'version', "INTEGER DEFAULT 0"),
+    ('ingest_job', 'upload_id', "VARCHAR(200)"),
+    ('ingest_job', 'points_ingested', "BIGINT DEFAULT 0"),
+    ('ingest_job', 'phase_seconds', "TEXT"),
+    ('dataset', 'deleted_at', "DATETIME"),
+    ('dataset', 'reclaim_at', "DATETIME"),
+    ('dataset', 'reclaim_total', "BIGINT"),
+    ('dataset', 'reclaim_done', "BIGINT DEFAULT 0"),
+    ('ingest_job', 'time_options', "TEXT"),
+    ('ingest_job', 'time_format', "VARCHAR(100)"),
+    ('ingest_job', 'rows_dropped', "BIGINT DEFAULT 0"),
+    ('dataset', 'annotation_revision', "INTEGER DEFAULT 0"),
+    ('annotation', 'revision', "INTEGER DEFAULT 0"),
+    ('annotation', 'deleted_at', "DATETIME"),
+    ('dataset', 'content_hash', "VARCHAR(64)"),
+]
+
+# Whether overlap queries can use the annotation R*Tree (see annotation_index.py)
+annotation_rtree = False
+
+def init_schema():
+    global annotation_rtree
+    db.create_all()
+    with db.engine.begin() as conn:
+        for table, column, ddl in SCHEMA_UPGRADES:
+            columns = [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+            if column not in columns:
+                try:
+                    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+                    print(f"Schema upgrade: added {table}.{column}")
+                except Exception as e:
+                    # Another worker may have added it concurrently
+                    print(f"Schema upgrade of {table}.{column} skipped: {e}")
+    with db.engine.begin() as conn:
+        annotation_rtree = annotation_index.install(conn)
+    if not annotation_rtree:
+        print("SQLite has no R*Tree module: annotation overlap queries use the B-tree index")
+
+# Indexes added to existing tables are built by init_db.py, never by the app:
+# SQLite builds an index in one transaction, so on a large data_point table the
+# (possibly minutes long) build holds the write lock and every ingest and delete
+# waits for it. Workers only check the query plans, in the background, at start.
+OBSOLETE_INDEXES = ['ix_data_point_dataset_id']  # prefix of the composite index
+
+def upgrade_indexes():
+    with app.app_context():
+        with db.engine.begin() as conn:
+            existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            for index in [*DataPoint.__table__.indexes, *Annotation.__table__.indexes, *Dataset.__table__.indexes]:
+                if index.name not in existing:
+                    print(f"Building index {index.name}, this may take a while on large databases...")
+                    index.create(conn, checkfirst=True)
+            for name in OBSOLETE_INDEXES:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+def check_query_plans():
+    # Startup check: the hot EAV queries must be answered from an index
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                for name, plan in STORAGES['eav'].check_query_plans(conn):
+                    app.logger.warning(f"Query plan for '{name}' falls back to a scan or temp B-tree "
+                                       f"(missing indexes are built by init_db.py): {plan}")
+        except Exception as e:
+            print(f"Query plan check failed: {e}")
+
+# Helper: Parse ISO-8601 query arguments ('Z' suffix allowed)
+def parse_time_arg(value):
+    if not value:
+        return None
+    return to_datetime64(datetime.fromisoformat(value.replace('Z', '+00:00')))
+
+def set_dataset_status(dataset_id, status):
+    """Set and commit the dataset's status unless it is being deleted."""
+    Dataset.query.filter(Dataset.id == dataset_id, Dataset.status.is_distinct_from('deleting')).update(
+        {'status': status}, synchronize_session=False)
+    db.session.commit()
+
+# Outcome of process_csv_task: data points written, CSV rows skipped for an
+# unparseable timestamp, the time format used and the telemetry.Phases of the run
+IngestResult = namedtuple('IngestResult', 'points rows_dropped time_format phases')
+
+# Helper: Parse CSV (runs as an ingest job, see run_ingest_job)
+# progress(rows_read, bytes_read) is called after every chunk; failures are
+# recorded on the dataset and re-raised to the caller. With available(), the
+# file is still being uploaded and is parsed as its contiguous prefix grows.
+# time_options ({'column', 'format', 'timezone'}) override the detected time column and format.
+def process_csv_task(file_path, dataset_id, progress=None, available=None, time_options=None):
+    """Ingest a CSV into the dataset; returns an IngestResult."""
     with app.app_context():
-        dataset = Dataset.query.get(dataset_id)
+        dataset = get_live_dataset(dataset_id)
         if not dataset:
             return
         
         try:
             dataset.status = 'processing'
+            dataset.version = (dataset.version or 0) + 1
             db.session.commit()
         except Exception:
             db.session.rollback()
-            return
+            raise
+        response_cache.invalidate(dataset_id)
         
+        storage = get_storage(dataset)
+        writer = None
+        chunks = None
         try:
-            # Use chunksize to process large files
-            chunk_size = 10000
-            first_chunk = True
-            
-            # Pre-check columns to filter 'Unnamed' and strip whitespace
-            # We read the header first
-            header_df = pd.read_csv(file_path, nrows=0)
-            # Filter rule: Only keep columns that are not empty and not 'Unnamed'
-            usecols = [c for c in header_df.columns if c and not str(c).startswith('Unnamed:')]
+            total_rows = 0
+            rows_read = 0
+            rows_kept = 0
+            phases = telemetry.Phases()
+            started_at = time.perf_counter()
+            time_options = time_options or {}
             
-            if not usecols:
-                raise ValueError("No valid columns found in CSV")
+            if available:
+                # The header is in the first chunk
+                ingest.wait_for_bytes(available, 1, STREAM_INGEST_IDLE_SECONDS)
+            # Header first: kept columns, time column and format, value columns, shared by every chunk
+            with phases.track('parse'):
+                layout = ingest.read_layout(
+                    file_path, date_col=time_options.get('column'), time_format=time_options.get('format'),
+                    timezone=time_options.get('timezone'), end=available()[0] if available else None)
+            # Large files are split on line breaks and parsed on several cores;
+            # the parsed chunks still come back in order to this single writer
+            csv_bytes = os.path.getsize(file_path)
+            if archive.is_archive(file_path):
+                csv_bytes *= archive.TYPICAL_RATIO
+            parallel = not available and INGEST_PARSE_WORKERS > 1 and csv_bytes >= INGEST_PARALLEL_MIN_BYTES
+            if available:
+                chunks = ingest.iter_growing(file_path, layout, available, STREAM_INGEST_IDLE_SECONDS)
+            elif parallel:
+                chunks = ingest.iter_parallel(file_path, layout, INGEST_PARSE_WORKERS)
+            else:
+                chunks = ingest.iter_chunks(file_path, layout)
 
-            for df in pd.read_csv(file_path, chunksize=chunk_size, usecols=usecols):
-                # Clean headers (strip whitespace) - though usecols handles reading, we might want to normalize names
-                df.columns = df.columns.str.strip()
-                
-                # Heuristic for date column
-                if first_chunk:
-                    date_col = None
-                    for col in df.columns:
-                        if 'date' in col.lower() or 'time' in col.lower():
-                            date_col = col
-                            break
-                    if not date_col:
-                        date_col = df.columns[0]
-                    first_chunk = False
-                
-                # Convert to datetime with error coercion
-                df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-                df = df.dropna(subset=[date_col]) # Drop rows with invalid dates
-                
-                data_points = []
-                value_cols = [c for c in df.columns if c != date_col]
-                
-                for _, row in df.iterrows():
-                    ts = row[date_col]
-                    for col in value_cols:
-                        try:
-                            val = float(row[col])
-                            # Basic cleaning: ignore NaN/Inf if needed, or keep them
-                            if pd.isna(val):
-                                continue
-                            data_points.append(DataPoint(
-                                dataset_id=dataset_id,
-                                timestamp=ts,
-                                metric=col,
-                                value=val
-                            ))
-                        except (ValueError, TypeError):
-                            continue
+            # parse: waiting for the next parsed chunk (including upload stalls when streamed)
+            waited_from = time.perf_counter()
+            for chunk_timestamps, values, rows_read, bytes_read in chunks:
+                phases.add('parse', time.perf_counter() - waited_from)
+                rows_kept += len(chunk_timestamps)
+                if progress:
+                    progress(rows_read, bytes_read)
+
+                if writer is None:
+                    writer = storage.open_writer(dataset_id, layout.value_cols, time_column=layout.date_col)
+                    rollup_builder = RollupBuilder(layout.value_cols)
+                    stats_builder = MetricStatsBuilder(layout.value_cols)
                 
-                if data_points:
-                    db.session.bulk_save_objects(data_points)
-                    db.session.commit()
+                if len(chunk_timestamps) > 0 and layout.value_cols:
+                    with phases.track('write'):
+                        total_rows += writer.append(chunk_timestamps, values)
+                    with phases.track('rollup'):
+                        rollup_builder.add(chunk_timestamps, values)
+                    with phases.track('stats'):
+                        stats_builder.add(chunk_timestamps, values)
+                waited_from = time.perf_counter()
+
+            if rows_read and not rows_kept:
+                raise ValueError(f"No valid timestamps in column {layout.date_col!r}"
+                                 + (f" (format {layout.time_format})" if layout.time_format else ""))
+
+            if writer is not None:
+                with phases.track('write'):
+                    writer.close()
+                with phases.track('rollup'):
+                    rollups.save(dataset_id, rollup_builder)
+                with phases.track('stats'):
+                    save_metric_stats(dataset_id, stats_builder)
+
+            elapsed = time.perf_counter() - started_at
+            rate = total_rows / elapsed if elapsed > 0 else 0
+            mode = "streamed" if available else f"{INGEST_PARSE_WORKERS} parse workers" if parallel else "serial"
+            print(f"Ingested {total_rows} data points for dataset {dataset_id} in {elapsed:.2f}s ({rate:.0f} rows/s, {mode}, "
+                  f"time format {layout.time_format or 'guessed per chunk'}, {rows_read - rows_kept} rows dropped)")
             
-            dataset.status = 'ready'
-            db.session.commit()
+            # Filtered, so a delete that happened meanwhile is not undone
+            set_dataset_status(dataset_id, 'ready')
+            return IngestResult(total_rows, rows_read - rows_kept, layout.time_format, phases)
             
+        except JobLost:
+            # Another worker has taken the job over: leave the dataset to it
+            if writer is not None:
+                writer.abort()
+            raise
         except Exception as e:
+            if writer is not None:
+                writer.abort()
             try:
-                dataset.status = 'failed'
-                db.session.commit()
+                set_dataset_status(dataset_id, 'failed')
             except Exception:
                 db.session.rollback()
             print(f"Error processing CSV: {e}")
+            raise
+        finally:
+            if chunks is not None:
+                # Stops the parse pool early if the ingest failed half way
+                chunks.close()
+            db.session.remove()
+
+# Progress is written to the job row at most this often (seconds)
+JOB_PROGRESS_INTERVAL = 1.0
+
+def run_ingest_job(job_id, token):
+    """Pool entry point: ingest one claimed IngestJob and record its progress and outcome."""
+    with app.app_context():
+        try:
+            job = IngestJob.query.get(job_id)
+            if not job:
+                return
+            dataset = get_live_dataset(job.dataset_id)
+            if not dataset:
+                ingest_jobs.finish(job_id, token, 'failed', 'Dataset not found')
+                return
+            reingest = IngestJob.query.filter(IngestJob.dataset_id == dataset.id, IngestJob.id < job_id).count()
+            if job.attempts > 1 or reingest:
+                # An interrupted earlier attempt may have left partial data behind,
+                # and a re-ingested dataset still holds the data of its last ingest.
+                # Removed a batch per write transaction, as deletes are (see Reclaimer),
+                # with the heartbeat kept up in between
+                db.session.commit()
+                reported_at = time.monotonic()
+                for _ in get_storage(dataset).reclaim(dataset.id, RECLAIM_BATCH_ROWS):
+                    if time.monotonic() - reported_at >= JOB_PROGRESS_INTERVAL:
+                        reported_at = time.monotonic()
+                        ingest_jobs.progress(job_id, token)
+
+            file_path = job.file_path
+            if not os.path.exists(file_path) and os.path.exists(file_path + archive.SUFFIX):
+                # Compressed by the upload archiver after this job was queued
+                file_path += archive.SUFFIX
+            total_bytes = os.path.getsize(file_path)
+            last_report = 0
+            rows_ingested = 0
+
+            def progress(rows_read, bytes_read):
+                nonlocal last_report, rows_ingested
+                rows_ingested = rows_read
+                now = time.monotonic()
+                if now - last_report >= JOB_PROGRESS_INTERVAL:
+                    last_report = now
+                    ingest_jobs.progress(job_id, token, rows_ingested=rows_read, bytes_read=bytes_read, total_bytes=total_bytes)
+
+            available = None
+            upload_id = job.upload_id
+            if upload_id:
+                def available():
+                    try:
+                        return upload_store.available(upload_id)
+                    except UploadError:
+                        # Merge clears the job's upload_id before it drops the temp dir
+                        still_uploading = db.session.execute(
+                            db.select(IngestJob.upload_id).where(IngestJob.id == job_id)
+                        ).scalar()
+                        if still_uploading:
+                            raise
+                        return total_bytes, True
+
+            time_options = json.loads(job.time_options) if job.time_options else None
+            try:
+                result = process_csv_task(file_path, dataset.id, progress=progress, available=available,
+                                          time_options=time_options)
+            except TimeoutError:
+                if upload_id:
+                    # The upload stalled: end it, or its file (preallocated to the full size)
+                    # stays in UPLOAD_DIR with nothing left to remove it
+                    upload_store.end_stream(upload_id)
+                raise
+            result = result or IngestResult(0, 0, None, telemetry.Phases())
+            ingest_jobs.finish(job_id, token, 'done', rows_ingested=rows_ingested, bytes_read=total_bytes,
+                               points_ingested=result.points, rows_dropped=result.rows_dropped,
+                               time_format=result.time_format, phase_seconds=json.dumps(result.phases.seconds))
+        except JobLost as e:
+            print(e)
+        except Exception as e:
+            try:
+                ingest_jobs.finish(job_id, token, 'failed', str(e)[:500])
+            except Exception as finish_error:
+                print(f"Could not record failure of ingest job {job_id}: {finish_error}")
+        finally:
+            db.session.remove()
+
+def _fail_job_dataset(job_id):
+    # A job given up on after its worker died: its dataset will never become ready
+    job = IngestJob.query.get(job_id)
+    if job:
+        set_dataset_status(job.dataset_id, 'failed')
+
+ingest_jobs = JobQueue(
+    app, db, IngestJob, run_ingest_job,
+    workers=INGEST_WORKERS, executor=INGEST_EXECUTOR, on_failed=_fail_job_dataset
+)
+
+def reclaim_dataset(dataset_id):
+    """Remove a deleted dataset step by step (see Reclaimer), yielding data points removed."""
+    dataset = Dataset.query.get(dataset_id)
+    if not dataset:
+        return
+    storage = get_storage(dataset)
+    storage_name = dataset.storage
+    upload_paths = {path for (path,) in db.session.query(IngestJob.file_path).filter_by(dataset_id=dataset_id)}
+    # Release the session's read transaction between batches, so it does not pin the WAL
+    db.session.commit()
+    yield from storage.reclaim(dataset_id, RECLAIM_BATCH_ROWS)
+    rollups.delete(dataset_id)
+    DatasetMetricStats.query.filter_by(dataset_id=dataset_id).delete()
+    IngestJob.query.filter_by(dataset_id=dataset_id).delete()
+    Annotation.query.filter_by(dataset_id=dataset_id).delete()
+    Dataset.query.filter_by(id=dataset_id).delete()
+    db.session.commit()
+    response_cache.invalidate(dataset_id)
+    remove_uploads(upload_paths)
+    if storage_name != 'columnar':
+        pages = sqlite.incremental_vacuum()
+        if pages:
+            print(f"Incremental vacuum after deleting dataset {dataset_id}: {pages} pages returned")
+
+reclaimer = Reclaimer(app, db, Dataset, reclaim_dataset, delay=5 * JOB_PROGRESS_INTERVAL)
+
+def remove_uploads(paths):
+    """Remove uploaded files (and their archives) no job refers to any more."""
+    paths = set(paths) | {path + archive.SUFFIX for path in paths if not archive.is_archive(path)}
+    in_use = {path for (path,) in db.session.query(IngestJob.file_path).filter(IngestJob.file_path.in_(paths))}
+    for path in paths - in_use:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Failed to remove upload {path}: {e}")
+
+def busy_uploads():
+    """Files a queued or running ingest still reads, under either name (see run_ingest_job)."""
+    paths = {path for (path,) in db.session.query(IngestJob.file_path).filter(
+        IngestJob.status.in_(('queued', 'running')))}
+    db.session.commit()
+    return paths | {path + archive.SUFFIX for path in paths}
+
+def archive_uploads():
+    """Compress the uploads of finished ingests and apply the retention policy (see archive.py)."""
+    with app.app_context():
+        try:
+            if UPLOAD_COMPRESS_LEVEL > 0:
+                done = {path for (path,) in db.session.query(IngestJob.file_path).filter(
+                    IngestJob.status == 'done', IngestJob.upload_id.is_(None))}
+                # A queued or running re-ingest still reads the file as it is
+                for path in sorted(done - busy_uploads()):
+                    if archive.is_archive(path) or not os.path.exists(path):
+                        continue
+                    target = archive.compress(path, UPLOAD_COMPRESS_LEVEL)
+                    if target is None:
+                        continue
+                    IngestJob.query.filter_by(file_path=path).update({'file_path': target}, synchronize_session=False)
+                    db.session.commit()
+                    ratio = os.path.getsize(path) / max(os.path.getsize(target), 1)
+                    os.remove(path)
+                    print(f"Upload archiver: compressed {os.path.basename(path)} ({ratio:.1f}x)")
+            # Asked again: jobs may have been queued while files were compressed
+            removed = archive.prune(UPLOAD_DIR, UPLOAD_RETENTION_DAYS * 86400, UPLOAD_RETENTION_BYTES,
+                                    keep=busy_uploads())
+            if removed:
+                print(f"Upload archiver: removed {len(removed)} archives past the retention policy")
+        finally:
+            db.session.remove()
+
+upload_store = UploadStore(TEMP_DIR)
+_background_started = False
+_background_lock = threading.Lock()
+
+def _collect_ingest_metrics():
+    # Jobs run in other processes (and other workers), so their counters come from the job table
+    totals = db.session.query(
+        IngestJob.status, db.func.count(), db.func.sum(IngestJob.rows_ingested),
+        db.func.sum(IngestJob.points_ingested), db.func.sum(IngestJob.bytes_read)
+    ).group_by(IngestJob.status).all()
+    phase_totals = {}
+    for (phase_seconds,) in db.session.query(IngestJob.phase_seconds).filter(
+            IngestJob.status == 'done', IngestJob.phase_seconds.isnot(None)):
+        for phase, seconds in json.loads(phase_seconds).items():
+            phase_totals[phase] = phase_totals.get(phase, 0.0) + seconds
+    running = IngestJob.query.filter_by(status='running').all()
+
+    lines = telemetry.gauge_lines('dataview_ingest_jobs', 'Ingest jobs in the job table, by status',
+                                [((status,), count) for status, count, _, _, _ in totals], ('status',))
+    lines += telemetry.gauge_lines('dataview_ingest_rows', 'CSV rows parsed by the jobs in the job table, by status',
+                                 [((status,), rows or 0) for status, _, rows, _, _ in totals], ('status',))
+    lines += telemetry.gauge_lines('dataview_ingest_points', 'Data points written by the jobs in the job table, by status',
+                                 [((status,), points or 0) for status, _, _, points, _ in totals], ('status',))
+    lines += telemetry.gauge_lines('dataview_ingest_bytes', 'CSV bytes read by the jobs in the job table, by status',
+                                 [((status,), read or 0) for status, _, _, _, read in totals], ('status',))
+    lines += telemetry.gauge_lines('dataview_ingest_phase_seconds', 'Time finished jobs in the job table spent per phase',
+                                 [((phase,), seconds) for phase, seconds in sorted(phase_totals.items())], ('phase',))
+    lines += telemetry.gauge_lines('dataview_ingest_running_progress', 'Fraction of the file read by each running job',
+                                 [((job.id, job.dataset_id), job.to_dict()['progress']) for job in running],
+                                 ('job_id', 'dataset_id'))
+    lines += telemetry.gauge_lines('dataview_ingest_running_rows', 'CSV rows parsed so far by each running job',
+                                 [((job.id, job.dataset_id), job.rows_ingested or 0) for job in running],
+                                 ('job_id', 'dataset_id'))
+    return lines
+
+metrics_registry.add_collector(_collect_ingest_metrics)
+
+# Background threads (ingest workers and their stale-job recovery, janitors,
+# checkpointer, query plan check) are started by the server once a worker is
+# up: gunicorn's post_worker_init (gunicorn.conf.py), or the first request under
+# the dev server. Never on import, so maintenance scripts that import the app
+# (init_db, reset_data, ...) never pick up jobs.
+def start_background_workers():
+    global _background_started
+    if _background_started:
+        return
+    # Concurrent first requests may both get here
+    with _background_lock:
+        if _background_started:
+            return
+        ingest_jobs.start()
+        reclaimer.start()
+        upload_store.start_janitor(UPLOAD_EXPIRE_HOURS * 3600)
+        archive.start_janitor(archive_uploads)
+        sqlite.start_checkpointer(SQLITE_CHECKPOINT_WAL_BYTES, _no_ingest_running, SQLITE_CHECKPOINT_INTERVAL)
+        threading.Thread(target=check_query_plans, name='query-plan-check', daemon=True).start()
+        _background_started = True
+
+app.before_request(start_background_workers)
+
+def _no_ingest_running():
+    with app.app_context():
+        try:
+            return IngestJob.query.filter_by(status='running').count() == 0
         finally:
             db.session.remove()
 
@@ -185,6 +812,11 @@ def process_csv_task(file_path, dataset_id):
 def health():
     return jsonify({'status': 'ok'})
 
+# Prometheus scrape endpoint: request timings of this worker plus ingest state
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 # Resumable Upload: Check Chunks
 @app.route('/api/upload/check', methods=['GET'])
 def check_chunks():
@@ -192,34 +824,151 @@ def check_chunks():
     if not upload_id:
         return jsonify({'error': 'Missing uploadId'}), 400
     
-    chunk_dir = os.path.join(TEMP_DIR, upload_id)
-    uploaded_chunks = []
-    if os.path.exists(chunk_dir):
-        try:
-            uploaded_chunks = [int(f) for f in os.listdir(chunk_dir) if f.isdigit()]
-        except Exception as e:
-            print(f"Error checking chunks for {upload_id}: {e}")
-            pass
-            
-    return jsonify({'uploadedChunks': uploaded_chunks})
+    # Only chunks whose bytes were written and verified are reported
+    result = {'uploadedChunks': upload_store.uploaded_chunks(upload_id)}
+    # ?contentHash= (see uploads.content_hash): a file we already have needs no upload at all
+    duplicate = find_duplicate(request.args.get('contentHash'))
+    if duplicate:
+        result['dataset'] = duplicate.to_dict()
+    return jsonify(result)
 
 # Resumable Upload: Upload Chunk
+# Written straight into the preallocated destination file at chunkIndex * chunkSize;
+# an optional checksum ('sha256:<hex>' or 'crc32:<hex>') is verified before the chunk counts
 @app.route('/api/upload/chunk', methods=['POST'])
 def upload_chunk():
     upload_id = request.form.get('uploadId')
-    chunk_index = request.form.get('chunkIndex')
     file = request.files.get('file')
+    try:
+        chunk_index = int(request.form.get('chunkIndex'))
+        chunk_size = int(request.form.get('chunkSize'))
+        total_size = int(request.form.get('totalSize'))
+    except (TypeError, ValueError):
+        chunk_index = None
     
     if not upload_id or chunk_index is None or not file:
         return jsonify({'error': 'Missing parameters'}), 400
+    
+    try:
+        checksum = upload_store.write_chunk(
+            upload_id, chunk_index, file.stream, total_size, chunk_size,
+            checksum=request.form.get('checksum')
+        )
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    return jsonify({'status': 'success', 'checksum': f'sha256:{checksum}'})
+
+# Generate a safe unique filename to avoid "File name too long" errors
+def unique_upload_path(filename):
+    name, ext = os.path.splitext(filename)
+    if len(name) > 50:
+        name = name[:50]
         
-    chunk_dir = os.path.join(TEMP_DIR, upload_id)
-    os.makedirs(chunk_dir, exist_ok=True)
+    unique_filename = f"{int(datetime.now().timestamp())}_{name}{ext}"
+    return os.path.join(UPLOAD_DIR, unique_filename)
+
+def time_options_arg(data):
+    """Time parsing overrides (timeColumn, timeFormat, timezone) from a request body or form,
+    as stored on the ingest job; raises ValueError for an invalid format or timezone."""
+    options = {'column': data.get('timeColumn'), 'format': data.get('timeFormat'), 'timezone': data.get('timezone')}
+    options = {key: value.strip() for key, value in options.items() if isinstance(value, str) and value.strip()}
+    ingest.check_time_options(options.get('format'), options.get('timezone'))
+    return json.dumps(options) if options else None
+
+# Deduplication: a file with the same content as a live dataset is not stored or
+# parsed again; the upload endpoints answer with that dataset ('duplicate': true)
+# unless the request says force. Files uploaded whole (/api/upload) are hashed in
+# the chunk size the frontend uses, so they match the same file uploaded in chunks
+CONTENT_HASH_CHUNK_SIZE = 5 * 1024 * 1024
+
+def find_duplicate(content_hash):
+    """The newest dataset ingested, or being ingested, from a file with this content hash."""
+    if not content_hash:
+        return None
+    return Dataset.query.filter(
+        Dataset.content_hash == content_hash.strip().lower(), Dataset.status.in_(('pending', 'processing', 'ready'))
+    ).order_by(Dataset.id.desc()).first()
+
+def force_arg(data):
+    value = data.get('force')
+    return value is True or str(value).lower() in ('1', 'true', 'yes')
+
+def duplicate_response(dataset):
+    return jsonify({**dataset.to_dict(), 'duplicate': True})
+
+# Resumable Upload: Ingest while uploading (opt-in, STREAM_INGEST)
+# Creates the dataset up front and queues a job that parses the contiguous
+# chunks as they arrive; merge then only confirms the upload is complete
+@app.route('/api/upload/stream', methods=['POST'])
+def start_stream_upload():
+    if not STREAM_INGEST:
+        return jsonify({'error': 'Streaming ingest is disabled'}), 403
     
-    chunk_path = os.path.join(chunk_dir, str(chunk_index))
-    file.save(chunk_path)
+    data = request.json or {}
+    upload_id = data.get('uploadId')
+    filename = os.path.basename(data.get('filename') or '')
+    try:
+        total_size = int(data.get('totalSize'))
+        chunk_size = int(data.get('chunkSize'))
+    except (TypeError, ValueError):
+        total_size = None
     
-    return jsonify({'status': 'success'})
+    if not upload_id or not filename or total_size is None:
+        return jsonify({'error': 'Missing parameters'}), 400
+    try:
+        time_options = time_options_arg(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    stream = upload_store.stream_info(upload_id)
+    if stream:
+        dataset = get_live_dataset(stream['dataset_id'])
+        if dataset:
+            return jsonify(dataset.to_dict())
+    duplicate = None if force_arg(data) else find_duplicate(data.get('contentHash'))
+    if duplicate:
+        return duplicate_response(duplicate)
+    
+    dataset = Dataset(filename=filename, status='pending', storage=STORAGE_BACKEND)
+    db.session.add(dataset)
+    db.session.commit()
+    try:
+        file_path = unique_upload_path(filename)
+        upload_store.start_stream(upload_id, total_size, chunk_size, file_path, dataset.id)
+    except UploadError as e:
+        db.session.delete(dataset)
+        db.session.commit()
+        return jsonify({'error': str(e)}), e.status
+    
+    ingest_jobs.enqueue(dataset_id=dataset.id, file_path=file_path, upload_id=upload_id, total_bytes=total_size,
+                        time_options=time_options)
+    return jsonify(dataset.to_dict()), 201
+
+def finish_stream_upload(upload_id, stream, time_options=None):
+    dataset = get_live_dataset(stream['dataset_id'])
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+    try:
+        # Also checks the upload is complete
+        dataset.content_hash = upload_store.content_hash(upload_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    # Tell the job the file is whole before the temp dir (and its chunk markers) goes away
+    IngestJob.query.filter_by(dataset_id=dataset.id, upload_id=upload_id).update({'upload_id': None})
+    db.session.commit()
+    upload_store.finalize(upload_id)
+    
+    latest_job = IngestJob.query.filter_by(dataset_id=dataset.id).order_by(IngestJob.id.desc()).first()
+    if dataset.status == 'failed' or latest_job is None or latest_job.status == 'failed':
+        # The streamed parse failed (e.g. on the time format): ingest the complete file again,
+        # with the time options of this request or else those the stream was started with
+        if time_options is None and latest_job is not None:
+            time_options = latest_job.time_options
+        ingest_jobs.enqueue(dataset_id=dataset.id, file_path=stream['dest_path'], total_bytes=os.path.getsize(stream['dest_path']),
+                            time_options=time_options)
+    return jsonify(dataset.to_dict())
 
 # Resumable Upload: Merge
 @app.route('/api/upload/merge', methods=['POST', 'GET'])
@@ -229,46 +978,45 @@ def merge_chunks():
         
     data = request.json
     upload_id = data.get('uploadId')
-    filename = data.get('filename')
+    filename = os.path.basename(data.get('filename') or '')
     
     if not upload_id or not filename:
         return jsonify({'error': 'Missing parameters'}), 400
-        
-    chunk_dir = os.path.join(TEMP_DIR, upload_id)
-    if not os.path.exists(chunk_dir):
-        return jsonify({'error': 'Chunks not found'}), 404
-        
-    # Create final file
-    # unique_filename = f"{upload_id}_{filename}"
+    try:
+        time_options = time_options_arg(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Generate a safe unique filename to avoid "File name too long" errors
-    name, ext = os.path.splitext(filename)
-    if len(name) > 50:
-        name = name[:50]
-        
-    unique_filename = f"{int(datetime.now().timestamp())}_{name}{ext}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    stream = upload_store.stream_info(upload_id)
+    if stream:
+        return finish_stream_upload(upload_id, stream, time_options)
+    
+    try:
+        content_hash = upload_store.content_hash(upload_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    duplicate = None if force_arg(data) else find_duplicate(content_hash)
+    if duplicate:
+        upload_store.discard(upload_id)
+        return duplicate_response(duplicate)
+    
+    file_path = unique_upload_path(filename)
+    
+    try:
+        # Every chunk is already in place: finishing is a rename
+        upload_store.finalize(upload_id, file_path)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
     
     try:
-        with open(file_path, 'wb') as dest:
-            # Iterate chunks in order
-            chunks = sorted([int(f) for f in os.listdir(chunk_dir) if f.isdigit()])
-            for i in chunks:
-                chunk_path = os.path.join(chunk_dir, str(i))
-                with open(chunk_path, 'rb') as source:
-                    shutil.copyfileobj(source, dest, 10 * 1024 * 1024) # 10MB buffer
-                    
-        # Clean up chunks
-        shutil.rmtree(chunk_dir)
-        
         # Create Dataset record
-        dataset = Dataset(filename=filename, status='pending')
+        dataset = Dataset(filename=filename, status='pending', storage=STORAGE_BACKEND, content_hash=content_hash)
         db.session.add(dataset)
         db.session.commit()
         
-        # Start background processing
-        thread = threading.Thread(target=process_csv_task, args=(file_path, dataset.id))
-        thread.start()
+        # Queue background processing
+        ingest_jobs.enqueue(dataset_id=dataset.id, file_path=file_path, total_bytes=os.path.getsize(file_path),
+                            time_options=time_options)
         
         return jsonify(dataset.to_dict())
         
@@ -284,21 +1032,30 @@ def upload_file():
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
+    try:
+        time_options = time_options_arg(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     if file:
         # Save to file
         unique_filename = f"{datetime.now().timestamp()}_{file.filename}"
         file_path = os.path.join(UPLOAD_DIR, unique_filename)
         file.save(file_path)
+        content_hash = hash_file(file_path, CONTENT_HASH_CHUNK_SIZE)
+        duplicate = None if force_arg(request.form) else find_duplicate(content_hash)
+        if duplicate:
+            os.remove(file_path)
+            return duplicate_response(duplicate)
         
         # Create Dataset record
-        dataset = Dataset(filename=file.filename, status='pending')
+        dataset = Dataset(filename=file.filename, status='pending', storage=STORAGE_BACKEND, content_hash=content_hash)
         db.session.add(dataset)
         db.session.commit()
         
-        # Start background processing
-        thread = threading.Thread(target=process_csv_task, args=(file_path, dataset.id))
-        thread.start()
+        # Queue background processing
+        ingest_jobs.enqueue(dataset_id=dataset.id, file_path=file_path, total_bytes=os.path.getsize(file_path),
+                            time_options=time_options)
             
         return jsonify(dataset.to_dict()), 201
 
@@ -308,26 +1065,81 @@ def delete_dataset(dataset_id):
     if not dataset:
         return jsonify({'error': 'Dataset not found'}), 404
     
+    if dataset.status == 'deleting':
+        return jsonify(dataset.to_dict()), 202
+    
     try:
-        # Delete associated data points
-        DataPoint.query.filter_by(dataset_id=dataset_id).delete()
-        
-        # Delete associated annotations
+        # Only mark it here: the data points are removed by the reclaimer in bounded
+        # batches, so a large dataset neither blocks this request nor other writers
+        dataset.reclaim_total = db.session.query(
+            db.func.coalesce(db.func.sum(DatasetMetricStats.count), 0)
+        ).filter_by(dataset_id=dataset_id).scalar()
+        dataset.reclaim_done = 0
+        dataset.reclaim_at = None
+        dataset.deleted_at = datetime.utcnow()
+        dataset.status = 'deleting'
+        # A job still running for it notices on its next progress report and stops
+        IngestJob.query.filter(
+            IngestJob.dataset_id == dataset_id, IngestJob.status.in_(('queued', 'running'))
+        ).update({'status': 'failed', 'error': 'Dataset deleted', 'finished_at': datetime.utcnow()},
+                 synchronize_session=False)
         Annotation.query.filter_by(dataset_id=dataset_id).delete()
-        
-        # Delete dataset record
-        db.session.delete(dataset)
         db.session.commit()
-        
-        return jsonify({'status': 'success'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+    
+    response_cache.invalidate(dataset_id)
+    reclaimer.notify()
+    return jsonify(dataset.to_dict()), 202
+
+# Deletion progress ({'status': 'deleting', 'reclaim': {done, total}}); 404 once it is gone
+@app.route('/api/datasets/<int:dataset_id>', methods=['GET'])
+def get_dataset(dataset_id):
+    dataset = Dataset.query.get(dataset_id)
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+    return jsonify(dataset.to_dict())
+
+# Ingest the dataset again from its retained upload (see archive.py), with the time
+# options of the request body or else those of the last ingest; 410 once the
+# retention policy has removed the file
+@app.route('/api/datasets/<int:dataset_id>/reingest', methods=['POST'])
+def reingest_dataset(dataset_id):
+    dataset = get_live_dataset(dataset_id)
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+    if dataset.status in ('pending', 'processing'):
+        return jsonify({'error': 'Dataset is being ingested'}), 409
+    try:
+        time_options = time_options_arg(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    last_job = IngestJob.query.filter_by(dataset_id=dataset_id).order_by(IngestJob.id.desc()).first()
+    file_path = last_job.file_path if last_job else None
+    if file_path and not os.path.exists(file_path):
+        file_path += archive.SUFFIX
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({'error': 'The uploaded file is no longer retained'}), 410
+    if time_options is None:
+        # Same options as last time, plus the format found then: it spares sampling
+        # the file again (an archive is only sampled at its start)
+        options = json.loads(last_job.time_options) if last_job.time_options else {}
+        if last_job.time_format:
+            options.setdefault('format', last_job.time_format)
+        time_options = json.dumps(options) if options else None
+    
+    dataset.status = 'pending'
+    db.session.commit()
+    ingest_jobs.enqueue(dataset_id=dataset_id, file_path=file_path, total_bytes=os.path.getsize(file_path),
+                        time_options=time_options)
+    return jsonify(dataset.to_dict()), 202
 
 @app.route('/api/datasets', methods=['GET'])
 def get_datasets():
     try:
-        datasets = Dataset.query.order_by(Dataset.created_at.desc()).all()
+        datasets = Dataset.query.filter(Dataset.status.is_distinct_from('deleting')).order_by(Dataset.created_at.desc()).all()
         return jsonify([d.to_dict() for d in datasets])
     except Exception as e:
         print(f"Error getting datasets: {e}")
@@ -335,74 +1147,181 @@ def get_datasets():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# Ingest jobs: progress for the frontend
+@app.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    query = IngestJob.query
+    if request.args.get('dataset_id'):
+        query = query.filter_by(dataset_id=request.args.get('dataset_id', type=int))
+    if request.args.get('status'):
+        query = query.filter_by(status=request.args.get('status'))
+    jobs = query.order_by(IngestJob.id.desc()).limit(100).all()
+    return jsonify([j.to_dict() for j in jobs])
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    job = IngestJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+# Default and maximum number of points per metric returned by /api/data
+DEFAULT_POINTS = 5000
+MAX_POINTS = 100000
+
+def data_options(args):
+    """points and mode of an /api/data query; raises ValueError."""
+    # Downsampling: the client asks for as many points as it can draw (e.g. its pixel width)
+    try:
+        limit = min(max(int(args.get('points', DEFAULT_POINTS)), 3), MAX_POINTS)
+    except ValueError:
+        raise ValueError('Invalid points')
+    mode = args.get('mode', 'lttb')
+    if mode not in DOWNSAMPLE_MODES:
+        raise ValueError(f"Invalid mode, expected one of {', '.join(DOWNSAMPLE_MODES)}")
+    return limit, mode
+
+def build_data(dataset, start, end, target_metric, limit, mode, binary, read=None):
+    """The /api/data response; read is the storage read to use (default the dataset's storage)."""
+    read = read or get_storage(dataset).read
+    metrics = [target_metric] if target_metric else None
+    # Serve from the coarsest rollup level that still has enough buckets for the
+    # requested range, so wide ranges read thousands of buckets instead of raw points
+    # Each bucket contributes its min and max, so spikes survive in either mode
+    level = rollups.choose_level(dataset.id, start, end, min_buckets=limit // 2)
+    if level:
+        series = {}
+        with telemetry.phase('db'):
+            buckets = rollups.read(dataset.id, level, metrics, start, end)
+        for metric, (bucket_ts, mins, maxs, _, _) in buckets.items():
+            series[metric] = rollup_envelope(level, bucket_ts, mins, maxs)
+    else:
+        with telemetry.phase('db'):
+            series = read(dataset.id, metrics=metrics, start=start, end=end)
+
+    # Downsample every metric on its own, so spikes survive and metrics stay aligned in time
+    with telemetry.phase('transform'):
+        for metric, (timestamps, values) in series.items():
+            series[metric] = downsample(timestamps, values, limit, mode)
+        if target_metric:
+            timestamps, values = series.get(target_metric, (EMPTY_TIMESTAMPS, EMPTY_VALUES))
+            columns = {target_metric: values}
+        else:
+            # Metrics are pivoted onto one sorted timeline; NaN marks a metric without a point there
+            timestamps, columns = wire.align(series)
+
+    with telemetry.phase('serialize'):
+        if binary:
+            return Response(wire.encode(timestamps, columns), mimetype=wire.MIMETYPE)
+
+        if target_metric:
+            return jsonify([
+                {'timestamp': ts, 'value': v}
+                for ts, v in zip(isoformat_timestamps(timestamps).tolist(), values.tolist())
+            ])
+
+        # Format for ECharts: { timestamps: [t1, t2], series: [ {name: 'temp', data: [v1, v2]} ] }
+        # Every distinct timestamp is formatted once; gaps become null
+        return jsonify({
+            'timestamps': isoformat_timestamps(timestamps).tolist(),
+            'series': [
+                {'name': metric, 'type': 'line', 'data': np.where(np.isnan(values), None, values).tolist()}
+                for metric, values in columns.items()
+            ]
+        })
+
+def accepts_columns():
+    # JSON unless the client asks for the binary column format (see wire.py)
+    return request.accept_mimetypes.best_match(['application/json', wire.MIMETYPE]) == wire.MIMETYPE
+
 @app.route('/api/data/<int:dataset_id>', methods=['GET'])
 def get_data(dataset_id):
+    dataset = get_live_dataset(dataset_id)
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+
     # Time range filter
-    start_str = request.args.get('start')
-    end_str = request.args.get('end')
+    start = parse_time_arg(request.args.get('start'))
+    end = parse_time_arg(request.args.get('end'))
     target_metric = request.args.get('metric')
-    
-    query = DataPoint.query.filter_by(dataset_id=dataset_id)
-    
-    if target_metric:
-        query = query.filter_by(metric=target_metric)
-    
-    if start_str:
-        query = query.filter(DataPoint.timestamp >= datetime.fromisoformat(start_str.replace('Z', '+00:00')))
-    if end_str:
-        query = query.filter(DataPoint.timestamp <= datetime.fromisoformat(end_str.replace('Z', '+00:00')))
-        
-    # Sort by timestamp
-    points = query.order_by(DataPoint.timestamp).all()
-    
-    # Python-side Downsampling for Large Datasets
-    # If specific metric is requested, we can be more aggressive if needed, 
-    # but let's stick to a reasonable limit (e.g. 5000 points) to keep UI responsive.
-    limit = 5000
-    if len(points) > limit:
-        step = len(points) // limit
-        if step > 1:
-            points = points[::step]
-    
-    if target_metric:
-        return jsonify([{'timestamp': p.timestamp.isoformat(), 'value': p.value} for p in points])
+    try:
+        limit, mode = data_options(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    binary = accepts_columns()
 
-    # Format for ECharts: Series based on metric
-    # Output: { categories: [t1, t2], series: [ {name: 'temp', data: [v1, v2]} ] }
-    # To do this efficiently, we might need to pivot back or just aggregate in python
-    
-    data_map = {} # metric -> { timestamp -> value }
-    all_timestamps = set()
-    
-    for p in points:
-        ts_str = p.timestamp.isoformat()
-        all_timestamps.add(ts_str)
-        if p.metric not in data_map:
-            data_map[p.metric] = {}
-        data_map[p.metric][ts_str] = p.value
-        
-    sorted_timestamps = sorted(list(all_timestamps))
-    
-    series_list = []
-    for metric, values in data_map.items():
-        series_data = []
-        for ts in sorted_timestamps:
-            series_data.append(values.get(ts, None)) # Handle missing data
-        series_list.append({
-            'name': metric,
-            'type': 'line',
-            'data': series_data
-        })
-        
-    return jsonify({
-        'timestamps': sorted_timestamps,
-        'series': series_list
-    })
+    response = app.make_response(cached_response(
+        dataset, lambda: build_data(dataset, start, end, target_metric, limit, mode, binary),
+        wire.MIMETYPE if binary else 'application/json'))
+    response.vary.add('Accept')
+    return response
+
+# Tiles: /api/tiles/<id>/<metric>/<level>/<index> is one metric over a fixed time span
+# at a fixed resolution (see tiles.py), in the binary column format or as /api/data's
+# JSON. With ?v=<the dataset's version from /api/datasets> a ready dataset's tile is
+# immutable and may be cached for a year by the browser and nginx; without it, or
+# for an outdated version, it is cached like /api/data
+TILE_MAX_AGE = 365 * 86400
+
+@app.route('/api/tiles', methods=['GET'])
+def get_tile_levels():
+    # Static: the frontend picks a level from these bucket widths
+    return jsonify({'buckets': tiles.BUCKETS, 'levels': tiles.LEVEL_MS})
+
+@app.route('/api/tiles/<int:dataset_id>/<metric>/<int:level>/<int(signed=True):index>', methods=['GET'])
+def get_tile(dataset_id, metric, level, index):
+    dataset = get_live_dataset(dataset_id)
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+    if not 0 <= level <= tiles.MAX_LEVEL:
+        return jsonify({'error': f'Level must be between 0 and {tiles.MAX_LEVEL}'}), 400
+    try:
+        start, end = tiles.tile_range(level, index)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    binary = accepts_columns()
+
+    def build():
+        # Rollup buckets no wider than the tile's, else the raw points
+        rollup_level = rollups.level_within(dataset_id, tiles.bucket_ns(level) / 1e9)
+        with telemetry.phase('db'):
+            if rollup_level:
+                buckets = rollups.read(dataset_id, rollup_level, [metric], start, end)
+                timestamps, mins, maxs = buckets[metric][:3] if metric in buckets else (EMPTY_TIMESTAMPS, EMPTY_VALUES, EMPTY_VALUES)
+            else:
+                series = get_storage(dataset).read(dataset_id, metrics=[metric], start=start, end=end)
+                timestamps, mins = series.get(metric, (EMPTY_TIMESTAMPS, EMPTY_VALUES))
+                maxs = mins
+        with telemetry.phase('transform'):
+            # Reads include both ends (and a rollup the bucket holding start): keep [start, end)
+            timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+            inside = (timestamps >= start) & (timestamps < end)
+            timestamps, values = tiles.bucket_extremes(level, start, timestamps[inside],
+                                                       np.asarray(mins)[inside], np.asarray(maxs)[inside])
+        with telemetry.phase('serialize'):
+            if binary:
+                return Response(wire.encode(timestamps, {metric: values}), mimetype=wire.MIMETYPE)
+            return jsonify([
+                {'timestamp': ts, 'value': v}
+                for ts, v in zip(isoformat_timestamps(timestamps).tolist(), values.tolist())
+            ])
+
+    response = app.make_response(cached_response(dataset, build, wire.MIMETYPE if binary else 'application/json'))
+    response.vary.add('Accept')
+    if (response.status_code in (200, 304) and dataset.status == 'ready'
+            and request.args.get('v') == dataset.cache_version()):
+        response.headers['Cache-Control'] = f'public, max-age={TILE_MAX_AGE}, immutable'
+    return response
+
+# Range-restricted stats come from the coarsest rollup level with at least this
+# many buckets in the range (the partial buckets at its edges from the raw
+# points); smaller ranges are aggregated from the raw points
+RANGE_STATS_MIN_BUCKETS = 200
+
+def build_stats(dataset, start, end, read=None):
+    """The /api/stats response; read is the storage read to use (default the dataset's storage)."""
+    read = read or get_storage(dataset).read
 
-@app.route('/api/stats/<int:dataset_id>', methods=['GET'])
-def get_stats(dataset_id):
-    import math
-    
     def safe_float(val):
         if val is None:
             return 0
@@ -414,32 +1333,112 @@ def get_stats(dataset_id):
         except (ValueError, TypeError):
             return 0
 
-    try:
-        # Use SQL for aggregation
-        from sqlalchemy import func
-        stats = db.session.query(
-            DataPoint.metric,
-            func.min(DataPoint.value).label('min'),
-            func.max(DataPoint.value).label('max'),
-            func.avg(DataPoint.value).label('avg'),
-            func.count(DataPoint.value).label('count')
-        ).filter_by(dataset_id=dataset_id).group_by(DataPoint.metric).all()
-        
-        result = []
+    def range_stats():
+        level = rollups.choose_level(dataset.id, start, end, min_buckets=RANGE_STATS_MIN_BUCKETS)
+        if level:
+            first, stop = rollup_whole_buckets(level, start, end)
+            if first is not None and stop is not None and first >= stop:
+                level = None
+        stats = []
+        if level:
+            # Buckets wholly inside the range come from the rollup; the partial
+            # buckets at its edges are aggregated from the raw points
+            totals = {}
+
+            def add(metric, low, high, total, count):
+                if metric in totals:
+                    known = totals[metric]
+                    low, high = min(low, known[0]), max(high, known[1])
+                    total, count = total + known[2], count + known[3]
+                totals[metric] = (low, high, total, count)
+
+            whole = rollups.read(dataset.id, level, start=first,
+                                 end=None if stop is None else stop - np.timedelta64(1, 'ns'))
+            for metric, (bucket_ts, mins, maxs, avgs, counts) in whole.items():
+                if first is not None:
+                    # The read also returns the bucket holding first
+                    inside = bucket_ts >= first
+                    mins, maxs, avgs, counts = mins[inside], maxs[inside], avgs[inside], counts[inside]
+                if len(counts):
+                    add(metric, mins.min(), maxs.max(), float((avgs * counts).sum()), int(counts.sum()))
+            head = read(dataset.id, start=start, end=first) if first is not None else {}
+            tail = read(dataset.id, start=stop, end=end) if stop is not None else {}
+            for edge, upto in ((head, first), (tail, None)):
+                for metric, (timestamps, values) in edge.items():
+                    keep = ~np.isnan(values)
+                    if upto is not None:
+                        # Reads include both ends: points at first belong to the whole buckets
+                        keep &= np.asarray(timestamps, dtype='datetime64[ns]') < upto
+                    values = values[keep]
+                    if len(values):
+                        add(metric, values.min(), values.max(), float(values.sum()), len(values))
+            for metric in sorted(totals):
+                low, high, total, count = totals[metric]
+                stats.append({
+                    'metric': metric,
+                    'min': low,
+                    'max': high,
+                    'avg': total / count,
+                    'count': count
+                })
+        else:
+            for metric, (_, values) in read(dataset.id, start=start, end=end).items():
+                values = values[~np.isnan(values)]
+                if len(values):
+                    stats.append({
+                        'metric': metric,
+                        'min': values.min(),
+                        'max': values.max(),
+                        'avg': values.mean(),
+                        'std': float(values.std()),
+                        'count': len(values)
+                    })
+        return stats, level or 'raw'
+
+    resolution = None
+    with telemetry.phase('db'):
+        if start is not None or end is not None:
+            stats, resolution = range_stats()
+        else:
+            # Whole-dataset stats were computed during ingest: O(metrics) lookup
+            stats = [s.to_dict() for s in DatasetMetricStats.query.filter_by(dataset_id=dataset.id).order_by(DatasetMetricStats.metric)]
+            if not stats:
+                # Datasets ingested before stats were persisted: aggregate in the storage backend
+                stats = get_storage(dataset).stats(dataset.id)
+
+    result = []
+    with telemetry.phase('transform'):
         for s in stats:
-            metric_name = s.metric if s.metric is not None else "Unknown"
-            min_val = safe_float(s.min)
-            max_val = safe_float(s.max)
-            avg_val = safe_float(s.avg)
-            
-            result.append({
+            metric_name = s['metric'] if s['metric'] is not None else "Unknown"
+            min_val = safe_float(s['min'])
+            max_val = safe_float(s['max'])
+            avg_val = safe_float(s['avg'])
+
+            item = {
                 'metric': metric_name,
                 'min': min_val,
                 'max': max_val,
                 'avg': round(avg_val, 2),
-                'count': s.count
-            })
+                'count': s['count']
+            }
+            # Extra fields when known: std, null count, first/last timestamp, percentiles
+            item.update({k: v for k, v in s.items() if k not in ('metric', 'min', 'max', 'avg', 'count')})
+            if resolution:
+                item['resolution'] = resolution
+            result.append(item)
+    with telemetry.phase('serialize'):
         return jsonify(result)
+
+@app.route('/api/stats/<int:dataset_id>', methods=['GET'])
+def get_stats(dataset_id):
+    try:
+        dataset = get_live_dataset(dataset_id)
+        if not dataset:
+            return jsonify({'error': 'Dataset not found'}), 404
+
+        start = parse_time_arg(request.args.get('start'))
+        end = parse_time_arg(request.args.get('end'))
+        return cached_response(dataset, lambda: build_stats(dataset, start, end))
     except Exception as e:
         print(f"Error in get_stats: {e}")
         import traceback
@@ -447,33 +1446,139 @@ def get_stats(dataset_id):
         return jsonify({'error': str(e)}), 500
 
 # Annotation Routes
+# Every change bumps the dataset's annotation_revision and stamps the annotation
+# with it; deletes leave a tombstone row, so ?since=<revision> can report them
+
+# Default and maximum page size of /api/annotations/<dataset_id>, and the
+# largest batch /api/annotations/<dataset_id>/bulk accepts
+ANNOTATION_PAGE_SIZE = 5000
+ANNOTATION_MAX_PAGE_SIZE = 50000
+ANNOTATION_MAX_BULK = 50000
+
+def parse_annotation_time(value):
+    # Stored as the wall-clock time written, like the upload's timestamps
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+def reserve_annotation_revisions(dataset_id, count):
+    """Reserve count consecutive revisions of the dataset's annotations; returns the first (caller commits)."""
+    # The UPDATE takes SQLite's write lock first, so concurrent writers get distinct ranges
+    Dataset.query.filter_by(id=dataset_id).update(
+        {'annotation_revision': db.func.coalesce(Dataset.annotation_revision, 0) + count}, synchronize_session=False)
+    last = db.session.query(Dataset.annotation_revision).filter_by(id=dataset_id).scalar()
+    if last is None:
+        raise LookupError('Dataset not found')
+    return last - count + 1
+
+def annotation_fields(data, partial=False):
+    """Column values from a create / update payload; raises KeyError or ValueError."""
+    fields = {}
+    for key in ('start_time', 'end_time'):
+        if key in data or not partial:
+            fields[key] = parse_annotation_time(data[key])
+    for key, default in (('content', ''), ('status', 'info'), ('color', '#1890ff')):
+        if key in data or not partial:
+            fields[key] = data.get(key, default)
+    return fields
+
+def live_annotations(dataset_id):
+    return Annotation.query.filter(Annotation.dataset_id == dataset_id, Annotation.deleted_at.is_(None))
+
+def annotation_page(dataset_id, start=None, end=None, limit=ANNOTATION_PAGE_SIZE, cursor=None):
+    """Live annotations overlapping [start, end] after cursor, ordered by (start_time, id).
+
+    Returns (annotations, revision the page is current to, cursor of the next page or None).
+    """
+    # Read first: the page can only be newer than this revision, never older
+    revision = db.session.query(Dataset.annotation_revision).filter_by(id=dataset_id).scalar() or 0
+    if annotation_rtree and (start or end):
+        # The R*Tree candidates already belong to the dataset; leaving out the dataset_id
+        # filter keeps SQLite from walking the dataset's whole index instead
+        query = Annotation.query.filter(Annotation.id.in_(annotation_index.candidate_ids(dataset_id, start, end)),
+                                        Annotation.deleted_at.is_(None))
+    else:
+        query = live_annotations(dataset_id)
+    if end:
+        query = query.filter(Annotation.start_time <= end)
+    if start:
+        query = query.filter(Annotation.end_time >= start)
+    if cursor:
+        query = query.filter(db.tuple_(Annotation.start_time, Annotation.id) > cursor)
+    anns = query.order_by(Annotation.start_time, Annotation.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(anns) > limit:
+        last = anns[limit - 1]
+        next_cursor = f"{last.start_time.isoformat()}|{last.id}"
+    return anns[:limit], revision, next_cursor
+
+def annotation_page_size(value):
+    return min(max(int(value), 1), ANNOTATION_MAX_PAGE_SIZE)
+
+# ?start=&end=: only annotations overlapping the window. Pages are ordered by
+# (start_time, id); X-Next-Cursor is the ?cursor= of the next one. X-Annotation-Revision
+# is the revision this list is current to, for /api/annotations/<id>/changes
 @app.route('/api/annotations/<int:dataset_id>', methods=['GET'])
 def get_annotations(dataset_id):
-    anns = Annotation.query.filter_by(dataset_id=dataset_id).order_by(Annotation.start_time).all()
-    return jsonify([a.to_dict() for a in anns])
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = parse_annotation_time(start) if start else None
+        end = parse_annotation_time(end) if end else None
+        limit = annotation_page_size(request.args.get('limit', ANNOTATION_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_time, cursor_id = cursor.rsplit('|', 1)
+            cursor = (parse_annotation_time(cursor_time), int(cursor_id))
+    except ValueError:
+        return jsonify({'error': 'Invalid start, end, limit or cursor'}), 400
+
+    anns, revision, next_cursor = annotation_page(dataset_id, start, end, limit, cursor)
+    response = jsonify([a.to_dict() for a in anns])
+    response.headers['X-Annotation-Revision'] = str(revision)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# Delta fetch: annotations created or changed after ?since=<revision>, and the ids of
+# those deleted. At most ?limit= changes per call; 'more' says to call again with
+# since=<the returned revision>
+@app.route('/api/annotations/<int:dataset_id>/changes', methods=['GET'])
+def get_annotation_changes(dataset_id):
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(max(int(request.args.get('limit', ANNOTATION_MAX_PAGE_SIZE)), 1), ANNOTATION_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid since or limit'}), 400
+
+    revision = db.session.query(Dataset.annotation_revision).filter_by(id=dataset_id).scalar() or 0
+    changed = Annotation.query.filter(
+        Annotation.dataset_id == dataset_id, Annotation.revision > since, Annotation.revision <= revision
+    ).order_by(Annotation.revision).limit(limit + 1).all()
+    more = len(changed) > limit
+    changed = changed[:limit]
+    return jsonify({
+        'revision': changed[-1].revision if more else revision,
+        'more': more,
+        'annotations': [a.to_dict() for a in changed if a.deleted_at is None],
+        'deleted': [a.id for a in changed if a.deleted_at is not None],
+    })
 
 @app.route('/api/annotations', methods=['POST'])
 def create_annotation():
     data = request.json
     try:
-        ann = Annotation(
-            dataset_id=data['dataset_id'],
-            start_time=datetime.fromisoformat(data['start_time'].replace('Z', '+00:00')),
-            end_time=datetime.fromisoformat(data['end_time'].replace('Z', '+00:00')),
-            content=data.get('content', ''),
-            status=data.get('status', 'info'),
-            color=data.get('color', '#1890ff')
-        )
+        ann = Annotation(dataset_id=data['dataset_id'], **annotation_fields(data))
+        ann.revision = reserve_annotation_revisions(ann.dataset_id, 1)
         db.session.add(ann)
         db.session.commit()
         return jsonify(ann.to_dict()), 201
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/annotations/<int:ann_id>', methods=['PUT'])
 def update_annotation(ann_id):
     ann = Annotation.query.get(ann_id)
-    if not ann:
+    if not ann or ann.deleted_at is not None:
         return jsonify({'error': 'Annotation not found'}), 404
         
     data = request.json
@@ -483,6 +1588,7 @@ def update_annotation(ann_id):
         ann.status = data['status']
     if 'color' in data:
         ann.color = data['color']
+    ann.revision = reserve_annotation_revisions(ann.dataset_id, 1)
         
     db.session.commit()
     return jsonify(ann.to_dict())
@@ -490,50 +1596,214 @@ def update_annotation(ann_id):
 @app.route('/api/annotations/<int:ann_id>', methods=['DELETE'])
 def delete_annotation(ann_id):
     ann = Annotation.query.get(ann_id)
-    if not ann:
+    if not ann or ann.deleted_at is not None:
         return jsonify({'error': 'Annotation not found'}), 404
         
-    db.session.delete(ann)
+    ann.deleted_at = datetime.utcnow()
+    ann.revision = reserve_annotation_revisions(ann.dataset_id, 1)
     db.session.commit()
     return jsonify({'status': 'success'})
 
+# Batch changes in one transaction, e.g. for imported annotations:
+# {"create": [{start_time, end_time, content, status, color}, ...],
+#  "update": [{id, <any of those fields>}, ...], "delete": [id, ...]}
+@app.route('/api/annotations/<int:dataset_id>/bulk', methods=['POST'])
+def bulk_annotations(dataset_id):
+    data = request.json or {}
+    creates, updates, deletes = data.get('create') or [], data.get('update') or [], data.get('delete') or []
+    if len(creates) + len(updates) + len(deletes) > ANNOTATION_MAX_BULK:
+        return jsonify({'error': f'At most {ANNOTATION_MAX_BULK} changes per request'}), 400
+    if not get_live_dataset(dataset_id):
+        return jsonify({'error': 'Dataset not found'}), 404
+    try:
+        create_rows = [annotation_fields(item) for item in creates]
+        update_rows = [dict(annotation_fields(item, partial=True), id=int(item['id'])) for item in updates]
+        delete_ids = [int(ann_id) for ann_id in deletes]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid annotation: {e}'}), 400
+
+    ids = {row['id'] for row in update_rows} | set(delete_ids)
+    if ids:
+        found = {ann_id for (ann_id,) in live_annotations(dataset_id).filter(Annotation.id.in_(ids))
+                 .with_entities(Annotation.id)}
+        if ids - found:
+            return jsonify({'error': f'Annotations not found: {sorted(ids - found)[:20]}'}), 404
+
+    try:
+        revision = reserve_annotation_revisions(dataset_id, len(create_rows) + len(update_rows) + len(delete_ids))
+        now = datetime.utcnow()
+        created = []
+        if create_rows:
+            first = revision
+            for row in create_rows:
+                row.update(dataset_id=dataset_id, revision=revision, created_at=now)
+                revision += 1
+            db.session.execute(db.insert(Annotation), create_rows)
+            # Their revisions are unique, so they identify the new rows in order (an ordered
+            # RETURNING would cost one INSERT statement per row on SQLite)
+            created = db.session.execute(
+                db.select(Annotation.id).where(Annotation.dataset_id == dataset_id,
+                                               Annotation.revision.between(first, revision - 1))
+                .order_by(Annotation.revision)
+            ).scalars().all()
+        for row in update_rows:
+            row['revision'] = revision
+            revision += 1
+        for ann_id in delete_ids:
+            update_rows.append({'id': ann_id, 'deleted_at': now, 'revision': revision})
+            revision += 1
+        if update_rows:
+            # Bulk UPDATE by primary key (executemany per set of columns)
+            db.session.execute(db.update(Annotation), update_rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'created': created,
+        'updated': len(updates),
+        'deleted': len(delete_ids),
+        'revision': revision - 1,
+    })
+
+# Everything the chart page shows for one window in one round trip: NDJSON, one
+# {"section": ...} line per part as soon as it is ready, in the order stats, data,
+# annotations (a failed part is a line with "error" instead). Takes the arguments of
+# /api/data (start, end, metric, points, mode) plus annotation_limit; without
+# ?metric= the data is the first metric's, as the chart shows by default. With
+# Accept: application/vnd.dataview.columns the data line carries that binary format
+# in base64, otherwise the JSON /api/data returns. Stats and data use the response
+# cache entries of /api/stats and /api/data, and one raw read of the window serves both.
+@app.route('/api/dashboard/<int:dataset_id>', methods=['GET'])
+def get_dashboard(dataset_id):
+    dataset = get_live_dataset(dataset_id)
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+
+    try:
+        # The window is parsed once, for all three parts
+        window = {key: request.args[key] for key in ('start', 'end') if request.args.get(key)}
+        start = parse_annotation_time(window['start']) if 'start' in window else None
+        end = parse_annotation_time(window['end']) if 'end' in window else None
+        limit, mode = data_options(request.args)
+        annotation_limit = annotation_page_size(request.args.get('annotation_limit', ANNOTATION_PAGE_SIZE))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    start64, end64 = to_datetime64(start), to_datetime64(end)
+    binary = accepts_columns()
+    data_args = {key: request.args[key] for key in ('points', 'mode') if key in request.args}
+    metric = request.args.get('metric')
+    version = dataset.cache_version() if dataset.status == 'ready' else None
+    read = SharedRead(get_storage(dataset))
+
+    def section_body(path, args, mimetype, build):
+        key = response_cache.make_key(dataset_id, version, path, MultiDict(args), mimetype) if version else None
+        body = cached_body(key, build)
+        if isinstance(body, Response):
+            raise ValueError(json.loads(body.get_data()).get('error', body.status))
+        return body
+
+    def line(section, **fields):
+        return json.dumps({'section': section, **fields}, separators=(',', ':')) + '\n'
+
+    def generate():
+        nonlocal metric
+        try:
+            stats = json.loads(section_body(f'/api/stats/{dataset_id}', window, 'application/json',
+                                            lambda: build_stats(dataset, start64, end64, read)))
+            yield line('stats', data=stats)
+            metric = metric or (stats[0]['metric'] if stats else None)
+        except Exception as e:
+            db.session.rollback()
+            yield line('stats', error=str(e))
+
+        if metric:
+            try:
+                body = section_body(f'/api/data/{dataset_id}', dict(window, metric=metric, **data_args),
+                                    wire.MIMETYPE if binary else 'application/json',
+                                    lambda: build_data(dataset, start64, end64, metric, limit, mode, binary, read))
+                if binary:
+                    yield line('data', metric=metric, content_type=wire.MIMETYPE,
+                               body=base64.b64encode(body).decode('ascii'))
+                else:
+                    yield line('data', metric=metric, data=json.loads(body))
+            except Exception as e:
+                db.session.rollback()
+                yield line('data', metric=metric, error=str(e))
+
+        try:
+            anns, revision, next_cursor = annotation_page(dataset_id, start, end, annotation_limit)
+            yield line('annotations', data=[a.to_dict() for a in anns], revision=revision, next_cursor=next_cursor)
+        except Exception as e:
+            db.session.rollback()
+            yield line('annotations', error=str(e))
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.vary.add('Accept')
+    # Pass each line on as it is written, not once nginx's proxy buffer fills
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/download/<int:dataset_id>', methods=['GET'])
 def download_data(dataset_id):
-    start_str = request.args.get('start')
-    end_str = request.args.get('end')
+    dataset = get_live_dataset(dataset_id)
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+
+    start = parse_time_arg(request.args.get('start'))
+    end = parse_time_arg(request.args.get('end'))
     target_metric = request.args.get('metric')
+    # layout=long (timestamp, metric, value rows) or wide (one column per metric, like the upload)
+    layout = request.args.get('layout', 'long')
+    compress = request.args.get('compress')
+    if layout not in ('long', 'wide'):
+        return jsonify({'error': 'Invalid layout, expected long or wide'}), 400
+    if compress not in (None, 'gzip'):
+        return jsonify({'error': 'Invalid compress, expected gzip'}), 400
 
-    query = DataPoint.query.filter_by(dataset_id=dataset_id)
-    if target_metric:
-        query = query.filter_by(metric=target_metric)
-    if start_str:
-        query = query.filter(DataPoint.timestamp >= datetime.fromisoformat(start_str.replace('Z', '+00:00')))
-    if end_str:
-        query = query.filter(DataPoint.timestamp <= datetime.fromisoformat(end_str.replace('Z', '+00:00')))
-    
-    points = query.order_by(DataPoint.timestamp).all()
-    
-    # Generate CSV in memory
-    import io
-    import csv
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['timestamp', 'metric', 'value'])
-    
-    for p in points:
-        writer.writerow([p.timestamp.isoformat(), p.metric, p.value])
-        
-    output.seek(0)
-    
-    from flask import Response
+    storage = get_storage(dataset)
+    metrics = [target_metric] if target_metric else storage.metrics(dataset_id)
+
+    def csv_text(rows):
+        output = io.StringIO()
+        csv.writer(output).writerows(rows)
+        return output.getvalue()
+
+    # Stream the CSV batch by batch, so memory stays constant whatever the export size
+    def generate_csv():
+        if layout == 'wide':
+            yield csv_text([[storage.time_column(dataset_id) or 'timestamp'] + metrics])
+            for timestamps, values in storage.iter_wide(dataset_id, metrics, start=start, end=end):
+                cells = np.where(np.isnan(values), '', values.astype(str))
+                yield csv_text(np.column_stack([isoformat_timestamps(timestamps), cells]).tolist())
+        else:
+            yield csv_text([['timestamp', 'metric', 'value']])
+            for batch in storage.iter_rows(dataset_id, metrics=metrics, start=start, end=end):
+                yield csv_text([ts.isoformat(), metric, value] for ts, metric, value in batch)
+
+    def generate_gzip():
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        for text_chunk in generate_csv():
+            data = compressor.compress(text_chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    filename = f"data_{dataset_id}.csv"
+    if compress == 'gzip':
+        return Response(
+            stream_with_context(generate_gzip()),
+            mimetype="application/gzip",
+            headers={"Content-disposition": f"attachment; filename={filename}.gz"}
+        )
     return Response(
-        output.getvalue(),
+        stream_with_context(generate_csv()),
         mimetype="text/csv",
-        headers={"Content-disposition": f"attachment; filename=data_{dataset_id}.csv"}
+        headers={"Content-disposition": f"attachment; filename={filename}"}
     )
 
+with app.app_context():
+    init_schema()
+
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
     app.run(debug=True, port=5001)
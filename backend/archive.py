@@ -0,0 +1,114 @@
+import os
+import gzip
+import time
+import shutil
+import threading
+
+# Raw uploads after ingest.
+#
+# Once a CSV is ingested it is only read again to re-ingest its dataset, so it
+# is gzip-compressed next to itself (<name>.gz), streaming, into a temporary
+# file that is renamed into place when complete; the caller points the jobs at
+# the archive and then removes the original. Numeric CSV shrinks about 5-10x.
+# Ingest reads archives directly (ingest.open_csv), decompressing as it parses,
+# so nothing is ever expanded back onto the disk. A retention policy bounds
+# the directory: archives older than max_age and the oldest archives past
+# max_bytes in total are removed. Several processes may sweep the same
+# directory; the temporary file is created exclusively, so only one of them
+# compresses a given upload.
+
+SUFFIX = '.gz'
+PARTIAL_SUFFIX = '.part'
+COPY_BYTES = 1024 * 1024
+# A temporary file nobody has written to for this long was left by a dead process
+STALE_PARTIAL_SECONDS = 600
+# Typical compression ratio of a CSV, to size archives for decisions made on CSV bytes
+TYPICAL_RATIO = 5
+
+
+def is_archive(path):
+    return path.endswith(SUFFIX)
+
+
+def compress(path, level=1):
+    """gzip path to path + SUFFIX and return the archive's path, keeping the original.
+
+    Returns None when another process is compressing the same file.
+    """
+    target = path + SUFFIX
+    partial = target + PARTIAL_SUFFIX
+    try:
+        raw = open(partial, 'xb')
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(partial) < STALE_PARTIAL_SECONDS:
+                return None
+            os.remove(partial)
+        except FileNotFoundError:
+            pass
+        return compress(path, level)
+    try:
+        with raw, open(path, 'rb') as src, \
+                gzip.GzipFile(os.path.basename(path), 'wb', compresslevel=level, fileobj=raw, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, COPY_BYTES)
+        os.replace(partial, target)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+    return target
+
+
+def prune(directory, max_age=None, max_bytes=None, keep=()):
+    """Remove archives older than max_age seconds, then the oldest until at most max_bytes remain.
+
+    Archives in keep (still to be read) are never removed, though they count
+    towards max_bytes. Returns the paths removed.
+    """
+    archives = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not is_archive(path):
+            continue
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        archives.append((stat.st_mtime, stat.st_size, path))
+    archives.sort()
+
+    cutoff = time.time() - max_age if max_age else None
+    total = sum(size for _, size, _ in archives)
+    removed = []
+    for mtime, size, path in archives:
+        if not (cutoff is not None and mtime < cutoff or max_bytes and total > max_bytes):
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Upload archiver: failed to remove {path}: {e}")
+            continue
+        total -= size
+        removed.append(path)
+    return removed
+
+
+def start_janitor(sweep, interval=60):
+    """Run sweep() every interval seconds in a daemon thread."""
+    def run():
+        while True:
+            try:
+                sweep()
+            except Exception as e:
+                print(f"Upload archiver: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='upload-archiver', daemon=True)
+    thread.start()
+    return thread
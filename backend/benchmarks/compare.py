@@ -0,0 +1,41 @@
+"""Compare two benchmark result files written by run.py.
+
+Usage (from backend/):
+    python benchmarks/compare.py before.json after.json
+"""
+import sys
+import json
+
+
+def change(before, after):
+    if not before:
+        return ''
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.strip())
+    with open(sys.argv[1]) as f:
+        before = json.load(f)
+    with open(sys.argv[2]) as f:
+        after = json.load(f)
+
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    if before['params'] != after['params']:
+        print('warning: the runs used different parameters')
+
+    old, new = before['ingest']['rows_per_sec'], after['ingest']['rows_per_sec']
+    print(f"{'ingest rows/s':<22}{old:>12}{new:>12}{change(old, new):>10}")
+    for kind in ('self', 'children'):
+        old, new = before['peak_rss_mb'][kind], after['peak_rss_mb'][kind]
+        print(f"{'peak RSS MB (' + kind + ')':<22}{old:>12}{new:>12}{change(old, new):>10}")
+
+    print(f"\n{'p95 ms':<22}{'before':>12}{'after':>12}{'change':>10}")
+    for name, stats in after['endpoints'].items():
+        old = before['endpoints'].get(name, {}).get('p95_ms')
+        print(f"{name:<22}{old if old is not None else '-':>12}{stats['p95_ms']:>12}{change(old, stats['p95_ms']):>10}")
+
+
+if __name__ == '__main__':
+    main()
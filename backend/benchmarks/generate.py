@@ -0,0 +1,83 @@
+"""Synthetic time-series CSV generator for the benchmarks.
+
+Usage (from backend/):
+    python benchmarks/generate.py out.csv [--rows 1000000] [--metrics 10]
+        [--date-format iso] [--nan-density 0.01] [--interval 1] [--seed 0]
+
+One time column followed by metric_0 .. metric_N-1 random walks; about
+nan-density of the cells are left empty.
+"""
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+# Time column layouts the ingest path has to recognise
+DATE_FORMATS = {
+    'iso': '%Y-%m-%d %H:%M:%S',
+    'iso-t': '%Y-%m-%dT%H:%M:%S',
+    'iso-ms': '%Y-%m-%d %H:%M:%S.%f',
+    'iso-offset': '%Y-%m-%dT%H:%M:%S+08:00',
+    'us': '%m/%d/%Y %H:%M:%S',
+    'eu': '%d.%m.%Y %H:%M:%S',
+}
+
+WRITE_ROWS = 100000
+
+
+def format_timestamps(timestamps, date_format):
+    if date_format == 'iso':
+        # datetime_as_string is an order of magnitude faster than strftime
+        return np.char.replace(np.datetime_as_string(timestamps, unit='s'), 'T', ' ')
+    if date_format == 'iso-t':
+        return np.datetime_as_string(timestamps, unit='s')
+    text = pd.DatetimeIndex(timestamps).strftime(DATE_FORMATS[date_format])
+    if date_format == 'iso-ms':
+        text = text.str[:-3]
+    return np.asarray(text)
+
+
+def generate(path, rows, metrics, date_format='iso', nan_density=0.01, interval=1, seed=0):
+    """Write the CSV to path; returns its size in bytes."""
+    if date_format not in DATE_FORMATS:
+        raise ValueError(f"Invalid date format {date_format!r}, expected one of {', '.join(DATE_FORMATS)}")
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-01-01T00:00:00', 'ms')
+    step = np.timedelta64(int(interval * 1000), 'ms')
+    columns = ['timestamp'] + [f'metric_{i}' for i in range(metrics)]
+    level = np.zeros(metrics)
+
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(columns) + '\n')
+        for offset in range(0, rows, WRITE_ROWS):
+            count = min(WRITE_ROWS, rows - offset)
+            timestamps = start + (offset + np.arange(count)) * step
+            walk = level + np.cumsum(rng.normal(scale=0.1, size=(count, metrics)), axis=0)
+            level = walk[-1]
+            values = walk.round(4)
+            if nan_density > 0:
+                values[rng.random(values.shape) < nan_density] = np.nan
+            frame = pd.DataFrame(values, columns=columns[1:])
+            frame.insert(0, 'timestamp', format_timestamps(timestamps, date_format))
+            frame.to_csv(f, header=False, index=False)
+        return f.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--metrics', type=int, default=10)
+    parser.add_argument('--date-format', choices=DATE_FORMATS, default='iso')
+    parser.add_argument('--nan-density', type=float, default=0.01)
+    parser.add_argument('--interval', type=float, default=1, help='seconds between rows')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    size = generate(args.path, args.rows, args.metrics, args.date_format,
+                    args.nan_density, args.interval, args.seed)
+    print(f"Wrote {args.rows} rows x {args.metrics} metrics ({size / 1e6:.1f} MB) to {args.path}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
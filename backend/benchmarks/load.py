@@ -0,0 +1,239 @@
+"""Load test: how many concurrent chart users one backend can sustain.
+
+Usage (from backend/):
+    python benchmarks/load.py [--url http://localhost:5000] [--users 1,5,10,20,50]
+        [--duration 30] [--think 1.0] [--downloads 2] [--slo-ms 1000]
+
+Without --url, starts gunicorn with gunicorn.conf.py on a temporary DATA_DIR
+and uploads a generated CSV (--rows, --metrics) first; GUNICORN_* variables
+select the worker setup under test. With --url, runs against that server and
+the first ready dataset (or --dataset).
+
+Every simulated user behaves like the chart page: it loads the stats, then
+keeps zooming to random windows of the dataset (binary /api/data with the
+chart's point budget), pausing --think seconds between steps. --downloads
+clients stream full CSV downloads in a loop meanwhile, and a probe measures
+/api/health. Each level of --users runs for --duration seconds; the highest
+level whose /api/data p95 stays within --slo-ms without errors is reported
+as sustained. Results are written as JSON like run.py's.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+import numpy as np
+
+from generate import generate
+from run import percentiles, git_commit, BACKEND_DIR, RESULTS_DIR
+
+COLUMNS_MIME = 'application/vnd.dataview.columns'
+
+
+def fetch(url, headers=None, data=None, timeout=60):
+    request = urllib.request.Request(url, data=data, headers=headers or {})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        while response.read(1024 * 1024):
+            pass
+        return response.status
+
+
+def get_json(url, timeout=60):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def start_server(data_dir, port):
+    env = dict(os.environ, DATA_DIR=data_dir, GUNICORN_BIND=f'127.0.0.1:{port}')
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', 'app:app'], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            fetch(url + '/api/health', timeout=1)
+            return server, url
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn did not come up within 60s')
+
+
+def upload_dataset(url, data_dir, rows, metrics):
+    path = os.path.join(data_dir, 'load.csv')
+    generate(path, rows, metrics)
+    boundary = f'----load{time.time_ns()}'
+    with open(path, 'rb') as f:
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="load.csv"\r\n'
+                f'Content-Type: text/csv\r\n\r\n').encode() + f.read() + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url + '/api/upload', data=body,
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        dataset_id = json.load(response)['id']
+    deadline = time.monotonic() + 3600
+    while time.monotonic() < deadline:
+        jobs = get_json(f'{url}/api/jobs?dataset_id={dataset_id}')
+        if jobs and jobs[0]['status'] == 'done':
+            return dataset_id
+        if jobs and jobs[0]['status'] == 'failed':
+            raise RuntimeError(f"Ingest failed: {jobs[0]['error']}")
+        time.sleep(0.2)
+    raise RuntimeError('Ingest did not finish')
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def timed(self, name, url, headers=None):
+        t0 = time.perf_counter()
+        try:
+            fetch(url, headers)
+        except (OSError, urllib.error.HTTPError) as e:
+            with self._lock:
+                self.errors[name] = self.errors.get(name, 0) + 1
+                self.errors.setdefault('last', str(e))
+            return
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+
+
+def chart_user(url, dataset_id, metrics, first, last, think, stop, recorder, rng):
+    recorder.timed('stats', f'{url}/api/stats/{dataset_id}')
+    span = last - first
+    while not stop.is_set():
+        # Either the whole range or a random zoom window, like dragging the chart's dataZoom
+        width = span if rng.random() < 0.2 else span * rng.uniform(0.01, 0.5)
+        start = first + (span - width) * rng.random()
+        window = (f"start={np.datetime64(int(start), 'ms')}&end={np.datetime64(int(start + width), 'ms')}"
+                  if width < span else '')
+        metric = rng.choice(metrics)
+        recorder.timed('data', f'{url}/api/data/{dataset_id}?metric={metric}&points=1500&mode=minmax&{window}',
+                       {'Accept': COLUMNS_MIME})
+        stop.wait(think * rng.uniform(0.5, 1.5))
+
+
+def downloader(url, dataset_id, stop, recorder):
+    while not stop.is_set():
+        recorder.timed('download', f'{url}/api/download/{dataset_id}?layout=wide')
+
+
+def health_probe(url, stop, recorder):
+    while not stop.is_set():
+        recorder.timed('health', f'{url}/api/health')
+        stop.wait(0.25)
+
+
+def run_level(url, dataset_id, metrics, first, last, users, args):
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [threading.Thread(target=health_probe, args=(url, stop, recorder))]
+    threads += [threading.Thread(target=downloader, args=(url, dataset_id, stop, recorder))
+                for _ in range(args.downloads)]
+    threads += [threading.Thread(target=chart_user, args=(url, dataset_id, metrics, first, last, args.think,
+                                                          stop, recorder, random.Random(i)))
+                for i in range(users)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=120)
+
+    data = recorder.samples.get('data', [])
+    result = {
+        'users': users,
+        'data_per_sec': round(len(data) / args.duration, 2),
+        'errors': {k: v for k, v in recorder.errors.items() if k != 'last'},
+        'endpoints': {name: percentiles(samples) for name, samples in recorder.samples.items()},
+    }
+    if 'last' in recorder.errors:
+        result['last_error'] = recorder.errors['last']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='server to test (default: start gunicorn on a temporary DATA_DIR)')
+    parser.add_argument('--dataset', type=int, help='dataset id (default: the first ready one)')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--metrics', type=int, default=10)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--users', default='1,5,10,20,50', help='comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per level')
+    parser.add_argument('--think', type=float, default=1.0, help='mean pause between a user\'s requests')
+    parser.add_argument('--downloads', type=int, default=2, help='concurrent full CSV downloads')
+    parser.add_argument('--slo-ms', type=float, default=1000, help='/api/data p95 target')
+    parser.add_argument('--output', help='result file (default benchmarks/results/load-<commit>-<time>.json)')
+    args = parser.parse_args()
+    levels = [int(n) for n in args.users.split(',')]
+
+    server = None
+    data_dir = None
+    url = args.url
+    try:
+        if not url:
+            data_dir = tempfile.mkdtemp(prefix='dataview-load-')
+            server, url = start_server(data_dir, args.port)
+            print(f"Started gunicorn on {url}, uploading {args.rows} rows x {args.metrics} metrics", file=sys.stderr)
+            dataset_id = upload_dataset(url, data_dir, args.rows, args.metrics)
+        else:
+            url = url.rstrip('/')
+            dataset_id = args.dataset or next(d['id'] for d in get_json(url + '/api/datasets') if d['status'] == 'ready')
+
+        stats = get_json(f'{url}/api/stats/{dataset_id}')
+        metrics = [s['metric'] for s in stats]
+        first = np.datetime64(min(s['first_timestamp'] for s in stats), 'ms').astype(np.int64)
+        last = np.datetime64(max(s['last_timestamp'] for s in stats), 'ms').astype(np.int64)
+
+        results = []
+        for users in levels:
+            result = run_level(url, dataset_id, metrics, first, last, users, args)
+            results.append(result)
+            data = result['endpoints'].get('data', {})
+            health = result['endpoints'].get('health', {})
+            print(f"{users:>5} users  {result['data_per_sec']:>7} data req/s  "
+                  f"data p95 {data.get('p95_ms', float('nan')):>8.1f} ms  "
+                  f"health p95 {health.get('p95_ms', float('nan')):>7.1f} ms  "
+                  f"errors {sum(result['errors'].values())}", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    sustained = max((r['users'] for r in results
+                     if not r['errors'] and r['endpoints'].get('data', {}).get('p95_ms', float('inf')) <= args.slo_ms),
+                    default=0)
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"load-{git_commit() or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {'commit': git_commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'cpu_count': os.cpu_count(),
+                     'url': args.url, 'gunicorn': {k: v for k, v in os.environ.items() if k.startswith('GUNICORN_')}},
+            'params': {k: v for k, v in vars(args).items() if k != 'output'},
+            'levels': results,
+            'sustained_users': sustained,
+        }, f, indent=2)
+    print(f"Sustained {sustained} concurrent chart users (data p95 <= {args.slo_ms:g} ms, no errors)")
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
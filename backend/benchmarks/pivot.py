@@ -0,0 +1,101 @@
+"""Multi-metric /api/data pivot: per-point dicts of ISO strings vs. aligned arrays.
+
+Usage (from backend/):
+    python benchmarks/pivot.py [--metrics 20] [--points 5000] [--repeat 20]
+
+Metrics get staggered timelines (every one misses some timestamps the others
+have), like downsampled series picked independently per metric.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import isoformat_timestamps  # noqa: E402
+import wire  # noqa: E402
+
+
+def make_series(metrics, points, seed=0):
+    rng = np.random.default_rng(seed)
+    base = np.datetime64('2024-01-01T00:00:00', 'ns') + np.arange(points * 2) * np.timedelta64(1, 's')
+    series = {}
+    for i in range(metrics):
+        picked = np.sort(rng.choice(len(base), size=points, replace=False))
+        values = rng.normal(size=points)
+        values[rng.random(points) < 0.01] = np.nan
+        series[f'metric_{i}'] = (base[picked], values)
+    return series
+
+
+def pivot_dicts(series):
+    # The previous implementation: a timestamp -> value dict per metric, looked up point by point
+    data_map = {}
+    all_timestamps = set()
+    for metric, (timestamps, values) in series.items():
+        ts_strings = isoformat_timestamps(timestamps).tolist()
+        all_timestamps.update(ts_strings)
+        data_map[metric] = dict(zip(ts_strings, values.tolist()))
+    sorted_timestamps = sorted(all_timestamps)
+    return {
+        'timestamps': sorted_timestamps,
+        'series': [
+            {'name': metric, 'type': 'line', 'data': [values.get(ts, None) for ts in sorted_timestamps]}
+            for metric, values in data_map.items()
+        ]
+    }
+
+
+def pivot_arrays(series):
+    timestamps, columns = wire.align(series)
+    return {
+        'timestamps': isoformat_timestamps(timestamps).tolist(),
+        'series': [
+            {'name': metric, 'type': 'line', 'data': np.where(np.isnan(values), None, values).tolist()}
+            for metric, values in columns.items()
+        ]
+    }
+
+
+def timed(fn, series, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(series)
+        samples.append(time.perf_counter() - t0)
+    return float(np.median(samples))
+
+
+def same_output(a, b):
+    if a['timestamps'] != b['timestamps'] or len(a['series']) != len(b['series']):
+        return False
+    for x, y in zip(a['series'], b['series']):
+        # NaN points came out as NaN before and as null now
+        left = [None if v is not None and v != v else v for v in x['data']]
+        if x['name'] != y['name'] or left != y['data']:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--metrics', type=int, default=20)
+    parser.add_argument('--points', type=int, default=5000, help='points per metric')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    series = make_series(args.metrics, args.points)
+    if not same_output(pivot_dicts(series), pivot_arrays(series)):
+        sys.exit('Pivot implementations disagree')
+
+    before = timed(pivot_dicts, series, args.repeat)
+    after = timed(pivot_arrays, series, args.repeat)
+    print(f"{args.metrics} metrics x {args.points} points, median of {args.repeat} runs")
+    print(f"  dict pivot:  {before * 1000:8.1f} ms")
+    print(f"  array pivot: {after * 1000:8.1f} ms  ({before / after:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
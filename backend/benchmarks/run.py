@@ -0,0 +1,220 @@
+"""Backend benchmark: ingest throughput, endpoint latency percentiles and peak RSS.
+
+Usage (from backend/):
+    python benchmarks/run.py [--rows 1000000] [--metrics 10] [--date-format iso]
+        [--nan-density 0.01] [--storage columnar] [--executor process]
+        [--requests 50] [--output results.json]
+
+Generates a synthetic CSV, then drives the app through Flask's test client
+against a temporary DATA_DIR: chunked upload, merge, the ingest job, and
+/api/data, /api/stats and /api/download. The response cache is disabled
+unless --cache is given, so every request does the full work. Results are
+written as JSON (by default to benchmarks/results/<commit>-<time>.json);
+compare two runs with benchmarks/compare.py.
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from generate import generate, DATE_FORMATS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+CHUNK_SIZE = 5 * 1024 * 1024
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        'n': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def check(response, expected=200):
+    if response.status_code != expected:
+        raise RuntimeError(f"{response.request.path}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def upload(client, path, timings):
+    size = os.path.getsize(path)
+    upload_id = f"bench-{os.getpid()}-{time.time_ns()}"
+    with open(path, 'rb') as f:
+        for index in range(-(-size // CHUNK_SIZE)):
+            form = {
+                'uploadId': upload_id,
+                'chunkIndex': str(index),
+                'chunkSize': str(CHUNK_SIZE),
+                'totalSize': str(size),
+                'file': (io.BytesIO(f.read(CHUNK_SIZE)), 'blob'),
+            }
+            t0 = time.perf_counter()
+            check(client.post('/api/upload/chunk', data=form, content_type='multipart/form-data'))
+            timings['upload_chunk'].append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    dataset = check(client.post('/api/upload/merge', json={'uploadId': upload_id, 'filename': os.path.basename(path)})).json
+    timings['upload_merge'].append(time.perf_counter() - t0)
+    return dataset['id'], t0
+
+
+def wait_for_ingest(client, dataset_id, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = check(client.get(f'/api/jobs?dataset_id={dataset_id}')).json
+        if jobs and jobs[0]['status'] in ('done', 'failed'):
+            if jobs[0]['status'] == 'failed':
+                raise RuntimeError(f"Ingest failed: {jobs[0]['error']}")
+            return jobs[0]
+        time.sleep(0.05)
+    raise RuntimeError(f"Ingest did not finish within {timeout}s")
+
+
+def endpoint_requests(dataset_id, metric, first, last, repeat, download_repeat):
+    # name -> (path, headers, repetitions)
+    middle = first + (last - first) / 2
+    window = f"start={(middle - (last - first) / 20).isoformat()}&end={(middle + (last - first) / 20).isoformat()}"
+    binary = {'Accept': 'application/vnd.dataview.columns'}
+    return {
+        'data_all_metrics': (f'/api/data/{dataset_id}', {}, repeat),
+        'data_metric_minmax': (f'/api/data/{dataset_id}?metric={metric}&mode=minmax', {}, repeat),
+        'data_metric_lttb': (f'/api/data/{dataset_id}?metric={metric}&mode=lttb', {}, repeat),
+        'data_metric_binary': (f'/api/data/{dataset_id}?metric={metric}&mode=minmax', binary, repeat),
+        'data_metric_window': (f'/api/data/{dataset_id}?metric={metric}&{window}', {}, repeat),
+        'stats': (f'/api/stats/{dataset_id}', {}, repeat),
+        'stats_window': (f'/api/stats/{dataset_id}?{window}', {}, repeat),
+        'download_long': (f'/api/download/{dataset_id}', {}, download_repeat),
+        'download_wide': (f'/api/download/{dataset_id}?layout=wide', {}, download_repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--metrics', type=int, default=10)
+    parser.add_argument('--date-format', choices=DATE_FORMATS, default='iso')
+    parser.add_argument('--nan-density', type=float, default=0.01)
+    parser.add_argument('--csv', help='use this CSV instead of generating one')
+    parser.add_argument('--storage', choices=('columnar', 'eav'), default='columnar')
+    parser.add_argument('--executor', choices=('process', 'thread'), default='process')
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint')
+    parser.add_argument('--download-requests', type=int, default=3)
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    parser.add_argument('--ingest-timeout', type=float, default=3600)
+    parser.add_argument('--output', help='result file (default benchmarks/results/<commit>-<time>.json)')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary DATA_DIR')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='dataview-bench-')
+    # The app reads its configuration at import time
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['STORAGE_BACKEND'] = args.storage
+    os.environ['INGEST_EXECUTOR'] = args.executor
+    if not args.cache:
+        os.environ['RESPONSE_CACHE_BYTES'] = '0'
+        os.environ.pop('RESPONSE_CACHE_DIR', None)
+    sys.path.insert(0, BACKEND_DIR)
+    from app import app
+
+    try:
+        csv_path = args.csv
+        if not csv_path:
+            csv_path = os.path.join(data_dir, 'bench.csv')
+            t0 = time.perf_counter()
+            generate(csv_path, args.rows, args.metrics, args.date_format, args.nan_density)
+            print(f"Generated {args.rows} rows x {args.metrics} metrics in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        csv_bytes = os.path.getsize(csv_path)
+
+        client = app.test_client()
+        timings = {'upload_chunk': [], 'upload_merge': []}
+        dataset_id, merged_at = upload(client, csv_path, timings)
+        job = wait_for_ingest(client, dataset_id, args.ingest_timeout)
+        ingest_seconds = time.perf_counter() - merged_at
+        ingest = {
+            'rows': job['rows_ingested'],
+            'rows_dropped': job['rows_dropped'],
+            'time_format': job['time_format'],
+            'bytes': csv_bytes,
+            'seconds': round(ingest_seconds, 3),
+            'rows_per_sec': round(job['rows_ingested'] / ingest_seconds),
+            'mb_per_sec': round(csv_bytes / 1e6 / ingest_seconds, 2),
+        }
+        print(f"Ingested {ingest['rows']} rows in {ingest_seconds:.2f}s ({ingest['rows_per_sec']} rows/s)", file=sys.stderr)
+
+        stats = check(client.get(f'/api/stats/{dataset_id}')).json
+        first = np.datetime64(min(s['first_timestamp'] for s in stats)).astype('datetime64[s]').item()
+        last = np.datetime64(max(s['last_timestamp'] for s in stats)).astype('datetime64[s]').item()
+        requests = endpoint_requests(dataset_id, stats[0]['metric'], first, last, args.requests, args.download_requests)
+        for name, (path, headers, repeat) in requests.items():
+            samples = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                response = check(client.get(path, headers=headers))
+                response.get_data()  # drain streamed bodies
+                samples.append(time.perf_counter() - t0)
+            timings[name] = samples
+
+        endpoints = {name: percentiles(samples) for name, samples in timings.items() if samples}
+        result = {
+            'meta': {
+                'commit': git_commit(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'params': {k: v for k, v in vars(args).items() if k not in ('output', 'keep')},
+            'ingest': ingest,
+            'endpoints': endpoints,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{result['meta']['commit'] or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print(f"{'endpoint':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, p in endpoints.items():
+        print(f"{name:<22}{p['p50_ms']:>10.1f}{p['p95_ms']:>10.1f}{p['p99_ms']:>10.1f}")
+    print(f"peak RSS: {result['peak_rss_mb']['self']} MB (children {result['peak_rss_mb']['children']} MB)")
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
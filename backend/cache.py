@@ -0,0 +1,117 @@
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Bounded cache for finished response bodies.
+#
+# Two tiers: an in-process LRU bounded by total bytes, and an optional on-disk
+# tier shared by every gunicorn worker on the host. Keys always embed the
+# dataset version, so a worker can never serve a body from before a re-ingest
+# even if it missed the invalidation; invalidate() just frees the space early.
+
+class ResponseCache:
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (dataset_id, body)
+        self._size = 0
+        self._disk_written = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(dataset_id, version, path, args, variant=''):
+        # variant: anything else the body depends on, e.g. the negotiated content type
+        query = '&'.join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+        digest = hashlib.sha1(f"{version}|{variant}|{path}?{query}".encode('utf-8')).hexdigest()
+        return f"{dataset_id}/{digest}"
+
+    @staticmethod
+    def etag(key):
+        return key.replace('/', '-')
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, *key.split('/'))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        self._remember(key, body)
+        return body
+
+    def put(self, key, body):
+        self._remember(key, body)
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Response cache: failed to write {path}: {e}")
+            return
+        self._disk_written += len(body)
+        if self.disk_max_bytes and self._disk_written > self.disk_max_bytes // 10:
+            self._disk_written = 0
+            self._prune_disk()
+
+    def _remember(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        dataset_id = key.split('/', 1)[0]
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (dataset_id, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _prune_disk(self):
+        # Drop the least recently written files until the tier is back under 80% of its budget
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes * 0.8:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def invalidate(self, dataset_id):
+        dataset_id = str(dataset_id)
+        with self._lock:
+            for key in [k for k, (d, _) in self._entries.items() if d == dataset_id]:
+                self._size -= len(self._entries.pop(key)[1])
+        if self.disk_dir:
+            shutil.rmtree(os.path.join(self.disk_dir, dataset_id), ignore_errors=True)
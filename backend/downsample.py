@@ -0,0 +1,117 @@
+import numpy as np
+
+# Downsampling of one (timestamps, values) series down to a target point count.
+#
+# Both modes return sorted indices into the input arrays, so callers can slice
+# timestamps and values (or any aligned array) the same way:
+#   lttb    Largest-Triangle-Three-Buckets, keeps the visual shape of the line
+#   minmax  the minimum and maximum of every bucket, so no spike is ever dropped
+# Work is done bucket by bucket on slices, so no full-size temporaries are
+# allocated whatever the size of the input range.
+
+MODES = ('lttb', 'minmax')
+
+# Buckets handled per vectorized step in minmax mode
+_MINMAX_BLOCK = 1 << 20
+# Buckets converted and averaged per vectorized step in lttb mode
+_LTTB_BLOCK = 256
+
+
+def _raw(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.view('int64')
+    return x
+
+
+def _offsets(x, origin):
+    # Subtract in integer space first so nanosecond timestamps keep their precision
+    return (_raw(x) - origin).astype('float64')
+
+
+def lttb(x, y, threshold):
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket k covers [edges[k], edges[k + 1]); first and last points are kept as is
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    origin = _raw(x[:1])[0]
+
+    # Buckets are converted to float offsets a block at a time: the centroids of
+    # a block are summed with reduceat, only the picks below are sequential
+    bounds = np.append(edges, n)
+    counts = np.diff(bounds)
+    centroid_x = np.empty(threshold - 1)
+    centroid_y = np.empty(threshold - 1)
+    for first in range(0, threshold - 1, _LTTB_BLOCK):
+        last = min(first + _LTTB_BLOCK, threshold - 1)
+        lo, hi = bounds[first], bounds[last]
+        starts = bounds[first:last] - lo
+        bx = _offsets(x[lo:hi], origin)
+        by = np.asarray(y[lo:hi], dtype='float64')
+        centroid_x[first:last] = np.add.reduceat(bx, starts)
+        centroid_y[first:last] = np.add.reduceat(by, starts)
+    centroid_x = (centroid_x / counts).tolist()
+    centroid_y = (centroid_y / counts).tolist()
+    bounds = bounds.tolist()
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    ax = 0.0
+    ay = float(y[0])
+    for k in range(threshold - 2):
+        if k % _LTTB_BLOCK == 0:
+            block_lo, block_hi = bounds[k], bounds[min(k + _LTTB_BLOCK, threshold - 1)]
+            block_x = _offsets(x[block_lo:block_hi], origin)
+            block_y = np.asarray(y[block_lo:block_hi], dtype='float64')
+        lo, hi = bounds[k] - block_lo, bounds[k + 1] - block_lo
+        bx = block_x[lo:hi]
+        by = block_y[lo:hi]
+        # Twice the triangle area between the previous pick, each candidate and the next centroid
+        area = np.abs((ax - centroid_x[k + 1]) * (by - ay) - (ax - bx) * (centroid_y[k + 1] - ay))
+        pick = int(np.argmax(area))
+        indices[k + 1] = bounds[k] + pick
+        ax = bx[pick]
+        ay = by[pick]
+    return indices
+
+
+def minmax(y, threshold):
+    n = len(y)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+
+    buckets = max(threshold // 2, 1)
+    size = -(-n // buckets)  # ceil
+    picked = []
+    for first in range(0, buckets, _MINMAX_BLOCK):
+        lo = first * size
+        hi = min((first + _MINMAX_BLOCK) * size, n)
+        if lo >= hi:
+            break
+        block = np.asarray(y[lo:hi], dtype='float64')
+        rows = -(-len(block) // size)
+        # Pad the last bucket with NaN so the block reshapes to (rows, size)
+        padded = np.full(rows * size, np.nan)
+        padded[:len(block)] = block
+        padded = padded.reshape(rows, size)
+        base = lo + np.arange(rows) * size
+        picked.append(base + np.nanargmin(padded, axis=1))
+        picked.append(base + np.nanargmax(padded, axis=1))
+
+    return np.unique(np.concatenate(picked + [np.array([0, n - 1])]))
+
+
+def downsample(timestamps, values, threshold, mode='lttb'):
+    """Return (timestamps, values) reduced to about `threshold` points."""
+    if len(values) <= threshold:
+        return timestamps, values
+    if mode == 'minmax':
+        indices = minmax(values, threshold)
+    else:
+        indices = lttb(timestamps, values, threshold)
+    return np.asarray(timestamps[indices]), np.asarray(values[indices])
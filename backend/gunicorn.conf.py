@@ -0,0 +1,32 @@
+import os
+
+# Gunicorn settings (used by the Docker image: gunicorn -c gunicorn.conf.py app:app)
+#
+# Threaded workers: every worker process serves GUNICORN_THREADS requests at
+# once, so a slow /api/download or a large /api/data no longer takes a whole
+# worker and /api/health and the upload endpoints stay responsive. The app is
+# thread-safe: sessions are scoped to the request's app context, SQLite writes
+# are serialized by sqlite_engines, and the response cache and metrics take
+# their own locks. The heavy parts (SQLite reads, numpy, file I/O) release the
+# GIL, so threads overlap well; ingest parsing runs in its own processes. Those
+# are started with forkserver, never forked from a threaded worker, where a
+# child could inherit a lock another request thread was holding.
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# With gthread the worker's main loop keeps heartbeating while requests run, so
+# this only catches a hung worker; it does not cut off long downloads
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+graceful_timeout = 30
+# Idle keep-alive connections are parked in the worker's poller, not on a thread
+keepalive = 5
+
+
+def post_worker_init(worker):
+    # Start the ingest workers (and the recovery of jobs a dead worker left
+    # running) as soon as the worker is up, not with its first request: an idle
+    # deployment would otherwise leave queued jobs waiting indefinitely
+    from app import start_background_workers
+    start_background_workers()
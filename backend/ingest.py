@@ -0,0 +1,526 @@
+import io
+import os
+import gzip
+import time
+import itertools
+import re
+import multiprocessing
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import archive
+
+# CSV parsing for ingest jobs.
+#
+# read_layout() inspects the header once (kept columns, time column, value
+# columns) and detects the time format from a sample of the first rows, so
+# every chunk is parsed with the same fixed format instead of pandas guessing
+# (slowly, and possibly differently) per chunk. The chunk iterators then yield (timestamps, values, rows_read,
+# bytes_read) in file order for the single writer in process_csv_task:
+#   iter_chunks     one pandas reader, 10k rows at a time, on the calling core
+#   iter_parallel   newline-aligned byte ranges parsed in a process pool
+#   iter_growing    a file that is still being uploaded, parsed as its prefix grows
+# Byte ranges are cut at line breaks, so files with quoted fields that contain
+# newlines must use iter_chunks. Compressed uploads (archive.py) are read
+# through open_csv; bytes_read then counts compressed bytes, like the file size.
+
+CHUNK_ROWS = 10000
+# Parse pools are forked from a forkserver that has only imported this module:
+# the processes starting them serve requests on several threads, and a plain
+# fork could copy a lock another thread holds into the child
+_POOL_CONTEXT = multiprocessing.get_context('forkserver')
+_POOL_CONTEXT.set_forkserver_preload([__name__])
+RANGE_BYTES = 16 * 1024 * 1024
+# The time format is detected from at most this many rows at the start of the file
+SAMPLE_ROWS = 1000
+SAMPLE_BYTES = 256 * 1024
+# A detected format has to parse at least this share of the sample
+MIN_PARSED = 0.9
+
+# Numeric time columns: seconds / milliseconds / ... since 1970-01-01 UTC
+EPOCH_UNITS = {'epoch_s': 's', 'epoch_ms': 'ms', 'epoch_us': 'us', 'epoch_ns': 'ns'}
+# Tried in order on the sample; ISO 8601 (any precision, T or space, offsets) first, and
+# month-first before day-first, as pandas guesses when both fit
+_DATES = ['%Y%m%d', '%Y/%m/%d', '%m/%d/%Y', '%d/%m/%Y', '%d.%m.%Y', '%d-%m-%Y']
+_TIMES = ['', ' %H:%M', ' %H:%M:%S', ' %H:%M:%S.%f']
+FORMAT_CANDIDATES = ['ISO8601'] + [d + t for d in _DATES for t in _TIMES]
+# Columns of plain numbers are compact dates only at exactly these widths, else epoch times
+_DIGITS = re.compile(r'-?\d+(?:\.\d+)?')
+COMPACT_FORMATS = {8: '%Y%m%d', 14: '%Y%m%d%H%M%S'}
+
+# names: every header column as pandas reads it; usecols: the ones kept;
+# date_col / value_cols: kept columns with whitespace stripped;
+# data_offset: byte offset of the first data line;
+# time_format: strftime format, 'ISO8601' or an EPOCH_UNITS key (None: guess per chunk);
+# timezone: zone whose local time is stored for offset and epoch timestamps (None: as written / UTC);
+# offsets: the sampled time values carry UTC offsets (see parse_timestamps)
+CsvLayout = namedtuple('CsvLayout', 'names usecols date_col value_cols data_offset time_format timezone offsets')
+
+
+def check_time_options(time_format=None, timezone=None):
+    """Validate user-supplied time options; raises ValueError."""
+    if time_format and time_format not in EPOCH_UNITS and time_format != 'ISO8601' and '%' not in time_format:
+        raise ValueError(f"Invalid time format {time_format!r}, expected a strftime format, "
+                         f"ISO8601 or one of {', '.join(EPOCH_UNITS)}")
+    if timezone:
+        try:
+            pd.Timestamp(0, tz=timezone)
+        except Exception:
+            raise ValueError(f"Unknown timezone {timezone!r}")
+
+
+def open_csv(file_path):
+    """Binary handle on a CSV, or on the CSV in an archive, decompressed as it is read."""
+    if archive.is_archive(file_path):
+        return gzip.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+
+def _position(f):
+    # Bytes of the file on disk consumed so far: compressed bytes for an archive
+    return f.fileobj.tell() if isinstance(f, gzip.GzipFile) else f.tell()
+
+
+def read_layout(file_path, date_col=None, time_format=None, timezone=None, end=None):
+    """Read the header and detect the time format; date_col / time_format override the detection.
+
+    end limits the sample to bytes [0, end) of a file that is still being written.
+    """
+    check_time_options(time_format, timezone)
+    header_df = pd.read_csv(file_path, nrows=0)
+    names = list(header_df.columns)
+    # Filter rule: Only keep columns that are not empty and not 'Unnamed'
+    usecols = [c for c in names if c and not str(c).startswith('Unnamed:')]
+    if not usecols:
+        raise ValueError("No valid columns found in CSV")
+
+    columns = [str(c).strip() for c in usecols]
+    if date_col:
+        if date_col.strip() not in columns:
+            raise ValueError(f"Time column {date_col!r} not found in CSV")
+        date_col = date_col.strip()
+    else:
+        # Heuristic for date column
+        date_col = next((c for c in columns if 'date' in c.lower() or 'time' in c.lower()), columns[0])
+    value_cols = [c for c in columns if c != date_col]
+
+    with open_csv(file_path) as f:
+        f.readline()
+        data_offset = f.tell()
+        # The end of an archive is only reached by decompressing all of it: sample its start
+        size = None if archive.is_archive(file_path) else os.path.getsize(file_path) if end is None else end
+        sample = _read_sample(f, data_offset, size)
+    layout = CsvLayout(names, usecols, date_col, value_cols, data_offset, time_format or None, timezone or None, False)
+    if sample.strip():
+        df = pd.read_csv(io.BytesIO(sample), header=None, names=names, usecols=usecols, dtype=_dtypes(layout))
+        df.columns = df.columns.str.strip()
+        if not time_format:
+            layout = layout._replace(time_format=detect_time_format(df[date_col]))
+        if layout.time_format == 'ISO8601' or layout.time_format and '%z' in layout.time_format:
+            # Decided once for the file, so chunks with and without an offset change parse alike
+            parts = df[date_col].dropna().astype(str).str.strip().str.extract(_OFFSET)
+            layout = layout._replace(offsets=bool(parts[[0, 1]].notna().to_numpy().any()))
+    return layout
+
+
+def _read_sample(f, data_offset, size):
+    # Complete lines from the start and, for a larger file, the end: the first rows
+    # alone may not tell day-first from month-first dates (01/02 vs 13/02).
+    # size is None for an archive, whose start is all that is sampled
+    f.seek(data_offset)
+    head = f.read(SAMPLE_BYTES if size is None else min(SAMPLE_BYTES, size - data_offset))
+    if size is None and len(head) < SAMPLE_BYTES or size is not None and data_offset + len(head) >= size:
+        return head
+    head = head[:head.rfind(b'\n') + 1]
+    if size is None:
+        return b''.join(line + b'\n' for line in head.splitlines()[:SAMPLE_ROWS])
+    tail_start = max(size - SAMPLE_BYTES, data_offset + len(head))
+    f.seek(tail_start)
+    tail = f.read(size - tail_start)
+    # Drop the partial first line, and the partial last one of a file still being written
+    tail = tail[tail.find(b'\n') + 1:] if b'\n' in tail else b''
+    tail = tail[:tail.rfind(b'\n') + 1]
+    return b''.join(line + b'\n' for line in head.splitlines()[:SAMPLE_ROWS] + tail.splitlines()[-SAMPLE_ROWS:])
+
+
+def detect_time_format(series):
+    """The format of the sample: a compact date or epoch unit for plain numbers, else the
+    first FORMAT_CANDIDATES entry that parses it; None if none does."""
+    sample = series.dropna().astype(str).str.strip()
+    sample = sample[sample != '']
+    if sample.empty:
+        return None
+    digits = sample.str.fullmatch(_DIGITS)
+    if digits.mean() >= MIN_PARSED:
+        # Told apart by width, not by what parses: 1704067200 also reads as %Y%m%d%H%M%S
+        numbers = sample[digits]
+        widths = numbers.str.len().unique()
+        compact = COMPACT_FORMATS.get(widths[0]) if len(widths) == 1 else None
+        if compact and pd.to_datetime(numbers, format=compact, errors='coerce').notna().all():
+            return compact
+        return _epoch_unit(pd.to_numeric(numbers))
+    best, best_parsed = None, MIN_PARSED
+    for time_format in FORMAT_CANDIDATES:
+        # utc: only whether values parse counts here, and mixed offsets need it
+        parsed = pd.to_datetime(sample, format=time_format, errors='coerce', utc=True).notna().mean()
+        if parsed == 1:
+            return time_format
+        if parsed >= best_parsed:
+            best, best_parsed = time_format, parsed
+    if best:
+        return best
+    numbers = pd.to_numeric(sample, errors='coerce')
+    if numbers.notna().mean() >= MIN_PARSED:
+        return _epoch_unit(numbers)
+    return None
+
+
+def _epoch_unit(numbers):
+    # Pick the unit from the magnitude: seconds since 1970 stay below 1e11 until the year 5138
+    magnitude = numbers.abs().median()
+    for unit, limit in (('epoch_s', 1e11), ('epoch_ms', 1e14), ('epoch_us', 1e17)):
+        if magnitude < limit:
+            return unit
+    return 'epoch_ns'
+
+
+def _dtypes(layout):
+    # The time column is always read as text, so e.g. 20240101 is not turned into a number
+    return {layout.usecols[[str(c).strip() for c in layout.usecols].index(layout.date_col)]: str}
+
+
+# Zero-padded fields that can be copied byte by byte into an ISO 8601 string
+_FIELDS = {'Y': (4, 0), 'm': (2, 5), 'd': (2, 8), 'H': (2, 11), 'M': (2, 14), 'S': (2, 17)}
+_ISO_TEMPLATE = b'0000-00-00T00:00:00'
+
+
+def _fixed_width_plan(time_format):
+    """(width, [(source, target) byte positions], [(position, literal byte)], ISO length), or None.
+
+    Only for formats made of %Y %m %d [%H %M [%S]] and literal separators, whose
+    values all have the same width when zero-padded.
+    """
+    if not time_format or time_format == 'ISO8601' or time_format in EPOCH_UNITS:
+        return None
+    moves, literals, fields = [], [], set()
+    position = 0
+    i = 0
+    while i < len(time_format):
+        char = time_format[i]
+        if char == '%':
+            field = time_format[i + 1:i + 2]
+            if field not in _FIELDS or field in fields:
+                return None
+            width, target = _FIELDS[field]
+            moves += [(position + k, target + k) for k in range(width)]
+            fields.add(field)
+            position += width
+            i += 2
+        else:
+            literals.append((position, ord(char)))
+            position += 1
+            i += 1
+    if not {'Y', 'm', 'd'} <= fields:
+        return None
+    for iso_length, needed in ((19, 'HMS'), (16, 'HM'), (10, '')):
+        if set(needed) <= fields and not (fields - set('Ymd' + needed)):
+            return position, moves, literals, iso_length
+    return None
+
+
+def _as_bytes(series):
+    # (n, width) uint8 matrix of the values, or None unless all are ASCII strings of one width
+    try:
+        values = series.to_numpy(dtype=object).astype('S')
+    except (UnicodeEncodeError, TypeError, ValueError):
+        return None
+    width = values.dtype.itemsize
+    matrix = values.view(np.uint8).reshape(len(values), width)
+    if width == 0 or not matrix[:, -1].all():
+        # Shorter values are padded with zero bytes
+        return None
+    return matrix
+
+
+def _parse_fixed_width(series, plan):
+    """Vectorized parse of fixed-width values; None if any value does not fit the plan."""
+    width, moves, literals, iso_length = plan
+    matrix = _as_bytes(series)
+    if matrix is None or matrix.shape[1] != width:
+        return None
+    for position, literal in literals:
+        if not (matrix[:, position] == literal).all():
+            return None
+    iso = np.empty((len(matrix), iso_length), dtype=np.uint8)
+    iso[:] = np.frombuffer(_ISO_TEMPLATE[:iso_length], dtype=np.uint8)
+    sources, targets = zip(*moves)
+    iso[:, list(targets)] = matrix[:, list(sources)]
+    try:
+        return iso.view(f'S{iso_length}').ravel().astype('datetime64[s]').astype('datetime64[ns]')
+    except ValueError:
+        # e.g. month 13: leave the value-by-value parse to mark the bad rows
+        return None
+
+
+def _parse_fixed_offset(series, timezone):
+    """ISO 8601 values that all end in the same UTC offset (or Z): parsed without it, as the
+    offset is one constant. None if the values do not have that shape."""
+    first = series.iloc[0] if len(series) else None
+    if not isinstance(first, str) or not (first.endswith('Z') or re.search(r'[+-]\d\d:\d\d$', first)):
+        return None
+    matrix = _as_bytes(series)
+    if matrix is None or matrix.shape[1] < 11:
+        return None
+    suffix = 1 if matrix[0, -1] == ord('Z') else 6
+    offset = bytes(matrix[0, -suffix:]).decode('ascii')
+    if suffix == 6 and not re.fullmatch(r'[+-]\d\d:\d\d', offset):
+        return None
+    if not (matrix[:, -suffix:] == matrix[0, -suffix:]).all():
+        return None
+    local = np.ascontiguousarray(matrix[:, :-suffix]).view(f'S{matrix.shape[1] - suffix}').ravel()
+    try:
+        timestamps = local.astype('datetime64[ns]')
+    except ValueError:
+        return None
+    if timezone:
+        # Wall-clock time at the offset -> UTC -> wall-clock time in timezone
+        aware = pd.DatetimeIndex(timestamps).tz_localize('UTC' if suffix == 1 else f'UTC{offset}')
+        return aware.tz_convert(timezone).tz_localize(None).to_numpy()
+    return timestamps
+
+
+# Offsets of ISO 8601 values: Z, or sign, hours and minutes, after a time of day
+# (so the year of a day-first date such as 01-02-2024 is not read as -20:24)
+_OFFSET = re.compile(r'[T ]\d\d:\d\d(?::\d\d(?:\.\d+)?)? ?(?:(Z)|([+-])(\d\d):?(\d\d))$')
+
+
+def _parse_offsets(series, time_format, timezone):
+    """Values with UTC offsets, which may differ (e.g. across a DST change), with the
+    same result as _parse_fixed_offset: converted to timezone, or else each kept at
+    its own wall-clock time. Values without an offset are kept as written."""
+    aware = pd.to_datetime(series, format=time_format, errors='coerce', utc=True)
+    parts = series.astype(str).str.strip().str.extract(_OFFSET)
+    minutes = (parts[2].astype('float64') * 60 + parts[3].astype('float64')).fillna(0)
+    minutes = minutes.where(parts[1] != '-', -minutes)
+    written = aware.dt.tz_localize(None) + pd.to_timedelta(minutes, unit='m')
+    if timezone:
+        has_offset = parts[0].notna() | parts[1].notna()
+        return aware.dt.tz_convert(timezone).dt.tz_localize(None).where(has_offset, written)
+    return written
+
+
+def parse_timestamps(series, time_format=None, timezone=None, offsets=False):
+    """Convert a time column to naive datetime64 (wall-clock kept); unparseable values become NaT.
+
+    Offset-aware and epoch timestamps are converted to timezone first when given
+    (epoch timestamps are UTC otherwise). Without a timezone, offset-aware values
+    keep the wall-clock time they were written with, whether or not the offsets
+    in a chunk agree, so every chunk of a file follows the same rule; offsets
+    (CsvLayout.offsets) says the column is expected to have them.
+    """
+    # pandas parses non-ISO formats value by value (and offsets slowly); the
+    # common shapes of both are converted to ISO bytes and parsed by numpy instead
+    plan = _fixed_width_plan(time_format)
+    fast = None
+    if plan:
+        fast = _parse_fixed_width(series, plan)
+    elif time_format == 'ISO8601':
+        fast = _parse_fixed_offset(series, timezone)
+    if fast is not None:
+        return pd.Series(fast, index=series.index)
+
+    if time_format in EPOCH_UNITS:
+        numbers = pd.to_numeric(series, errors='coerce')
+        timestamps = pd.to_datetime(numbers, unit=EPOCH_UNITS[time_format], errors='coerce', utc=True)
+    elif offsets:
+        return _parse_offsets(series, time_format, timezone)
+    else:
+        timestamps = pd.to_datetime(series, format=time_format, errors='coerce')
+        if not pd.api.types.is_datetime64_any_dtype(timestamps):
+            # Offsets the sample did not show, and not all the same: they come back as objects
+            return _parse_offsets(series, time_format, timezone)
+    if getattr(timestamps.dt, 'tz', None) is not None:
+        if timezone:
+            timestamps = timestamps.dt.tz_convert(timezone)
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps
+
+
+def _to_arrays(df, layout):
+    # Rows with an invalid date are dropped; non-numeric values become NaN
+    df.columns = df.columns.str.strip()
+    timestamps = parse_timestamps(df[layout.date_col], layout.time_format, layout.timezone, layout.offsets)
+    valid = timestamps.notna().to_numpy()
+    values = df.loc[valid, layout.value_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+    return timestamps[valid].to_numpy(dtype='datetime64[ns]'), values
+
+
+def iter_chunks(file_path, layout):
+    rows_read = 0
+    with open_csv(file_path) as f:
+        for df in pd.read_csv(f, chunksize=CHUNK_ROWS, usecols=layout.usecols, dtype=_dtypes(layout)):
+            rows_read += len(df)
+            timestamps, values = _to_arrays(df, layout)
+            # The handle's position is how far the parser has buffered the file
+            yield timestamps, values, rows_read, _position(f)
+
+
+def split_ranges(file_path, data_offset, range_bytes=RANGE_BYTES):
+    """Split the data lines into [(start, end)) byte ranges of about range_bytes, ending on line breaks."""
+    size = os.path.getsize(file_path)
+    bounds = [data_offset]
+    with open(file_path, 'rb') as f:
+        position = data_offset + range_bytes
+        while position < size:
+            # Finish the line that contains byte position - 1
+            f.seek(position - 1)
+            f.readline()
+            boundary = f.tell()
+            if boundary >= size:
+                break
+            bounds.append(boundary)
+            position = boundary + range_bytes
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def read_blocks(f, data_offset, block_bytes=RANGE_BYTES):
+    """Read the data lines in order as blocks of about block_bytes ending on line breaks.
+
+    Yields (block, position) with position as in _position; for handles that
+    cannot seek cheaply, such as archives.
+    """
+    f.seek(data_offset)
+    rest = b''
+    while True:
+        data = f.read(block_bytes)
+        if not data:
+            break
+        data = rest + data
+        cut = data.rfind(b'\n') + 1
+        rest = data[cut:]
+        if cut:
+            yield data[:cut], _position(f)
+    if rest:
+        yield rest, _position(f)
+
+
+def _parse_lines(data, layout):
+    try:
+        df = pd.read_csv(io.BytesIO(data), header=None, names=layout.names, usecols=layout.usecols,
+                         dtype=_dtypes(layout))
+    except pd.errors.EmptyDataError:
+        # Only blank lines
+        df = pd.DataFrame(columns=layout.usecols)
+    timestamps, values = _to_arrays(df, layout)
+    return timestamps, values, len(df)
+
+
+def parse_range(file_path, start, end, layout):
+    """Parse the complete lines in [start, end); runs in a pool worker, so it only touches the file."""
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return _parse_lines(data, layout)
+
+
+def iter_parallel(file_path, layout, workers, range_bytes=RANGE_BYTES):
+    source = None
+    if archive.is_archive(file_path):
+        # Decompressed here, in order, and handed to the workers as blocks of lines
+        source = open_csv(file_path)
+        tasks = ((position, _parse_lines, (data,))
+                 for data, position in read_blocks(source, layout.data_offset, range_bytes))
+    else:
+        tasks = ((end, parse_range, (file_path, start, end))
+                 for start, end in split_ranges(file_path, layout.data_offset, range_bytes))
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT)
+    pending = deque()
+
+    def submit(count):
+        for end, parse, args in itertools.islice(tasks, count):
+            pending.append((end, pool.submit(parse, *args, layout)))
+
+    rows_read = 0
+    try:
+        # A bounded window of ranges is in flight; results are consumed in file order
+        submit(workers * 2)
+        while pending:
+            end, future = pending.popleft()
+            timestamps, values, rows = future.result()
+            submit(1)
+            rows_read += rows
+            yield timestamps, values, rows_read, end
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if source is not None:
+            source.close()
+
+
+def wait_for_bytes(available, min_bytes, idle_timeout, poll_interval=0.5):
+    """Block until available() reports at least min_bytes (or the whole file)."""
+    deadline = time.monotonic() + idle_timeout
+    while True:
+        end, complete = available()
+        if end >= min_bytes or complete:
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Upload stalled for more than {idle_timeout:.0f}s")
+        time.sleep(poll_interval)
+
+
+def iter_growing(file_path, layout, available, idle_timeout, poll_interval=0.5):
+    """Parse a file while it is written front to back.
+
+    available() returns (end, complete): bytes [0, end) are final, and complete
+    once end is the end of the file. Reads are at most RANGE_BYTES; the partial
+    last line of every read is carried over to the next one.
+    """
+    position = layout.data_offset
+    carry = b''
+    rows_read = 0
+    deadline = time.monotonic() + idle_timeout
+    # Unbuffered positional reads: a buffered file would keep read-ahead bytes
+    # from the part of the file that has not been written yet
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        while True:
+            end, complete = available()
+            if end <= position:
+                if complete:
+                    break
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Upload stalled for more than {idle_timeout:.0f}s")
+                time.sleep(poll_interval)
+                continue
+
+            # At most RANGE_BYTES at a time, however far the upload is ahead of the parser
+            size = min(end - position, RANGE_BYTES)
+            data = carry + _pread_all(fd, size, position)
+            position += size
+            deadline = time.monotonic() + idle_timeout
+            last = complete and position == end
+            cut = len(data) if last else data.rfind(b'\n') + 1
+            lines, carry = data[:cut], data[cut:]
+            if lines.strip():
+                timestamps, values, rows = _parse_lines(lines, layout)
+                rows_read += rows
+                yield timestamps, values, rows_read, position
+            if last:
+                break
+    finally:
+        os.close(fd)
+
+
+def _pread_all(fd, size, offset):
+    parts = []
+    while size > 0:
+        data = os.pread(fd, size, offset)
+        if not data:
+            raise EOFError(f"File ended at byte {offset}")
+        parts.append(data)
+        size -= len(data)
+        offset += len(data)
+    return b''.join(parts)
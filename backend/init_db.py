@@ -1,7 +1,23 @@
 import os
-from app import app, db
+import sys
+from app import app, db, init_schema, upgrade_indexes
 
-def init_db():
+# SQLite auto_vacuum mode of a database that returns free pages on deletes
+INCREMENTAL = 2
+
+def vacuum():
+    """Compact the database file and switch it to incremental auto-vacuum.
+
+    Non-destructive: VACUUM rewrites the file with the same contents. It needs
+    free disk space about the size of the database and blocks writes while it
+    runs (it cannot run in a transaction).
+    """
+    db.session.remove()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.exec_driver_sql('VACUUM')
+
+def init_db(compact=False):
     print("Initializing database...")
     try:
         # Ensure DATA_DIR exists
@@ -9,13 +25,27 @@ def init_db():
         if data_dir and not os.path.exists(data_dir):
             print(f"Creating DATA_DIR at {data_dir}")
             os.makedirs(data_dir, exist_ok=True)
-            
+
         with app.app_context():
-            db.create_all()
+            init_schema()
             print("Database tables created successfully.")
+        # Indexes added to existing tables; holds the database's write lock while it builds
+        upgrade_indexes()
+        print("Database indexes up to date.")
+
+        with app.app_context():
+            if compact:
+                print("Compacting database, this may take a while on large databases...")
+                vacuum()
+                print("Database compacted, incremental auto-vacuum enabled.")
+            elif db.session.execute(db.text('PRAGMA auto_vacuum')).scalar() != INCREMENTAL:
+                # Created before incremental auto-vacuum: deleted datasets never shrink the file
+                print("Incremental auto-vacuum is off for this database; "
+                      "run `python init_db.py --vacuum` to enable it (keeps all data)")
+            db.session.remove()
     except Exception as e:
         print(f"Error initializing database: {e}")
         exit(1)
 
 if __name__ == "__main__":
-    init_db()
+    init_db(compact='--vacuum' in sys.argv[1:])
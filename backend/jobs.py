@@ -0,0 +1,212 @@
+import os
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func
+
+# Durable ingest job queue with a bounded worker pool.
+#
+# Jobs are rows of the job table, so they survive a worker restart. Every
+# process that imports the app runs one dispatcher thread. Dispatchers claim
+# queued jobs with a single conditional UPDATE; SQLite serializes writers, so
+# the concurrency limit holds across all gunicorn workers. A running job
+# carries the token of the dispatcher that claimed it and is heartbeated while
+# it runs; once the heartbeat goes stale (the worker died) the job is
+# re-queued, or failed when it has used up its attempts.
+
+EXECUTORS = ('process', 'thread')
+
+
+class JobLost(Exception):
+    """The job was re-queued or deleted while this process was still running it."""
+
+
+class JobQueue:
+    def __init__(self, app, db, model, run_job, workers=2, executor='process',
+                 poll_interval=1.0, stale_seconds=30, max_attempts=3, on_failed=None):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Invalid executor {executor!r}, expected one of {', '.join(EXECUTORS)}")
+        self.app = app
+        self.db = db
+        self.model = model
+        # Called as run_job(job_id, token) in a pool worker; must be a module-level function
+        self.run_job = run_job
+        self.workers = max(workers, 1)
+        self.executor_kind = executor
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        # Called as on_failed(job_id) when a job is given up on without run_job recording it
+        self.on_failed = on_failed
+        self.token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._executor = None
+        self._running = {}  # job_id -> future
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    # Dispatcher
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='ingest-dispatcher', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """Wake the dispatcher after a job was enqueued, instead of waiting for the next poll."""
+        self._wake.set()
+
+    def _loop(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    self._heartbeat()
+                    self.recover_stale()
+                    while self._free_slots() > 0:
+                        job_id = self._claim()
+                        if job_id is None:
+                            break
+                        self._submit(job_id)
+                except Exception as e:
+                    print(f"Job dispatcher error: {e}")
+                finally:
+                    self.db.session.remove()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _free_slots(self):
+        with self._lock:
+            return self.workers - len(self._running)
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == 'process':
+                # forkserver, not fork: this process serves requests on several threads,
+                # and a child forked while one of them holds a lock (response cache,
+                # metrics, ...) would deadlock on it. Each pool process imports the app
+                # (run_job's module) once, with its own connections and locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('forkserver')
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ingest')
+        return self._executor
+
+    def _submit(self, job_id):
+        future = self._get_executor().submit(self.run_job, job_id, self.token)
+        with self._lock:
+            self._running[job_id] = future
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            self._running.pop(job_id, None)
+        error = future.exception()
+        if error is not None:
+            # run_job records its own failures; getting here means the worker itself died
+            print(f"Ingest job {job_id} crashed: {error!r}")
+            if isinstance(error, BrokenProcessPool):
+                self._executor = None
+            with self.app.app_context():
+                try:
+                    self.release(job_id, self.token, str(error) or type(error).__name__)
+                finally:
+                    self.db.session.remove()
+        self._wake.set()
+
+    # Job table operations
+
+    def _table(self):
+        return self.model.__table__
+
+    def enqueue(self, **fields):
+        job = self.model(status='queued', **fields)
+        self.db.session.add(job)
+        self.db.session.commit()
+        self.notify()
+        return job
+
+    def _claim(self):
+        table = self._table()
+        candidate = self.db.session.execute(
+            select(table.c.id).where(table.c.status == 'queued').order_by(table.c.id).limit(1)
+        ).scalar()
+        if candidate is None:
+            return None
+        running = select(func.count()).select_from(table).where(table.c.status == 'running').scalar_subquery()
+        now = datetime.utcnow()
+        result = self.db.session.execute(
+            update(table)
+            .where(table.c.id == candidate, table.c.status == 'queued', running < self.workers)
+            .values(status='running', worker=self.token, attempts=table.c.attempts + 1,
+                    started_at=now, heartbeat_at=now, error=None)
+        )
+        self.db.session.commit()
+        return candidate if result.rowcount == 1 else None
+
+    def _heartbeat(self):
+        with self._lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return
+        table = self._table()
+        self.db.session.execute(
+            update(table)
+            .where(table.c.id.in_(job_ids), table.c.worker == self.token, table.c.status == 'running')
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        self.db.session.commit()
+
+    def progress(self, job_id, token, **fields):
+        """Record progress of a running job; raises JobLost if another worker has taken it over."""
+        table = self._table()
+        result = self.db.session.execute(
+            update(table)
+            .where(table.c.id == job_id, table.c.worker == token, table.c.status == 'running')
+            .values(heartbeat_at=datetime.utcnow(), **fields)
+        )
+        self.db.session.commit()
+        if result.rowcount != 1:
+            raise JobLost(f"Ingest job {job_id} is no longer owned by this worker")
+
+    def finish(self, job_id, token, status, error=None, **fields):
+        table = self._table()
+        self.db.session.execute(
+            update(table)
+            .where(table.c.id == job_id, table.c.worker == token)
+            .values(status=status, error=error, finished_at=datetime.utcnow(), **fields)
+        )
+        self.db.session.commit()
+
+    def release(self, job_id, token, error):
+        """Give a job back after its worker died: re-queue it, or fail it when out of attempts."""
+        table = self._table()
+        owned = (table.c.id == job_id, table.c.worker == token, table.c.status == 'running')
+        self.db.session.execute(
+            update(table).where(*owned, table.c.attempts < self.max_attempts)
+            .values(status='queued', worker=None, error=error)
+        )
+        failed = self.db.session.execute(
+            update(table).where(*owned)
+            .values(status='failed', error=error, finished_at=datetime.utcnow())
+        ).rowcount
+        self.db.session.commit()
+        if failed and self.on_failed:
+            self.on_failed(job_id)
+
+    def recover_stale(self):
+        """Re-queue running jobs whose worker stopped heartbeating; returns the ids touched."""
+        table = self._table()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        stale = self.db.session.execute(
+            select(table.c.id, table.c.worker)
+            .where(table.c.status == 'running', table.c.heartbeat_at < cutoff)
+        ).all()
+        for job_id, worker in stale:
+            print(f"Ingest job {job_id} lost its worker, recovering")
+            self.release(job_id, worker, 'Worker stopped while the job was running')
+        return [job_id for job_id, _ in stale]
@@ -0,0 +1,125 @@
+import math
+import numpy as np
+
+# Per-metric statistics accumulated chunk by chunk during ingest.
+#
+# Count / mean / M2 are merged with Chan et al.'s parallel update, so the
+# standard deviation is exact without a second pass; percentiles come from a
+# merging t-digest with a bounded number of centroids per metric.
+
+PERCENTILES = (25, 50, 75, 95, 99)
+
+
+class TDigest:
+    """Merging t-digest (k1 scale function); vectorized with NumPy, size bounded by `compression`."""
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))])
+        )
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means = means[order]
+        weights = weights[order]
+        total = weights.sum()
+
+        # Group neighbours whose quantile midpoints fall in the same unit of the
+        # scale function k(q) = compression / (2*pi) * asin(2q - 1): centroids stay
+        # small at the tails, where percentile accuracy matters most
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * math.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1))
+        group = np.floor(k - k[0]).astype(np.int64)
+        group = np.concatenate([[0], np.cumsum(np.diff(group) != 0)])
+
+        self.weights = np.bincount(group, weights=weights)
+        self.means = np.bincount(group, weights=weights * means) / self.weights
+
+    def quantile(self, q):
+        if len(self.means) == 0:
+            return None
+        if len(self.means) == 1:
+            return float(self.means[0])
+        positions = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.weights.sum(), positions, self.means))
+
+
+class MetricStatsBuilder:
+    """Running aggregates for every metric of one dataset, vectorized across metrics."""
+
+    def __init__(self, metrics):
+        self.metrics = list(metrics)
+        m = len(self.metrics)
+        self.count = np.zeros(m, dtype=np.int64)
+        self.null_count = np.zeros(m, dtype=np.int64)
+        self.mean = np.zeros(m)
+        self.m2 = np.zeros(m)
+        self.min = np.full(m, np.inf)
+        self.max = np.full(m, -np.inf)
+        self.first_ts = np.full(m, np.iinfo(np.int64).max)
+        self.last_ts = np.full(m, np.iinfo(np.int64).min)
+        self.digests = [TDigest() for _ in range(m)]
+
+    def add(self, timestamps, values):
+        if len(timestamps) == 0:
+            return
+        ts_ns = np.asarray(timestamps, dtype='datetime64[ns]').view('int64')
+        present = ~np.isnan(values)
+        n_b = present.sum(axis=0)
+        self.null_count += len(values) - n_b
+
+        has = n_b > 0
+        if not has.any():
+            return
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(has, np.nansum(values, axis=0) / n_b, 0.0)
+        m2_b = np.nansum((values - mean_b) ** 2, axis=0)
+
+        # Chan et al. merge of (count, mean, M2)
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(has, self.mean + delta * n_b / n, self.mean)
+            self.m2 = np.where(has, self.m2 + m2_b + delta ** 2 * n_a * n_b / n, self.m2)
+        self.count = n
+
+        self.min = np.minimum(self.min, np.where(present, values, np.inf).min(axis=0))
+        self.max = np.maximum(self.max, np.where(present, values, -np.inf).max(axis=0))
+        ts_column = ts_ns[:, None]
+        self.first_ts = np.minimum(self.first_ts, np.where(present, ts_column, np.iinfo(np.int64).max).min(axis=0))
+        self.last_ts = np.maximum(self.last_ts, np.where(present, ts_column, np.iinfo(np.int64).min).max(axis=0))
+
+        for index in np.flatnonzero(has):
+            self.digests[index].update(values[present[:, index], index])
+
+    def results(self):
+        """One dict per metric with at least one value, ready for DatasetMetricStats(**row)."""
+        rows = []
+        for index, metric in enumerate(self.metrics):
+            count = int(self.count[index])
+            if not count:
+                continue
+            row = {
+                'metric': metric,
+                'count': count,
+                'null_count': int(self.null_count[index]),
+                'min': float(self.min[index]),
+                'max': float(self.max[index]),
+                'mean': float(self.mean[index]),
+                'std': math.sqrt(self.m2[index] / count),
+                'first_ts': np.datetime64(int(self.first_ts[index]), 'ns').astype('datetime64[us]').astype(object),
+                'last_ts': np.datetime64(int(self.last_ts[index]), 'ns').astype('datetime64[us]').astype(object),
+            }
+            for p in PERCENTILES:
+                row[f'p{p}'] = self.digests[index].quantile(p / 100)
+            rows.append(row)
+        return rows
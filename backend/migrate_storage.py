@@ -0,0 +1,76 @@
+import sys
+import numpy as np
+from app import app, db, Dataset, STORAGES, rollups, save_metric_stats
+from rollup import RollupBuilder
+from metric_stats import MetricStatsBuilder
+
+# Convert datasets stored as EAV DataPoint rows into the columnar backend.
+#
+# Usage:
+#   python migrate_storage.py                 # migrate every ready EAV dataset
+#   python migrate_storage.py 3 7             # migrate only datasets 3 and 7
+#   python migrate_storage.py --keep-eav      # keep the old DataPoint rows afterwards
+
+BATCH_SIZE = 200000
+
+def migrate_dataset(dataset, keep_eav=False):
+    eav = STORAGES['eav']
+    columnar = STORAGES['columnar']
+
+    metrics = sorted(eav.metrics(dataset.id))
+    writer = columnar.open_writer(dataset.id, metrics)
+    # Older datasets predate rollups and persisted stats: build them on the way through
+    rollup_builder = RollupBuilder(metrics)
+    stats_builder = MetricStatsBuilder(metrics)
+    rows = 0
+    try:
+        # A timestamp is never split across batches, so the wide rows match the upload
+        for timestamps, wide in eav.iter_wide(dataset.id, metrics, batch_size=BATCH_SIZE):
+            writer.append(timestamps, wide)
+            rollup_builder.add(timestamps, wide)
+            stats_builder.add(timestamps, wide)
+            rows += int(np.count_nonzero(~np.isnan(wide)))
+        writer.close()
+        rollups.save(dataset.id, rollup_builder)
+    except Exception:
+        writer.abort()
+        raise
+
+    save_metric_stats(dataset.id, stats_builder)
+    dataset.storage = columnar.name
+    db.session.commit()
+
+    if not keep_eav:
+        eav.delete(dataset.id)
+        db.session.commit()
+    return rows
+
+def migrate(dataset_ids=None, keep_eav=False):
+    print("Migrating EAV datasets to columnar storage...")
+
+    with app.app_context():
+        query = Dataset.query.filter(Dataset.status == 'ready', Dataset.storage == 'eav')
+        if dataset_ids:
+            query = query.filter(Dataset.id.in_(dataset_ids))
+        datasets = query.order_by(Dataset.id).all()
+
+        if not datasets:
+            print("No EAV datasets to migrate.")
+            return
+
+        for dataset in datasets:
+            try:
+                rows = migrate_dataset(dataset, keep_eav=keep_eav)
+                print(f"Dataset {dataset.id} ({dataset.filename}): migrated {rows} data points.")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Dataset {dataset.id} ({dataset.filename}): migration failed: {e}")
+
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    migrate(
+        dataset_ids=[int(a) for a in args if a.isdigit()],
+        keep_eav='--keep-eav' in args
+    )
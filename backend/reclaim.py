@@ -0,0 +1,113 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_
+
+# Background removal of deleted datasets.
+#
+# Deleting a dataset only marks its row (status 'deleting'); its data points
+# are removed here afterwards, in bounded steps, so a delete request returns at
+# once and other writers are never stuck behind one huge DELETE. Every process
+# runs one reclaimer thread. A dataset is claimed with a conditional UPDATE of
+# its reclaim_at column, which the claiming process keeps refreshing with its
+# progress; if that stops for lease_seconds (the process died), another
+# reclaimer takes the dataset over and starts it again.
+
+
+class Reclaimer:
+    def __init__(self, app, db, model, reclaim, delay=5, lease_seconds=60,
+                 poll_interval=30, progress_interval=1.0):
+        self.app = app
+        self.db = db
+        self.model = model
+        # Called as reclaim(dataset_id): a generator yielding the data points removed by
+        # each step, which deletes the dataset row itself once everything else is gone
+        self.reclaim = reclaim
+        # Grace period after the delete, for an ingest job still writing to the dataset
+        # to notice and stop
+        self.delay = delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='dataset-reclaimer', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """Wake the reclaimer after a delete, instead of waiting for the next poll."""
+        self._wake.set()
+
+    def _loop(self):
+        with self.app.app_context():
+            while True:
+                wait = self.poll_interval
+                try:
+                    while True:
+                        dataset_id = self._claim()
+                        if dataset_id is None:
+                            break
+                        self.run(dataset_id)
+                    if self._waiting():
+                        # Deleted too recently: look again once the grace period is over
+                        wait = min(wait, self.delay)
+                except Exception as e:
+                    print(f"Dataset reclaimer error: {e}")
+                finally:
+                    self.db.session.remove()
+                self._wake.wait(wait)
+                self._wake.clear()
+
+    def _claimable(self, now):
+        table = self.model.__table__
+        return (
+            table.c.status == 'deleting',
+            table.c.deleted_at <= now - timedelta(seconds=self.delay),
+            or_(table.c.reclaim_at.is_(None), table.c.reclaim_at < now - timedelta(seconds=self.lease_seconds)),
+        )
+
+    def _claim(self):
+        table = self.model.__table__
+        now = datetime.utcnow()
+        candidate = self.db.session.execute(
+            select(table.c.id).where(*self._claimable(now)).order_by(table.c.deleted_at).limit(1)
+        ).scalar()
+        if candidate is None:
+            return None
+        result = self.db.session.execute(
+            update(table).where(table.c.id == candidate, *self._claimable(now))
+            .values(reclaim_at=now, reclaim_done=0)
+        )
+        self.db.session.commit()
+        return candidate if result.rowcount == 1 else None
+
+    def _waiting(self):
+        table = self.model.__table__
+        return self.db.session.execute(
+            select(table.c.id).where(table.c.status == 'deleting', table.c.reclaim_at.is_(None)).limit(1)
+        ).scalar() is not None
+
+    def _progress(self, dataset_id, done):
+        table = self.model.__table__
+        self.db.session.execute(
+            update(table).where(table.c.id == dataset_id)
+            .values(reclaim_at=datetime.utcnow(), reclaim_done=done)
+        )
+        self.db.session.commit()
+
+    def run(self, dataset_id):
+        """Reclaim one claimed dataset; returns the data points removed."""
+        started_at = time.perf_counter()
+        done = 0
+        last_report = time.monotonic()
+        for removed in self.reclaim(dataset_id):
+            done += removed
+            now = time.monotonic()
+            if now - last_report >= self.progress_interval:
+                last_report = now
+                self._progress(dataset_id, done)
+        print(f"Reclaimed dataset {dataset_id}: {done} data points in {time.perf_counter() - started_at:.2f}s")
+        return done
@@ -1,6 +1,7 @@
 import os
 import shutil
-from app import app, db, Dataset, DataPoint, UPLOAD_DIR, TEMP_DIR
+from init_db import vacuum
+from app import app, db, Dataset, DataPoint, DatasetMetricStats, IngestJob, Annotation, UPLOAD_DIR, TEMP_DIR, COLUMNAR_DIR, ROLLUP_DIR
 
 def reset_data():
     print("Starting data reset...")
@@ -8,7 +9,11 @@ def reset_data():
     with app.app_context():
         # 1. Clear Database
         try:
+            # An unfiltered DELETE lets SQLite drop the table's pages wholesale
             num_points = DataPoint.query.delete()
+            DatasetMetricStats.query.delete()
+            IngestJob.query.delete()
+            Annotation.query.delete()
             num_datasets = Dataset.query.delete()
             db.session.commit()
             print(f"Database cleared: {num_datasets} datasets, {num_points} data points removed.")
@@ -16,6 +21,13 @@ def reset_data():
             print(f"Error clearing database: {e}")
             db.session.rollback()
 
+        # Shrink the file (and switch it to incremental auto-vacuum, see init_db.py)
+        try:
+            vacuum()
+            print("Database file compacted.")
+        except Exception as e:
+            print(f"Error compacting database: {e}")
+
     # 2. Clear Upload Directory
     if os.path.exists(UPLOAD_DIR):
         for filename in os.listdir(UPLOAD_DIR):
@@ -42,6 +54,17 @@ def reset_data():
                 print(f"Failed to delete {file_path}. Reason: {e}")
         print(f"Temp directory cleaned: {TEMP_DIR}")
 
+    # 4. Clear Columnar Storage and Rollup Directories
+    for data_dir in (COLUMNAR_DIR, ROLLUP_DIR):
+        if os.path.exists(data_dir):
+            for filename in os.listdir(data_dir):
+                file_path = os.path.join(data_dir, filename)
+                try:
+                    shutil.rmtree(file_path)
+                except Exception as e:
+                    print(f"Failed to delete {file_path}. Reason: {e}")
+            print(f"Directory cleaned: {data_dir}")
+
     print("Data reset complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# Multi-resolution rollup pyramid, built while a dataset is ingested.
+#
+# Every level buckets the raw points into fixed time buckets and keeps
+# min / max / sum / count per (bucket, metric). A level that would not be
+# meaningfully smaller than the raw data (e.g. 1s buckets over 1Hz data) is
+# dropped during ingest. Layout of <root>/<dataset_id>/:
+#     meta.json                      metric names and the levels that were kept
+#     <level>/bucket.npy             int64 bucket start, ns since epoch, sorted
+#     <level>/{min,max,sum}.npy      float64, shape (buckets, metrics)
+#     <level>/count.npy              int64, shape (buckets, metrics)
+
+LEVELS = [
+    ('1s', 1),
+    ('1m', 60),
+    ('1h', 3600),
+    ('1d', 86400),
+]
+
+AGGREGATES = ('min', 'max', 'sum', 'count')
+
+# A level is kept only if it has at most this fraction of the raw rows
+MAX_BUCKET_RATIO = 0.5
+# Chunks smaller than this are too small to judge a level's reduction
+MIN_ROWS_TO_JUDGE = 1000
+# Partial aggregates are merged once this many buckets have piled up
+CONSOLIDATE_ROWS = 500000
+
+
+class _LevelBuilder:
+    def __init__(self, name, seconds):
+        self.name = name
+        self.bucket_ns = seconds * 1_000_000_000
+        self.partials = []
+        self.pending_rows = 0
+        self.active = True
+
+    def add(self, ts_ns, values):
+        keys = ts_ns // self.bucket_ns
+        grouped = pd.DataFrame(values, copy=False).groupby(keys, sort=True)
+        partial = {
+            'min': grouped.min(),
+            'max': grouped.max(),
+            'sum': grouped.sum(),
+            'count': grouped.count()
+        }
+        buckets = len(partial['count'])
+        if len(ts_ns) >= MIN_ROWS_TO_JUDGE and buckets > len(ts_ns) * MAX_BUCKET_RATIO:
+            # No real reduction over the raw rows: not worth storing
+            self.active = False
+            self.partials = []
+            return
+
+        self.partials.append(partial)
+        self.pending_rows += buckets
+        if self.pending_rows > CONSOLIDATE_ROWS:
+            self.partials = [self._merged()]
+            self.pending_rows = len(self.partials[0]['count'])
+
+    def _merged(self):
+        if len(self.partials) == 1:
+            return self.partials[0]
+        # Chunks can share edge buckets (or arrive unsorted): merge partial aggregates per bucket
+        merged = {}
+        for agg in AGGREGATES:
+            grouped = pd.concat([p[agg] for p in self.partials]).groupby(level=0, sort=True)
+            merged[agg] = grouped.min() if agg == 'min' else grouped.max() if agg == 'max' else grouped.sum()
+        return merged
+
+    def save(self, path):
+        merged = self._merged()
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'bucket.npy'), merged['count'].index.to_numpy(dtype='int64') * self.bucket_ns)
+        for agg in AGGREGATES:
+            dtype = 'int64' if agg == 'count' else 'float64'
+            np.save(os.path.join(path, f'{agg}.npy'), merged[agg].to_numpy(dtype=dtype))
+
+
+class RollupBuilder:
+    """Accumulates per-chunk aggregates for every level; call save() once ingest is done."""
+
+    def __init__(self, metrics):
+        self.metrics = list(metrics)
+        self.levels = [_LevelBuilder(name, seconds) for name, seconds in LEVELS]
+
+    def add(self, timestamps, values):
+        if len(timestamps) == 0:
+            return
+        ts_ns = np.asarray(timestamps, dtype='datetime64[ns]').view('int64')
+        for level in self.levels:
+            if level.active:
+                level.add(ts_ns, values)
+
+
+def envelope(level, bucket_ts, mins, maxs):
+    """Both extremes of every bucket as points: the min at the bucket start, the max half a bucket later.
+
+    Distinct timestamps keep both when metrics are pivoted onto one timeline (wire.align).
+    """
+    half = np.timedelta64(dict(LEVELS)[level] * 1_000_000_000 // 2, 'ns')
+    timestamps = np.column_stack([bucket_ts, bucket_ts + half]).ravel()
+    return timestamps, np.column_stack([mins, maxs]).ravel()
+
+
+def whole_buckets(level, start=None, end=None):
+    """(first, stop): the span [first, stop) of the level's buckets lying wholly inside [start, end].
+
+    A bound is None where the range is open.
+    """
+    width = dict(LEVELS)[level] * 1_000_000_000
+    first = stop = None
+    if start is not None:
+        first = np.datetime64(-(-int(np.datetime64(start, 'ns').astype('int64')) // width) * width, 'ns')
+    if end is not None:
+        stop = np.datetime64((int(np.datetime64(end, 'ns').astype('int64')) + 1) // width * width, 'ns')
+    return first, stop
+
+
+class RollupStore:
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, dataset_id):
+        return os.path.join(self.root, str(dataset_id))
+
+    def _meta(self, dataset_id):
+        meta_path = os.path.join(self._dir(dataset_id), 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def save(self, dataset_id, builder):
+        path = self._dir(dataset_id)
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        kept = []
+        for level in builder.levels:
+            if level.active and level.partials:
+                level.save(os.path.join(tmp_path, level.name))
+                kept.append(level.name)
+        os.makedirs(tmp_path, exist_ok=True)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({'metrics': builder.metrics, 'levels': kept}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp_path, path)
+
+    def delete(self, dataset_id):
+        shutil.rmtree(self._dir(dataset_id), ignore_errors=True)
+
+    def _buckets(self, dataset_id, level):
+        return np.load(os.path.join(self._dir(dataset_id), level, 'bucket.npy'), mmap_mode='r')
+
+    def _range(self, buckets, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(buckets, np.datetime64(start, 'ns').astype('int64'), side='right')) - 1
+        hi = len(buckets) if end is None else int(np.searchsorted(buckets, np.datetime64(end, 'ns').astype('int64'), side='right'))
+        return max(lo, 0), hi
+
+    def choose_level(self, dataset_id, start=None, end=None, min_buckets=1):
+        """Coarsest level with at least `min_buckets` buckets in [start, end], or None for raw data."""
+        meta = self._meta(dataset_id)
+        if not meta:
+            return None
+        for level in reversed(meta['levels']):
+            lo, hi = self._range(self._buckets(dataset_id, level), start, end)
+            if hi - lo >= min_buckets:
+                return level
+        return None
+
+    def level_within(self, dataset_id, seconds):
+        """Coarsest kept level whose buckets are at most `seconds` wide, or None."""
+        meta = self._meta(dataset_id)
+        if not meta:
+            return None
+        widths = dict(LEVELS)
+        fitting = [level for level in meta['levels'] if widths[level] <= seconds]
+        return max(fitting, key=widths.get, default=None)
+
+    def read(self, dataset_id, level, metrics=None, start=None, end=None):
+        """Return {metric: (bucket_start, min, max, avg, count)} for non-empty buckets in the range."""
+        meta = self._meta(dataset_id)
+        if not meta or level not in meta['levels']:
+            return {}
+        path = os.path.join(self._dir(dataset_id), level)
+        buckets = self._buckets(dataset_id, level)
+        lo, hi = self._range(buckets, start, end)
+        arrays = {agg: np.load(os.path.join(path, f'{agg}.npy'), mmap_mode='r') for agg in AGGREGATES}
+        bucket_ts = np.asarray(buckets[lo:hi]).view('datetime64[ns]')
+
+        result = {}
+        for index, metric in enumerate(meta['metrics']):
+            if metrics and metric not in metrics:
+                continue
+            count = np.asarray(arrays['count'][lo:hi, index])
+            present = count > 0
+            if not present.any():
+                continue
+            result[metric] = (
+                bucket_ts[present],
+                np.asarray(arrays['min'][lo:hi, index])[present],
+                np.asarray(arrays['max'][lo:hi, index])[present],
+                np.asarray(arrays['sum'][lo:hi, index])[present] / count[present],
+                count[present]
+            )
+        return result
@@ -0,0 +1,156 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+
+# Dedicated SQLite connections for dataset values (the EAV DataPoint table).
+#
+# SQLite has one writer at a time. Bulk writes (ingest chunks, deletes) go
+# through a single writer connection per process, taken under a lock, so they
+# queue here instead of contending in busy_timeout with each other. Bulk reads
+# use a pool of query-only connections tuned for scans: the file is memory-mapped,
+# the page cache is larger and temp B-trees stay in memory.
+# The WAL is checkpointed from a background thread (start_checkpointer):
+# passively while ingest is running, and truncated once it has grown past a
+# limit and the database is idle, so a large ingest does not leave a huge -wal
+# file behind for every reader to search.
+
+MB = 1024 * 1024
+
+
+class SQLiteEngines:
+    def __init__(self, path, read_pool_size=8, mmap_bytes=256 * MB, cache_kib=16384,
+                 busy_timeout_ms=30000, journal_size_limit=64 * MB):
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        self.cache_kib = cache_kib
+        self.busy_timeout_ms = busy_timeout_ms
+        self.journal_size_limit = journal_size_limit
+        url = 'sqlite:///' + path
+        connect_args = {'check_same_thread': False}
+        self.writer = create_engine(url, connect_args=connect_args, pool_size=1, max_overflow=0,
+                                    pool_timeout=busy_timeout_ms / 1000)
+        self.reader = create_engine(url, connect_args=connect_args, pool_size=read_pool_size,
+                                    max_overflow=read_pool_size)
+        event.listen(self.writer, 'connect', self._writer_pragmas)
+        event.listen(self.reader, 'connect', self._reader_pragmas)
+        self._write_lock = threading.Lock()
+        self._checkpointer = None
+        # Pooled connections must not be shared with forked children (ingest pool, gunicorn)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _pragmas(self, dbapi_connection, statements):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    def _writer_pragmas(self, dbapi_connection, connection_record):
+        self._pragmas(dbapi_connection, [
+            'PRAGMA journal_mode=WAL',
+            'PRAGMA synchronous=NORMAL',
+            f'PRAGMA busy_timeout={self.busy_timeout_ms}',
+            f'PRAGMA cache_size=-{self.cache_kib}',
+            # The WAL file is cut back to this size whenever a checkpoint resets it
+            f'PRAGMA journal_size_limit={self.journal_size_limit}',
+        ])
+
+    def _reader_pragmas(self, dbapi_connection, connection_record):
+        self._pragmas(dbapi_connection, [
+            f'PRAGMA busy_timeout={self.busy_timeout_ms}',
+            f'PRAGMA mmap_size={self.mmap_bytes}',
+            f'PRAGMA cache_size=-{self.cache_kib}',
+            'PRAGMA temp_store=MEMORY',
+            'PRAGMA query_only=ON',
+        ])
+
+    def _after_fork(self):
+        self.writer.dispose(close=False)
+        self.reader.dispose(close=False)
+        self._write_lock = threading.Lock()
+        self._checkpointer = None
+
+    @contextmanager
+    def write(self):
+        """One transaction on the writer connection; other writers in this process wait for it."""
+        with self._write_lock:
+            with self.writer.begin() as conn:
+                yield conn
+
+    def read(self):
+        """A query-only connection from the read pool (use as a context manager)."""
+        return self.reader.connect()
+
+    def wal_bytes(self):
+        try:
+            return os.path.getsize(self.path + '-wal')
+        except OSError:
+            return 0
+
+    def checkpoint(self, mode='PASSIVE', busy_timeout_ms=None):
+        """Run PRAGMA wal_checkpoint(mode); returns (busy, WAL frames, checkpointed frames)."""
+        with self._write_lock:
+            with self.writer.connect() as conn:
+                if busy_timeout_ms is not None:
+                    # Waits for readers (TRUNCATE) must stay short: give up and retry later instead
+                    conn.exec_driver_sql(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+                try:
+                    row = conn.exec_driver_sql(f'PRAGMA wal_checkpoint({mode})').fetchone()
+                    conn.commit()
+                finally:
+                    if busy_timeout_ms is not None:
+                        conn.exec_driver_sql(f'PRAGMA busy_timeout={self.busy_timeout_ms}')
+        return tuple(row)
+
+    def incremental_vacuum(self, pages_per_step=1000):
+        """Return free pages to the filesystem in small steps; returns the pages freed.
+
+        Only does anything on a database with auto_vacuum=INCREMENTAL: new ones, or
+        older ones converted by `init_db.py --vacuum`. Each step holds the write
+        lock briefly, so ingest writes interleave with it.
+        """
+        freed = 0
+        while True:
+            with self._write_lock:
+                with self.writer.connect() as conn:
+                    if conn.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+                        return freed
+                    before = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+                    if not before:
+                        return freed
+                    conn.exec_driver_sql(f'PRAGMA incremental_vacuum({int(pages_per_step)})')
+                    conn.commit()
+                    after = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+            if after >= before:
+                return freed
+            freed += before - after
+
+    def start_checkpointer(self, max_wal_bytes, is_idle, interval=30):
+        """Check the WAL every interval seconds; once past max_wal_bytes, checkpoint it.
+
+        is_idle() tells whether a TRUNCATE checkpoint may run now (no ingest running);
+        otherwise only a PASSIVE one runs, which never blocks readers or writers.
+        """
+        if self._checkpointer is not None:
+            return self._checkpointer
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    size = self.wal_bytes()
+                    if size <= max_wal_bytes:
+                        continue
+                    mode = 'TRUNCATE' if is_idle() else 'PASSIVE'
+                    busy, frames, done = self.checkpoint(mode, busy_timeout_ms=1000)
+                    print(f"WAL checkpoint ({mode}) of {size // MB} MB: {done}/{frames} frames"
+                          + (", readers busy, will retry" if busy else ""))
+                except Exception as e:
+                    print(f"WAL checkpoint failed: {e}")
+
+        self._checkpointer = threading.Thread(target=run, name='wal-checkpointer', daemon=True)
+        self._checkpointer.start()
+        return self._checkpointer
@@ -0,0 +1,486 @@
+import os
+import json
+import heapq
+import shutil
+import itertools
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, text, type_coerce, String
+
+# Storage backends for dataset values.
+#
+# Every backend speaks the same array-based interface so the routes never
+# care how a dataset is laid out on disk:
+#   open_writer(dataset_id, metrics, time_column) -> writer with append(ts, values) / close() / abort()
+#   metrics(dataset_id)                           -> list of metric names
+#   read(dataset_id, metrics, start, end)         -> {metric: (timestamps, values)}, NaNs dropped, time-sorted
+#   stats(dataset_id)                             -> [{'metric', 'min', 'max', 'avg', 'count'}]
+#   iter_rows(dataset_id, metrics, start, end)    -> batches of (timestamp, metric, value) in time order
+#   iter_wide(dataset_id, metrics, start, end)    -> batches of (timestamps, values[rows, metrics]) in time order
+#   time_column(dataset_id)                       -> name of the uploaded time column, if known
+#   delete(dataset_id)
+#   reclaim(dataset_id, batch_rows)               -> delete in bounded steps, yielding data points removed per step
+# Timestamps are always datetime64[ns] arrays, values float64 arrays.
+
+EMPTY_TIMESTAMPS = np.empty(0, dtype='datetime64[ns]')
+EMPTY_VALUES = np.empty(0, dtype='float64')
+
+
+def to_datetime64(value):
+    """Convert a datetime (naive or aware, wall-clock kept) to numpy datetime64[ns]."""
+    if value is None:
+        return None
+    if getattr(value, 'tzinfo', None) is not None:
+        value = value.replace(tzinfo=None)
+    return np.datetime64(value, 'ns')
+
+
+def to_datetime(value):
+    """Convert a numpy datetime64 back to a naive datetime for SQL parameters."""
+    if value is None:
+        return None
+    return pd.Timestamp(value).to_pydatetime()
+
+
+def isoformat_timestamps(timestamps):
+    """Format a datetime64 array like datetime.isoformat() does, but in one vectorized call."""
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+    whole_seconds = not (timestamps.view('int64') % 1_000_000_000).any()
+    return np.datetime_as_string(timestamps, unit='s' if whole_seconds else 'us')
+
+
+def format_db_timestamps(timestamps):
+    """Format a datetime64 array the way SQLAlchemy stores DateTime values in SQLite."""
+    formatted = np.datetime_as_string(np.asarray(timestamps, dtype='datetime64[us]'), unit='us')
+    return np.char.replace(formatted, 'T', ' ')
+
+
+class SharedRead:
+    """A storage's read() for the length of one request.
+
+    A read of every metric of a range is kept; later reads of the same range take
+    their metrics from it instead of going back to the storage.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._all = {}
+
+    def __call__(self, dataset_id, metrics=None, start=None, end=None):
+        key = (dataset_id, start, end)
+        series = self._all.get(key)
+        if series is None:
+            series = self.storage.read(dataset_id, metrics=metrics, start=start, end=end)
+            if metrics:
+                return series
+            self._all[key] = series
+        return {metric: series[metric] for metric in (metrics or series) if metric in series}
+
+
+class EAVStorage:
+    """One DataPoint row per (timestamp, metric, value) in the main SQLite database.
+
+    Values are read through the query-only pool and written through the writer
+    connection of engines (a sqlite_engines.SQLiteEngines), not the app session.
+    """
+
+    name = 'eav'
+
+    def __init__(self, model, engines):
+        self.model = model
+        self.engines = engines
+
+    def open_writer(self, dataset_id, metrics, time_column=None):
+        return _EAVWriter(self.engines, self.model.__tablename__, dataset_id, metrics)
+
+    def _filtered(self, stmt, dataset_id, metrics=None, start=None, end=None):
+        column = self.model.__table__.c
+        stmt = stmt.where(column.dataset_id == dataset_id)
+        if metrics:
+            stmt = stmt.where(column.metric.in_(metrics))
+        if start is not None:
+            stmt = stmt.where(column.timestamp >= to_datetime(start))
+        if end is not None:
+            stmt = stmt.where(column.timestamp <= to_datetime(end))
+        return stmt
+
+    def metrics(self, dataset_id):
+        # Skip-scan over the (dataset_id, metric, ...) index: one seek per distinct
+        # metric instead of walking every row of the dataset
+        sql = text(f"""
+            WITH RECURSIVE m(metric) AS (
+                SELECT MIN(metric) FROM {self.model.__tablename__} WHERE dataset_id = :id
+                UNION ALL
+                SELECT (SELECT MIN(metric) FROM {self.model.__tablename__}
+                        WHERE dataset_id = :id AND metric > m.metric)
+                FROM m WHERE m.metric IS NOT NULL
+            )
+            SELECT metric FROM m WHERE metric IS NOT NULL
+        """)
+        with self.engines.read() as conn:
+            return [row[0] for row in conn.execute(sql, {'id': dataset_id})]
+
+    def read(self, dataset_id, metrics=None, start=None, end=None):
+        column = self.model.__table__.c
+        if not metrics:
+            # An explicit metric list lets SQLite seek the index once per metric
+            # and use the time range, instead of walking the whole dataset
+            metrics = self.metrics(dataset_id)
+        # Fetch raw timestamp strings and parse them in one NumPy call
+        stmt = self._filtered(
+            select(column.metric, type_coerce(column.timestamp, String), column.value),
+            dataset_id, metrics, start, end
+        ).order_by(column.metric, column.timestamp)
+        with self.engines.read() as conn:
+            rows = conn.execute(stmt).all()
+        if not rows:
+            return {}
+
+        frame = pd.DataFrame(rows, columns=['metric', 'timestamp', 'value'])
+        timestamps = frame['timestamp'].to_numpy(dtype=str).astype('datetime64[ns]')
+        values = frame['value'].to_numpy(dtype='float64')
+        result = {}
+        for metric, idx in frame.groupby('metric', sort=False).indices.items():
+            result[metric] = (timestamps[idx], values[idx])
+        return result
+
+    def stats(self, dataset_id):
+        column = self.model.__table__.c
+        stmt = self._filtered(select(
+            column.metric,
+            func.min(column.value).label('min'),
+            func.max(column.value).label('max'),
+            func.avg(column.value).label('avg'),
+            func.count(column.value).label('count')
+        ), dataset_id).group_by(column.metric)
+        with self.engines.read() as conn:
+            return [dict(row._mapping) for row in conn.execute(stmt)]
+
+    def iter_rows(self, dataset_id, metrics=None, start=None, end=None, batch_size=10000):
+        # One stream per metric, each already in (dataset_id, metric, timestamp) index
+        # order, merged here: ordering all of them by timestamp in one query would
+        # make SQLite sort the whole selection in a temp B-tree, in memory
+        column = self.model.__table__.c
+        if not metrics:
+            metrics = self.metrics(dataset_id)
+        with self.engines.read() as conn:
+            streams = []
+            for metric in metrics:
+                stmt = self._filtered(
+                    select(column.timestamp, column.metric, column.value),
+                    dataset_id, [metric], start, end
+                ).order_by(column.timestamp)
+                streams.append(conn.execute(stmt.execution_options(yield_per=batch_size)))
+            rows = heapq.merge(*streams, key=lambda row: row[0])
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    return
+                yield batch
+
+    def iter_wide(self, dataset_id, metrics, start=None, end=None, batch_size=10000):
+        column_index = {m: i for i, m in enumerate(metrics)}
+        carry = []
+        for batch in self.iter_rows(dataset_id, metrics, start, end, batch_size):
+            rows = carry + list(batch)
+            # Hold back the last timestamp: its other metrics may start the next batch
+            split = len(rows)
+            while split > 0 and rows[split - 1][0] == rows[-1][0]:
+                split -= 1
+            carry = rows[split:]
+            if split:
+                yield _pivot(rows[:split], column_index)
+        if carry:
+            yield _pivot(carry, column_index)
+
+    def time_column(self, dataset_id):
+        return None
+
+    def delete(self, dataset_id):
+        with self.engines.write() as conn:
+            conn.execute(self.model.__table__.delete().where(self.model.__table__.c.dataset_id == dataset_id))
+
+    def reclaim(self, dataset_id, batch_rows=20000):
+        # One short write transaction per batch, so ingests and other deletes get the
+        # write lock in between; the ids come from the (dataset_id, ...) covering index
+        table = self.model.__tablename__
+        sql = text(f"DELETE FROM {table} WHERE id IN "
+                   f"(SELECT id FROM {table} WHERE dataset_id = :id LIMIT :limit)")
+        while True:
+            with self.engines.write() as conn:
+                removed = conn.execute(sql, {'id': dataset_id, 'limit': batch_rows}).rowcount
+            if not removed:
+                return
+            yield removed
+
+    def check_query_plans(self, conn):
+        """Run EXPLAIN QUERY PLAN on the hot queries; return (name, plan) for those that scan or sort."""
+        table = self.model.__tablename__
+        ts = '2000-01-01 00:00:00.000000'
+        hot_queries = {
+            'range read': (
+                f"SELECT metric, timestamp, value FROM {table} WHERE dataset_id = ? AND metric IN (?, ?) "
+                "AND timestamp >= ? AND timestamp <= ? ORDER BY metric, timestamp",
+                (1, 'a', 'b', ts, ts)
+            ),
+            'single metric read': (
+                f"SELECT timestamp, metric, value FROM {table} WHERE dataset_id = ? AND metric IN (?) "
+                "AND timestamp >= ? AND timestamp <= ? ORDER BY timestamp",
+                (1, 'a', ts, ts)
+            ),
+            'export stream': (
+                f"SELECT timestamp, metric, value FROM {table} WHERE dataset_id = ? AND metric IN (?) "
+                "ORDER BY timestamp",
+                (1, 'a')
+            ),
+            'stats': (
+                f"SELECT metric, min(value), max(value), avg(value), count(value) FROM {table} "
+                "WHERE dataset_id = ? GROUP BY metric",
+                (1,)
+            ),
+        }
+        bad = []
+        for name, (sql, params) in hot_queries.items():
+            details = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)]
+            if any(d.startswith('SCAN') or 'TEMP B-TREE' in d for d in details):
+                bad.append((name, '; '.join(details)))
+        return bad
+
+
+def _pivot(rows, column_index):
+    """Pivot (timestamp, metric, value) rows to (unique timestamps, values[rows, metrics])."""
+    timestamps = np.array([r[0] for r in rows], dtype='datetime64[ns]')
+    cols = np.fromiter((column_index[r[1]] for r in rows), dtype=np.int64, count=len(rows))
+    vals = np.array([r[2] for r in rows], dtype='float64')
+    unique_ts, inverse = np.unique(timestamps, return_inverse=True)
+    wide = np.full((len(unique_ts), len(column_index)), np.nan)
+    wide[inverse, cols] = vals
+    return unique_ts, wide
+
+
+class _EAVWriter:
+    def __init__(self, engines, table_name, dataset_id, metrics):
+        self.engines = engines
+        self.dataset_id = dataset_id
+        self.metrics = np.asarray(metrics, dtype=object)
+        self.insert_sql = (
+            f"INSERT INTO {table_name} (dataset_id, timestamp, metric, value) VALUES (?, ?, ?, ?)"
+        )
+        self.rows_written = 0
+
+    def append(self, timestamps, values):
+        # Stack the chunk to long form in NumPy: one row per non-NaN cell
+        row_idx, col_idx = np.nonzero(~np.isnan(values))
+        if len(row_idx) == 0:
+            return 0
+
+        ts_strings = format_db_timestamps(timestamps)
+        rows = list(zip(
+            itertools.repeat(self.dataset_id),
+            ts_strings[row_idx].tolist(),
+            self.metrics[col_idx].tolist(),
+            values[row_idx, col_idx].tolist()
+        ))
+
+        # One executemany per chunk in a single transaction on the writer connection
+        with self.engines.write() as conn:
+            conn.exec_driver_sql(self.insert_sql, rows)
+        self.rows_written += len(rows)
+        return len(rows)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class ColumnarStorage:
+    """One timestamp array plus one float64 array per metric, memory-mapped from DATA_DIR.
+
+    Layout of <root>/<dataset_id>/:
+        meta.json      metric names, row count, original time column
+        timestamps.i8  int64 nanoseconds since epoch, sorted ascending
+        col_<n>.f8     float64 values of metric n, NaN where missing
+    """
+
+    name = 'columnar'
+
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, dataset_id):
+        return os.path.join(self.root, str(dataset_id))
+
+    def _meta(self, dataset_id):
+        meta_path = os.path.join(self._dir(dataset_id), 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _timestamps(self, dataset_id, meta):
+        if not meta['rows']:
+            return EMPTY_TIMESTAMPS
+        path = os.path.join(self._dir(dataset_id), 'timestamps.i8')
+        return np.memmap(path, dtype='<i8', mode='r').view('datetime64[ns]')
+
+    def _column(self, dataset_id, meta, index):
+        if not meta['rows']:
+            return EMPTY_VALUES
+        path = os.path.join(self._dir(dataset_id), f'col_{index}.f8')
+        return np.memmap(path, dtype='<f8', mode='r')
+
+    def _slice(self, timestamps, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+        return lo, max(lo, hi)
+
+    def open_writer(self, dataset_id, metrics, time_column=None):
+        return _ColumnarWriter(self._dir(dataset_id), metrics, time_column)
+
+    def metrics(self, dataset_id):
+        meta = self._meta(dataset_id)
+        return list(meta['metrics']) if meta else []
+
+    def read(self, dataset_id, metrics=None, start=None, end=None):
+        meta = self._meta(dataset_id)
+        if not meta:
+            return {}
+        timestamps = self._timestamps(dataset_id, meta)
+        lo, hi = self._slice(timestamps, start, end)
+
+        result = {}
+        for index, metric in enumerate(meta['metrics']):
+            if metrics and metric not in metrics:
+                continue
+            values = self._column(dataset_id, meta, index)[lo:hi]
+            present = ~np.isnan(values)
+            if present.any():
+                result[metric] = (np.asarray(timestamps[lo:hi][present]), np.asarray(values[present]))
+        return result
+
+    def stats(self, dataset_id):
+        meta = self._meta(dataset_id)
+        if not meta:
+            return []
+        result = []
+        for index, metric in enumerate(meta['metrics']):
+            values = self._column(dataset_id, meta, index)
+            count = int(np.count_nonzero(~np.isnan(values)))
+            if not count:
+                continue
+            result.append({
+                'metric': metric,
+                'min': float(np.nanmin(values)),
+                'max': float(np.nanmax(values)),
+                'avg': float(np.nanmean(values)),
+                'count': count
+            })
+        return result
+
+    def iter_rows(self, dataset_id, metrics=None, start=None, end=None, batch_size=10000):
+        meta = self._meta(dataset_id)
+        if not meta:
+            return
+        timestamps = self._timestamps(dataset_id, meta)
+        lo, hi = self._slice(timestamps, start, end)
+        selected = [(i, m) for i, m in enumerate(meta['metrics']) if not metrics or m in metrics]
+        names = np.asarray([m for _, m in selected], dtype=object)
+        columns = [self._column(dataset_id, meta, i) for i, _ in selected]
+        if not columns:
+            return
+
+        for offset in range(lo, hi, batch_size):
+            stop = min(offset + batch_size, hi)
+            block = np.column_stack([c[offset:stop] for c in columns])
+            row_idx, col_idx = np.nonzero(~np.isnan(block))
+            ts = timestamps[offset:stop].astype('datetime64[us]').astype(object)
+            yield list(zip(ts[row_idx], names[col_idx], block[row_idx, col_idx].tolist()))
+
+    def iter_wide(self, dataset_id, metrics, start=None, end=None, batch_size=10000):
+        meta = self._meta(dataset_id)
+        if not meta:
+            return
+        timestamps = self._timestamps(dataset_id, meta)
+        lo, hi = self._slice(timestamps, start, end)
+        index = {m: i for i, m in enumerate(meta['metrics'])}
+        columns = [self._column(dataset_id, meta, index[m]) if m in index else None for m in metrics]
+
+        for offset in range(lo, hi, batch_size):
+            stop = min(offset + batch_size, hi)
+            block = np.full((stop - offset, len(metrics)), np.nan)
+            for i, column in enumerate(columns):
+                if column is not None:
+                    block[:, i] = column[offset:stop]
+            yield np.asarray(timestamps[offset:stop]), block
+
+    def time_column(self, dataset_id):
+        meta = self._meta(dataset_id)
+        return meta.get('time_column') if meta else None
+
+    def delete(self, dataset_id):
+        shutil.rmtree(self._dir(dataset_id), ignore_errors=True)
+
+    def reclaim(self, dataset_id, batch_rows=None):
+        # The dataset is its own directory: removing it is one cheap step
+        self.delete(dataset_id)
+        yield 0
+
+
+class _ColumnarWriter:
+    def __init__(self, path, metrics, time_column=None):
+        self.path = path
+        self.metrics = list(metrics)
+        self.time_column = time_column
+        self.rows = 0
+        self.is_sorted = True
+        self.last_ts = None
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        self.ts_file = open(os.path.join(path, 'timestamps.i8'), 'wb')
+        self.col_files = [open(os.path.join(path, f'col_{i}.f8'), 'wb') for i in range(len(self.metrics))]
+
+    def append(self, timestamps, values):
+        if len(timestamps) == 0:
+            return 0
+        ts = np.asarray(timestamps, dtype='datetime64[ns]').view('int64')
+        if self.is_sorted:
+            if (self.last_ts is not None and ts[0] < self.last_ts) or (np.diff(ts) < 0).any():
+                self.is_sorted = False
+        self.last_ts = ts[-1]
+
+        self.ts_file.write(ts.astype('<i8', copy=False).tobytes())
+        for i, f in enumerate(self.col_files):
+            f.write(np.ascontiguousarray(values[:, i], dtype='<f8').tobytes())
+        self.rows += len(ts)
+        return int(np.count_nonzero(~np.isnan(values)))
+
+    def _close_files(self):
+        self.ts_file.close()
+        for f in self.col_files:
+            f.close()
+
+    def close(self):
+        self._close_files()
+        if not self.is_sorted:
+            self._sort()
+        # meta.json is written last: its presence marks the dataset as complete
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump({
+                'metrics': self.metrics,
+                'rows': self.rows,
+                'time_column': self.time_column
+            }, f)
+
+    def _sort(self):
+        ts_path = os.path.join(self.path, 'timestamps.i8')
+        order = np.argsort(np.fromfile(ts_path, dtype='<i8'), kind='stable')
+        paths = [ts_path] + [os.path.join(self.path, f'col_{i}.f8') for i in range(len(self.metrics))]
+        for path, dtype in zip(paths, ['<i8'] + ['<f8'] * len(self.metrics)):
+            np.fromfile(path, dtype=dtype)[order].tofile(path)
+
+    def abort(self):
+        self._close_files()
+        shutil.rmtree(self.path, ignore_errors=True)
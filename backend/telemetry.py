@@ -0,0 +1,216 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+# In-process instrumentation, rendered in the Prometheus text format.
+#
+# Every request is timed per route, and handlers mark their phases with
+# phase('db' / 'transform' / 'serialize'). SQL statements are timed through
+# engine events and attributed to the request that ran them (the 'sql' phase
+# overlaps the others, usually 'db'). With server_timing on, the same breakdown
+# goes out as a Server-Timing header for the browser's devtools.
+# Values are per process: every gunicorn worker answers /api/metrics with its
+# own numbers. State that lives in the database (ingest jobs) is added at scrape
+# time by collectors, so it is the same whichever worker answers.
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_labels(self.labelnames, key)} {format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        names = self.labelnames + ('le',)
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(names, key + (format_value(float(bound)),))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(names, key + ("+Inf",))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {format_value(float(series[-2]))}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {series[-1]}')
+        return lines
+
+
+def gauge_lines(name, help, samples, labelnames=()):
+    """Render a gauge computed at scrape time; samples is [(label values, value)]."""
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+    for key, value in samples:
+        lines.append(f'{name}{_labels(labelnames, key)} {format_value(value)}')
+    return lines
+
+
+class Phases:
+    """Wall time accumulated per named phase."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    @contextmanager
+    def track(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """collect() returns extra exposition lines at scrape time (see gauge_lines)."""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                lines.extend(collect())
+            except Exception as e:
+                lines.append(f'# collector {getattr(collect, "__name__", collect)} failed: {e}')
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    def __init__(self, app, engine_class, registry, server_timing=False):
+        self.server_timing = server_timing
+        self.requests = registry.register(Histogram(
+            'dataview_http_request_duration_seconds', 'Time to produce a response, by route',
+            ('method', 'route', 'status')))
+        self.phases = registry.register(Histogram(
+            'dataview_http_request_phase_seconds', 'Time spent per request phase (db, transform, serialize, sql)',
+            ('route', 'phase')))
+        self.sql = registry.register(Histogram(
+            'dataview_sql_statement_duration_seconds', 'SQL statement execution time, by statement type',
+            ('statement',)))
+        app.before_request(self._before)
+        app.after_request(self._after)
+        event.listen(engine_class, 'before_cursor_execute', self._before_sql)
+        event.listen(engine_class, 'after_cursor_execute', self._after_sql)
+
+    @staticmethod
+    def _route():
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    def _before(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_phases = Phases()
+        g.metrics_sql_count = 0
+
+    def _after(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = self._route()
+        self.requests.observe(elapsed, method=request.method, route=route, status=response.status_code)
+        phases = g.metrics_phases.seconds
+        for name, seconds in phases.items():
+            self.phases.observe(seconds, route=route, phase=name)
+        if self.server_timing:
+            entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in phases.items() if name != 'sql']
+            if 'sql' in phases:
+                entries.append(f'sql;dur={phases["sql"] * 1000:.2f};desc="{g.metrics_sql_count} statements"')
+            entries.append(f'total;dur={elapsed * 1000:.2f}')
+            response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+    def _before_sql(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_sql_started', []).append(time.perf_counter())
+
+    def _after_sql(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_sql_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        self.sql.observe(elapsed, statement=verb)
+        if has_request_context() and 'metrics_phases' in g:
+            g.metrics_phases.add('sql', elapsed)
+            g.metrics_sql_count += 1
+
+
+def phase(name):
+    """Time a block as a phase of the current request (a no-op outside of one)."""
+    if has_request_context() and 'metrics_phases' in g:
+        return g.metrics_phases.track(name)
+    return _untracked()
+
+
+@contextmanager
+def _untracked():
+    yield
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest
+
+
+def write_csv(tmp_path, times, header='timestamp,value'):
+    path = tmp_path / 'data.csv'
+    path.write_text(header + '\n' + ''.join(f'{t},{i}\n' for i, t in enumerate(times)))
+    return str(path)
+
+
+def ingest_file(path):
+    layout = ingest.read_layout(path)
+    chunks = list(ingest.iter_chunks(path, layout))
+    timestamps = np.concatenate([c[0] for c in chunks])
+    return layout, timestamps, chunks[-1][2]
+
+
+@pytest.mark.parametrize('times, expected', [
+    ([str(1704067200 + i * 60) for i in range(5000)], 'epoch_s'),
+    ([str(1704067200000 + i * 250) for i in range(5000)], 'epoch_ms'),
+    ([f'{1704067200 + i}.5' for i in range(100)], 'epoch_s'),
+    ([f'202401{d:02d}' for d in range(1, 29)], '%Y%m%d'),
+    ([f'20240101{h:02d}3000' for h in range(24)], '%Y%m%d%H%M%S'),
+    (['2024-01-01T00:00:00', '2024-01-01T00:00:01'], 'ISO8601'),
+    (['01/02/2024', '03/04/2024', '12/11/2024'], '%m/%d/%Y'),
+    (['01/02/2024', '13/04/2024', '12/11/2024'], '%d/%m/%Y'),
+    (['01-02-2024 10:00', '13-04-2024 11:30'], '%d-%m-%Y %H:%M'),
+])
+def test_detect_time_format(times, expected):
+    assert ingest.detect_time_format(pd.Series(times)) == expected
+
+
+def test_epoch_seconds_are_not_read_as_compact_dates(tmp_path):
+    path = write_csv(tmp_path, [1704067200 + i * 60 for i in range(5000)])
+    layout, timestamps, rows = ingest_file(path)
+    assert layout.time_format == 'epoch_s'
+    assert rows == len(timestamps) == 5000
+    assert timestamps[0] == np.datetime64('2024-01-01T00:00')
+    assert timestamps[-1] == np.datetime64('2024-01-01T00:00') + np.timedelta64(4999, 'm')
+
+
+def test_compact_dates_need_the_exact_width():
+    # 8 digits that are no date fall back to epoch seconds
+    assert ingest.detect_time_format(pd.Series(['99999999', '99999998'])) == 'epoch_s'
+    # Mixed widths are never compact dates
+    assert ingest.detect_time_format(pd.Series(['20240101', '202401011200'])) == 'epoch_ms'
+
+
+def test_iso_offsets_keep_the_wall_clock_time(tmp_path):
+    # Across the end of summer time: the offset changes within the file
+    times = ['2024-10-27T01:30:00+02:00'] * 150 + ['2024-10-27T02:30:00+01:00'] * 150
+    path = write_csv(tmp_path, times)
+    layout, timestamps, _ = ingest_file(path)
+    assert layout.time_format == 'ISO8601' and layout.offsets
+    assert timestamps[0] == np.datetime64('2024-10-27T01:30')
+    assert timestamps[-1] == np.datetime64('2024-10-27T02:30')
+
+
+def test_iso_offsets_converted_to_timezone(tmp_path):
+    path = write_csv(tmp_path, ['2024-01-01T12:00:00Z', '2024-01-01T12:00:00+01:00'])
+    layout = ingest.read_layout(path, timezone='Asia/Shanghai')
+    timestamps = next(ingest.iter_chunks(path, layout))[0]
+    assert list(timestamps) == [np.datetime64('2024-01-01T20:00'), np.datetime64('2024-01-01T19:00')]
+
+
+def test_day_first_dash_dates_have_no_offsets(tmp_path):
+    # One bad row takes the chunk off the fixed-width fast path
+    times = [f'{d % 28 + 1:02d}-01-2024' for d in range(200)] + ['not a date']
+    path = write_csv(tmp_path, times)
+    layout, timestamps, rows = ingest_file(path)
+    assert layout.time_format == '%d-%m-%Y' and not layout.offsets
+    assert rows == 201 and len(timestamps) == 200
+    assert timestamps[0] == np.datetime64('2024-01-01')
+
+
+@pytest.mark.parametrize('times, time_format, offsets', [
+    (['2024-01-01 10:00:00+01:00', '2024-01-01 11:00:00+01:00'], None, True),
+    (['2024-01-01T10:00Z', '2024-01-01T11:00Z'], None, True),
+    (['01-01-2024 10:00+0100', '02-01-2024 10:00+0100'], '%d-%m-%Y %H:%M%z', True),
+    (['2024-01-01', '2024-01-02'], None, False),
+    (['01-01-2024', '02-01-2024'], '%d-%m-%Y', False),
+])
+def test_offsets_detection(tmp_path, times, time_format, offsets):
+    assert ingest.read_layout(write_csv(tmp_path, times), time_format=time_format).offsets is offsets
+
+
+def test_iter_growing_reads_in_bounded_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'RANGE_BYTES', 1000)
+    path = write_csv(tmp_path, [1704067200 + i for i in range(1000)])
+    size = len(open(path, 'rb').read())
+    layout = ingest.read_layout(path)
+    chunks = list(ingest.iter_growing(path, layout, lambda: (size, True), idle_timeout=1))
+    assert len(chunks) > 10
+    assert max(len(c[0]) for c in chunks) < 1000 // 10
+    timestamps = np.concatenate([c[0] for c in chunks])
+    assert chunks[-1][2] == len(timestamps) == 1000 and chunks[-1][3] == size
+    assert (np.diff(timestamps) == np.timedelta64(1, 's')).all()
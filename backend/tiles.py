@@ -0,0 +1,71 @@
+import numpy as np
+
+# Fixed-boundary time tiles of one metric, for /api/tiles.
+#
+# Level L cuts time into buckets of LEVEL_MS[L] milliseconds, counted from the
+# epoch of the naive wall-clock timestamps (like wire.py's), and tile i of the
+# level holds buckets [i * BUCKETS, (i + 1) * BUCKETS). A tile's address says
+# exactly what it contains, so for a given dataset version it never changes and
+# can be cached anywhere; panning reuses tiles instead of asking for a new window.
+# Every non-empty bucket contributes its minimum and maximum at the bucket start
+# (a single point where they are equal), the same shape minmax /api/data draws.
+# Bucket widths from a second up are whole multiples of the rollup widths below
+# them (1s, 1m, 1h, 1d), so rollup buckets nest exactly and tiles can be built
+# from them instead of raw points.
+
+BUCKETS = 512
+
+_SECOND = 1000
+_MINUTE = 60 * _SECOND
+_HOUR = 60 * _MINUTE
+_DAY = 24 * _HOUR
+LEVEL_MS = [
+    1, 2, 5, 10, 20, 50, 100, 200, 500,
+    *(n * _SECOND for n in (1, 2, 5, 10, 15, 30)),
+    *(n * _MINUTE for n in (1, 2, 5, 10, 15, 30)),
+    *(n * _HOUR for n in (1, 2, 3, 6, 12)),
+    # A 112 day level's tiles span about 157 years: coarser ones would not fit datetime64[ns]
+    *(n * _DAY for n in (1, 2, 7, 14, 28, 56, 112)),
+]
+MAX_LEVEL = len(LEVEL_MS) - 1
+
+
+def bucket_ns(level):
+    return LEVEL_MS[level] * 1_000_000
+
+
+def tile_range(level, index):
+    """[start, end) of a tile as datetime64[ns]; raises ValueError past the datetime64[ns] range."""
+    span = bucket_ns(level) * BUCKETS
+    try:
+        return np.datetime64(index * span, 'ns'), np.datetime64((index + 1) * span, 'ns')
+    except OverflowError:
+        raise ValueError('Tile index out of range')
+
+
+def bucket_extremes(level, start, timestamps, mins, maxs=None):
+    """Reduce points (or finer buckets with their own mins / maxs) to the tile's buckets.
+
+    timestamps must be sorted and lie in [start, start + tile span). Returns
+    (timestamps, values): min then max of every non-empty bucket, at its start.
+    """
+    mins = np.asarray(mins, dtype='float64')
+    maxs = mins if maxs is None else np.asarray(maxs, dtype='float64')
+    present = ~np.isnan(mins)
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]')[present]
+    mins, maxs = mins[present], maxs[present]
+    if not len(timestamps):
+        return np.empty(0, dtype='datetime64[ns]'), np.empty(0, dtype='float64')
+
+    width = bucket_ns(level)
+    keys = (timestamps.view('int64') - start.astype('int64')) // width
+    first = np.flatnonzero(np.append(True, keys[1:] != keys[:-1]))
+    low = np.minimum.reduceat(mins, first)
+    high = np.maximum.reduceat(maxs, first)
+    starts = start + (keys[first] * width).astype('timedelta64[ns]')
+
+    # Both extremes where they differ, one point where the bucket is flat
+    both = low != high
+    repeat = np.where(both, 2, 1)
+    values = np.column_stack([low, high]).ravel()[np.column_stack([np.ones_like(both), both]).ravel()]
+    return np.repeat(starts, repeat), values
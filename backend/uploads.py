@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import errno
+import shutil
+import hashlib
+import zlib
+import threading
+
+# Resumable uploads assembled in place.
+#
+# Every upload gets <root>/<sha256 of uploadId>/ (the client-chosen id never
+# becomes a path) holding:
+#     upload.json       total size and chunk size, fixed by the first chunk
+#     data.part         the destination file, preallocated to the total size
+#     chunks/<index>    SHA-256 of the chunk, written once its bytes are on disk
+#     stream.json       only for ingest-while-uploading: dataset and final path,
+#                       a hard link to data.part that the ingest job tails
+# Chunks are written at index * chunk_size straight from the request stream,
+# hashed on the way through, so finishing an upload is a rename instead of a
+# second copy. The directory mtime records the last activity for expire().
+
+COPY_BUFFER = 1024 * 1024
+CHECKSUM_ALGORITHMS = ('sha256', 'crc32')
+
+
+def content_hash(chunk_size, chunk_digests):
+    """Hash identifying a file's content: SHA-256 of "<chunk_size>:" and its chunks' hex SHA-256s in order.
+
+    Built from the chunk markers, so a finished upload never has to be read again;
+    a client can compute the same value before sending anything.
+    """
+    return hashlib.sha256(f"{chunk_size}:{''.join(chunk_digests)}".encode('ascii')).hexdigest()
+
+
+def hash_file(path, chunk_size):
+    """content_hash() of a file already on disk, as if it were uploaded in chunks of chunk_size."""
+    digests = []
+    with open(path, 'rb') as f:
+        while True:
+            sha256 = hashlib.sha256()
+            remaining = chunk_size
+            while remaining:
+                buffer = f.read(min(COPY_BUFFER, remaining))
+                if not buffer:
+                    break
+                sha256.update(buffer)
+                remaining -= len(buffer)
+            if remaining == chunk_size:
+                break
+            digests.append(sha256.hexdigest())
+    return content_hash(chunk_size, digests)
+
+
+class UploadError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id):
+        return os.path.join(self.root, hashlib.sha256(upload_id.encode('utf-8')).hexdigest())
+
+    def _layout(self, path):
+        try:
+            with open(os.path.join(path, 'upload.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _init_layout(self, path, total_size, chunk_size):
+        os.makedirs(os.path.join(path, 'chunks'), exist_ok=True)
+        layout = {'total_size': total_size, 'chunk_size': chunk_size}
+        # Concurrent first chunks race here: link() lets exactly one layout win
+        tmp_path = os.path.join(path, f'upload.json.{os.getpid()}.{threading.get_ident()}')
+        with open(tmp_path, 'w') as f:
+            json.dump(layout, f)
+        try:
+            os.link(tmp_path, os.path.join(path, 'upload.json'))
+        except FileExistsError:
+            layout = self._layout(path)
+        finally:
+            os.remove(tmp_path)
+        if layout != {'total_size': total_size, 'chunk_size': chunk_size}:
+            raise UploadError('Upload was started with a different file size or chunk size', 409)
+        return layout
+
+    def _open_part(self, path, total_size):
+        fd = os.open(os.path.join(path, 'data.part'), os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(fd).st_size < total_size:
+            try:
+                os.posix_fallocate(fd, 0, total_size)
+            except (AttributeError, OSError):
+                # Not every platform / filesystem can reserve blocks: a sparse file will do
+                os.ftruncate(fd, total_size)
+        return fd
+
+    @staticmethod
+    def _parse_checksum(checksum):
+        if not checksum:
+            return None, None
+        algorithm, _, digest = checksum.partition(':')
+        if algorithm not in CHECKSUM_ALGORITHMS or not digest:
+            raise UploadError(f"Invalid checksum, expected one of {', '.join(a + ':<hex>' for a in CHECKSUM_ALGORITHMS)}")
+        return algorithm, digest.lower()
+
+    def write_chunk(self, upload_id, index, stream, total_size, chunk_size, checksum=None):
+        """Write one chunk at its offset and record it; returns the chunk's SHA-256."""
+        if total_size <= 0 or chunk_size <= 0:
+            raise UploadError('Invalid totalSize or chunkSize')
+        total_chunks = -(-total_size // chunk_size)
+        if not 0 <= index < total_chunks:
+            raise UploadError(f'chunkIndex must be between 0 and {total_chunks - 1}')
+        algorithm, expected_digest = self._parse_checksum(checksum)
+
+        path = self._dir(upload_id)
+        os.makedirs(path, exist_ok=True)
+        layout = self._layout(path) or self._init_layout(path, total_size, chunk_size)
+        if layout != {'total_size': total_size, 'chunk_size': chunk_size}:
+            raise UploadError('Upload was started with a different file size or chunk size', 409)
+
+        offset = index * chunk_size
+        expected_size = min(chunk_size, total_size - offset)
+        sha256 = hashlib.sha256()
+        crc = 0
+        written = 0
+        fd = self._open_part(path, total_size)
+        try:
+            while True:
+                buffer = stream.read(COPY_BUFFER)
+                if not buffer:
+                    break
+                if written + len(buffer) > expected_size:
+                    raise UploadError(f'Chunk {index} is larger than the expected {expected_size} bytes')
+                sha256.update(buffer)
+                crc = zlib.crc32(buffer, crc)
+                view = memoryview(buffer)
+                while view:
+                    n = os.pwrite(fd, view, offset + written)
+                    view = view[n:]
+                    written += n
+            if written != expected_size:
+                raise UploadError(f'Chunk {index} has {written} bytes, expected {expected_size}')
+
+            digest = sha256.hexdigest()
+            actual = digest if algorithm == 'sha256' else f'{crc:08x}'
+            if expected_digest is not None and actual != expected_digest:
+                raise UploadError(f'Checksum mismatch for chunk {index}', 422)
+            # The marker must never exist for bytes that are not on disk yet
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        marker = os.path.join(path, 'chunks', str(index))
+        with open(f'{marker}.tmp', 'w') as f:
+            f.write(digest)
+        os.replace(f'{marker}.tmp', marker)
+        os.utime(path)
+        return digest
+
+    def uploaded_chunks(self, upload_id):
+        chunk_dir = os.path.join(self._dir(upload_id), 'chunks')
+        try:
+            return sorted(int(name) for name in os.listdir(chunk_dir) if name.isdigit())
+        except FileNotFoundError:
+            return []
+
+    def available(self, upload_id):
+        """(end, complete): bytes [0, end) are covered by the contiguous run of chunks from chunk 0."""
+        layout = self._layout(self._dir(upload_id))
+        if layout is None:
+            raise UploadError('Chunks not found', 404)
+        uploaded = set(self.uploaded_chunks(upload_id))
+        contiguous = 0
+        while contiguous in uploaded:
+            contiguous += 1
+        end = min(contiguous * layout['chunk_size'], layout['total_size'])
+        return end, end == layout['total_size']
+
+    def verify_complete(self, upload_id):
+        layout = self._layout(self._dir(upload_id))
+        if layout is None:
+            raise UploadError('Chunks not found', 404)
+        total_chunks = -(-layout['total_size'] // layout['chunk_size'])
+        missing = sorted(set(range(total_chunks)) - set(self.uploaded_chunks(upload_id)))
+        if missing:
+            raise UploadError(f"Upload incomplete, missing chunks: {', '.join(map(str, missing[:10]))}"
+                              + (' ...' if len(missing) > 10 else ''))
+        return layout
+
+    def content_hash(self, upload_id):
+        """content_hash() of a complete upload, from its chunk markers."""
+        layout = self.verify_complete(upload_id)
+        chunk_dir = os.path.join(self._dir(upload_id), 'chunks')
+        digests = []
+        for index in range(-(-layout['total_size'] // layout['chunk_size'])):
+            with open(os.path.join(chunk_dir, str(index))) as f:
+                digests.append(f.read().strip())
+        return content_hash(layout['chunk_size'], digests)
+
+    def discard(self, upload_id):
+        """Drop an upload without keeping its data (e.g. a duplicate of an existing dataset)."""
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def finalize(self, upload_id, dest_path=None):
+        """Move a complete upload to dest_path (a rename on the same filesystem) and drop its temp dir.
+
+        Streamed uploads pass no dest_path: their data is already linked at its final path.
+        """
+        path = self._dir(upload_id)
+        layout = self.verify_complete(upload_id)
+        if dest_path:
+            try:
+                os.rename(os.path.join(path, 'data.part'), dest_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(os.path.join(path, 'data.part'), dest_path)
+        shutil.rmtree(path, ignore_errors=True)
+        return layout
+
+    def stream_info(self, upload_id):
+        try:
+            with open(os.path.join(self._dir(upload_id), 'stream.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def start_stream(self, upload_id, total_size, chunk_size, dest_path, dataset_id):
+        """Expose the upload at dest_path right away (hard link to data.part) so it can be ingested as it arrives."""
+        if total_size <= 0 or chunk_size <= 0:
+            raise UploadError('Invalid totalSize or chunkSize')
+        path = self._dir(upload_id)
+        os.makedirs(path, exist_ok=True)
+        layout = self._layout(path) or self._init_layout(path, total_size, chunk_size)
+        if layout != {'total_size': total_size, 'chunk_size': chunk_size}:
+            raise UploadError('Upload was started with a different file size or chunk size', 409)
+        os.close(self._open_part(path, total_size))
+        try:
+            os.link(os.path.join(path, 'data.part'), dest_path)
+        except OSError as e:
+            raise UploadError(f'Streaming ingest is unavailable for this upload: {e}', 409)
+        info = {'dataset_id': dataset_id, 'dest_path': dest_path}
+        with open(os.path.join(path, 'stream.json.tmp'), 'w') as f:
+            json.dump(info, f)
+        os.replace(os.path.join(path, 'stream.json.tmp'), os.path.join(path, 'stream.json'))
+        os.utime(path)
+        return info
+
+    def end_stream(self, upload_id):
+        """Drop a streamed upload that will not be completed, with the file linked at its final path."""
+        stream = self.stream_info(upload_id)
+        if stream:
+            try:
+                os.remove(stream['dest_path'])
+            except FileNotFoundError:
+                pass
+        self.discard(upload_id)
+
+    def expire(self, max_age):
+        """Remove uploads (including old-style chunk dirs) idle for more than max_age seconds."""
+        cutoff = time.time() - max_age
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path)
+                    removed += 1
+            except OSError as e:
+                print(f"Upload janitor: failed to remove {path}: {e}")
+        return removed
+
+    def start_janitor(self, max_age, interval=3600):
+        def run():
+            while True:
+                try:
+                    removed = self.expire(max_age)
+                    if removed:
+                        print(f"Upload janitor: removed {removed} abandoned uploads")
+                except Exception as e:
+                    print(f"Upload janitor: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name='upload-janitor', daemon=True)
+        thread.start()
+        return thread
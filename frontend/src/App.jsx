@@ -45,12 +45,31 @@ import ChartPanel from "./components/ChartPanel";
 import AnnotationTable from "./components/AnnotationTable";
 import AnnotationModal from "./components/AnnotationModal";
 import ContextMenu from "./components/ContextMenu";
+import { canHashContent, chunkChecksum, contentHash } from "./utils/checksum";
+import {
+  COLUMNS_MIME,
+  decodeColumns,
+  decodeColumnsBase64,
+  localToWallClock,
+  toSeriesData,
+  wallClockToLocal,
+} from "./utils/columns";
+import { readNdjson } from "./utils/ndjson";
+import {
+  chooseTileLevel,
+  countInRange,
+  fetchTile,
+  loadTileConfig,
+  mergeTiles,
+  tileSpan,
+} from "./utils/tiles";
 
 const { Header, Content } = Layout;
 const { Option } = Select;
 const { RangePicker } = DatePicker;
 
 const CHUNK_SIZE = 5 * 1024 * 1024; // 5MB
+const STREAM_MIN_CHUNKS = 4; // 达到该分片数才尝试边上传边解析
 
 const App = () => {
   const [datasets, setDatasets] = useState([]);
@@ -67,6 +86,10 @@ const App = () => {
   // New State for Upload
   const [uploading, setUploading] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(0);
+  // 上传阶段：hashing（计算内容哈希）或 uploading（上传分片）
+  const [uploadStage, setUploadStage] = useState("uploading");
+  // 当前数据集的后台解析任务（进度、预计剩余时间）
+  const [ingestJob, setIngestJob] = useState(null);
 
   // New State for Annotations
   const [annotations, setAnnotations] = useState([]);
@@ -109,6 +132,13 @@ const App = () => {
   const tableRef = useRef(null);
   const dragStartRef = useRef(null);
   const draggingRef = useRef(false);
+  // 当前指标所属的数据集，以及已由 /api/dashboard 加载过图表数据的视图
+  const metricDatasetRef = useRef(null);
+  const loadedViewRef = useRef(null);
+  // 图表当前的缩放窗口（本地时间毫秒数，未缩放为 null），以及缩放后加载瓦片所需的状态
+  const zoomRef = useRef(null);
+  const tileTimerRef = useRef(null);
+  const tileStateRef = useRef({});
   const [selectionRanges, setSelectionRanges] = useState([]);
 
   useEffect(() => {
@@ -180,25 +210,68 @@ const App = () => {
     return () => document.removeEventListener("click", handleClick);
   }, []);
 
-  // Fetch annotations when dataset changes
-  useEffect(() => {
-    if (currentDatasetId) {
-      fetchAnnotations(currentDatasetId);
+  // 标注按当前时间窗口加载：数据集就绪时随 /api/dashboard 一起返回，否则单独请求
+  const annotationRevisionRef = useRef(0);
+  const fetchAnnotations = async (id, range) => {
+    try {
+      const params = {};
+      if (range && range.length === 2 && range[0] && range[1]) {
+        params.start = range[0].toISOString();
+        params.end = range[1].toISOString();
+      }
+      // 按 X-Next-Cursor 翻页取完窗口内的全部标注
+      let all = [];
+      let revision = null;
+      let cursor = null;
+      do {
+        const res = await axios.get(`/api/annotations/${id}`, {
+          params: cursor ? { ...params, cursor } : params,
+        });
+        if (revision === null) revision = Number(res.headers["x-annotation-revision"] || 0);
+        all = all.concat(res.data);
+        cursor = res.headers["x-next-cursor"];
+      } while (cursor);
+      annotationRevisionRef.current = revision;
+      setAnnotations(all);
+    } catch (error) {
+      console.error("Failed to fetch annotations", error);
     }
-  }, [currentDatasetId]);
+  };
 
-  const fetchAnnotations = async (id) => {
+  // 增删改之后只拉取 revision 之后的变更并合并，不再重新加载全部标注
+  const syncAnnotations = async (id) => {
     try {
-      const res = await axios.get(`/api/annotations/${id}`);
-      setAnnotations(res.data);
+      let more = true;
+      while (more) {
+        const res = await axios.get(`/api/annotations/${id}/changes`, {
+          params: { since: annotationRevisionRef.current },
+        });
+        const { revision, annotations: changed, deleted } = res.data;
+        const removed = new Set([...deleted, ...changed.map((a) => a.id)]);
+        setAnnotations((prev) =>
+          prev
+            .filter((a) => !removed.has(a.id))
+            .concat(changed)
+            .sort((a, b) => (a.start_time < b.start_time ? -1 : a.start_time > b.start_time ? 1 : a.id - b.id))
+        );
+        annotationRevisionRef.current = revision;
+        more = res.data.more;
+      }
     } catch (error) {
-      console.error("Failed to fetch annotations", error);
+      console.error("Failed to sync annotations", error);
+      fetchAnnotations(id, dateRange);
     }
   };
 
   // Find current dataset object to check status
   const currentDataset = datasets.find((d) => d.id === currentDatasetId);
   const currentDatasetStatus = currentDataset?.status;
+  tileStateRef.current = {
+    datasetId: currentDatasetId,
+    version: currentDatasetStatus === "ready" ? currentDataset.version : null,
+    metric: selectedMetric,
+    data: chartData,
+  };
 
   // Poll for status updates if processing
   useEffect(() => {
@@ -222,14 +295,16 @@ const App = () => {
         if (datasetsSuccess === null) {
           return;
         }
-
         if (datasetsSuccess === false) {
           consecutiveErrors++;
           return;
         }
 
         consecutiveErrors = 0;
+        fetchIngestJob(currentDatasetId, controller.signal);
       }, 2000);
+    } else {
+      setIngestJob(null);
     }
     return () => {
       if (pollTimer) clearInterval(pollTimer);
@@ -237,21 +312,41 @@ const App = () => {
     };
   }, [currentDatasetId, currentDatasetStatus]);
 
-  // Fetch data when dataset or range changes
+  const fetchIngestJob = async (id, signal) => {
+    try {
+      const res = await axios.get("/api/jobs", { params: { dataset_id: id }, signal });
+      setIngestJob(Array.isArray(res.data) && res.data.length > 0 ? res.data[0] : null);
+    } catch (error) {
+      if (!axios.isCancel(error)) console.error("Failed to fetch ingest job", error);
+    }
+  };
+
+  // 数据集或时间范围变化：一次 /api/dashboard 请求取回统计、图表数据和标注
   useEffect(() => {
     if (!currentDatasetId) return;
 
     setChartData(null);
     setStats([]);
-    setSelectedMetric(null);
 
-    if (currentDatasetStatus === "ready") {
-      setLoading(true);
-      fetchStats(currentDatasetId);
+    if (currentDatasetStatus !== "ready") {
+      setSelectedMetric(null);
+      setLoading(false);
+      fetchAnnotations(currentDatasetId, dateRange);
       return;
     }
 
-    setLoading(false);
+    // 同一数据集沿用当前指标；切换数据集时由后端取第一个指标
+    const metric = metricDatasetRef.current === currentDatasetId ? selectedMetric : null;
+    if (metric) {
+      loadedViewRef.current = viewKey(currentDatasetId, dateRange, metric);
+    } else {
+      metricDatasetRef.current = null;
+      setSelectedMetric(null);
+    }
+    setLoading(true);
+    const controller = new AbortController();
+    fetchDashboard(currentDatasetId, dateRange, metric, controller.signal);
+    return () => controller.abort();
   }, [currentDatasetId, dateRange, currentDatasetStatus]);
 
   const handleDeleteDataset = async (e, id) => {
@@ -348,6 +443,13 @@ const App = () => {
     }
   };
 
+  const getChartPointBudget = () => {
+    const inst = chartRef.current?.getEchartsInstance?.();
+    const width = inst?.getWidth?.() || window.innerWidth || 0;
+    const pixels = Number.isFinite(width) && width > 0 ? Math.round(width) : 1000;
+    return Math.min(Math.max(pixels * 2, 200), 5000);
+  };
+
   const fetchData = async (id, range, metric, signal) => {
     setLoading(true);
     try {
@@ -360,9 +462,19 @@ const App = () => {
       if (metric) {
         params.metric = metric;
       }
+      // 按图表像素宽度请求点数：每个像素取区间内的最小值和最大值，保证尖峰不丢失
+      params.points = getChartPointBudget();
+      params.mode = "minmax";
 
-      const res = await axios.get(url, { params, signal });
-      setChartData(res.data);
+      // 请求二进制列格式，省去逐点 JSON 编码与解析
+      const res = await axios.get(url, {
+        params,
+        signal,
+        responseType: "arraybuffer",
+        headers: { Accept: COLUMNS_MIME },
+      });
+      zoomRef.current = null;
+      setChartData(decodeColumns(res.data));
       return true;
     } catch (error) {
       if (!axios.isCancel(error)) {
@@ -374,32 +486,77 @@ const App = () => {
     }
   };
 
-  const fetchStats = async (id, signal) => {
-    try {
-      const res = await axios.get(`/api/stats/${id}`, { signal });
-      setStats(res.data);
-      if (res.data.length > 0) {
-        const metrics = res.data.map((s) => s.metric);
-        if (!selectedMetric || !metrics.includes(selectedMetric)) {
-          setSelectedMetric(res.data[0].metric);
+  // 视图 = 数据集 + 时间范围 + 指标
+  const viewKey = (id, range, metric) =>
+    [id, ...(range || []).map((d) => d?.toISOString?.()), metric].join("|");
+
+  const fetchDashboard = async (id, range, metric, signal) => {
+    const params = new URLSearchParams({ points: getChartPointBudget(), mode: "minmax" });
+    if (range && range.length === 2 && range[0] && range[1]) {
+      params.append("start", range[0].toISOString());
+      params.append("end", range[1].toISOString());
+    }
+    if (metric) params.append("metric", metric);
+
+    // 各部分按 stats、data、annotations 的顺序逐行到达，到一部分渲染一部分
+    const handleSection = (section) => {
+      if (section.section === "stats") {
+        if (section.error) {
+          console.error("Failed to load stats", section.error);
+          return;
+        }
+        setStats(section.data);
+        const chosen = metric || section.data[0]?.metric;
+        if (!chosen) {
+          // 没有指标时不会有 data 部分，手动结束 loading
+          setLoading(false);
+          return;
+        }
+        metricDatasetRef.current = id;
+        loadedViewRef.current = viewKey(id, range, chosen);
+        setSelectedMetric(chosen);
+      } else if (section.section === "data") {
+        if (section.error) {
+          message.error("加载图表数据失败");
+        } else {
+          zoomRef.current = null;
+          setChartData(decodeColumnsBase64(section.body));
         }
-      } else {
-        // 如果没有指标，手动结束 loading，因为不会触发 fetchData
         setLoading(false);
+      } else if (section.section === "annotations") {
+        if (section.error) {
+          console.error("Failed to fetch annotations", section.error);
+        } else if (section.next_cursor) {
+          // 窗口内标注超过一页：按分页接口取全
+          fetchAnnotations(id, range);
+        } else {
+          annotationRevisionRef.current = section.revision;
+          setAnnotations(section.data);
+        }
       }
-      return true;
+    };
+
+    try {
+      const res = await fetch(`/api/dashboard/${id}?${params}`, {
+        signal,
+        headers: { Accept: COLUMNS_MIME },
+      });
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      await readNdjson(res, handleSection);
     } catch (error) {
-      if (!axios.isCancel(error)) {
-        console.error(error);
-        setLoading(false);
-      }
-      return false;
+      if (error.name === "AbortError") return;
+      console.error("Failed to load dashboard", error);
+      message.error("加载图表数据失败");
     }
+    if (!signal.aborted) setLoading(false);
   };
 
   // Effect to trigger data fetch when metric changes
   useEffect(() => {
     if (currentDatasetId && selectedMetric) {
+      // 指标属于上一个数据集，或该视图刚由 /api/dashboard 一并加载过：不再单独请求
+      if (metricDatasetRef.current !== currentDatasetId) return;
+      if (loadedViewRef.current === viewKey(currentDatasetId, dateRange, selectedMetric)) return;
       // 立即设置 loading，防止切换 metric 时出现暂无数据闪烁
       setLoading(true);
       fetchData(currentDatasetId, dateRange, selectedMetric);
@@ -413,6 +570,7 @@ const App = () => {
   const handleUpload = async ({ file, onSuccess, onError }) => {
     setUploading(true);
     setUploadProgress(0);
+    setUploadStage("uploading");
 
     const uploadId = generateUploadId(file);
     const totalChunks = Math.ceil(file.size / CHUNK_SIZE);
@@ -421,12 +579,50 @@ const App = () => {
     const MAX_CONCURRENCY = 6;
 
     try {
-      // 1. Check uploaded chunks
+      // 0. 能算 SHA-256 时先在本地算出各分片校验和与整个文件的内容哈希（显示进度），上传分片时直接复用；
+      //    否则（如纯 HTTP 部署）无法得到内容哈希，不做预读：分片校验和在上传时逐个计算，重复文件由合并时的服务端哈希识别
+      const checksums = new Array(totalChunks).fill(null);
+      let hash = null;
+      if (canHashContent()) {
+        setUploadStage("hashing");
+        for (let i = 0; i < totalChunks; i++) {
+          checksums[i] = await chunkChecksum(file.slice(i * CHUNK_SIZE, (i + 1) * CHUNK_SIZE));
+          setUploadProgress(Math.round(((i + 1) / totalChunks) * 100));
+        }
+        hash = await contentHash(CHUNK_SIZE, checksums);
+        setUploadStage("uploading");
+        setUploadProgress(0);
+      }
+
+      // 1. Check uploaded chunks（带上内容哈希：相同文件已有数据集时无需上传）
       const checkRes = await axios.get("/api/upload/check", {
-        params: { uploadId },
+        params: hash ? { uploadId, contentHash: hash } : { uploadId },
       });
       const uploadedChunks = new Set(checkRes.data.uploadedChunks);
 
+      let force = false;
+      const existing = checkRes.data.dataset;
+      if (existing) {
+        const reuse = await new Promise((resolve) => {
+          Modal.confirm({
+            title: "该文件已上传过",
+            content: `内容与数据集「${existing.filename}」相同，可直接打开，或重新上传并解析。`,
+            okText: "打开已有数据集",
+            cancelText: "重新解析",
+            onOk: () => resolve(true),
+            onCancel: () => resolve(false),
+          });
+        });
+        if (reuse) {
+          setUploading(false);
+          onSuccess(existing);
+          fetchDatasets();
+          setCurrentDatasetId(existing.id);
+          return;
+        }
+        force = true;
+      }
+
       // Update initial progress
       if (uploadedChunks.size > 0) {
         setUploadProgress(Math.round((uploadedChunks.size / totalChunks) * 100));
@@ -440,15 +636,39 @@ const App = () => {
         }
       }
 
+      // 2. 大文件尝试边上传边解析（需后端开启 STREAM_INGEST），失败则回退到合并后解析
+      if (totalChunks >= STREAM_MIN_CHUNKS) {
+        try {
+          const streamRes = await axios.post("/api/upload/stream", {
+            uploadId,
+            filename: file.name,
+            totalSize: file.size,
+            chunkSize: CHUNK_SIZE,
+            contentHash: hash,
+            force,
+          });
+          fetchDatasets();
+          setCurrentDatasetId(streamRes.data.id);
+        } catch (error) {
+          // 403 表示未开启，其余错误同样按普通上传处理
+        }
+      }
+
       // Function to upload a single chunk
       const uploadChunk = async (chunkIndex) => {
         const start = chunkIndex * CHUNK_SIZE;
         const end = Math.min(start + CHUNK_SIZE, file.size);
         const chunk = file.slice(start, end);
 
+        // 后端按 chunkIndex * chunkSize 直接写入目标文件，并用校验和确认分片完整
+        const checksum = checksums[chunkIndex] ?? (await chunkChecksum(chunk));
+
         const formData = new FormData();
         formData.append("uploadId", uploadId);
         formData.append("chunkIndex", chunkIndex);
+        formData.append("chunkSize", CHUNK_SIZE);
+        formData.append("totalSize", file.size);
+        if (checksum) formData.append("checksum", checksum);
         formData.append("file", chunk);
 
         await axios.post("/api/upload/chunk", formData, {
@@ -470,9 +690,14 @@ const App = () => {
       const mergeRes = await axios.post("/api/upload/merge", {
         uploadId,
         filename: file.name,
+        force,
       });
 
-      message.success("上传成功，后台处理中...");
+      if (mergeRes.data.duplicate) {
+        message.info("文件内容与已有数据集相同，已直接打开");
+      } else {
+        message.success("上传成功，后台处理中...");
+      }
       setUploading(false);
       onSuccess(mergeRes.data);
 
@@ -511,7 +736,7 @@ const App = () => {
       setAnnotationModalVisible(false);
       setEditingAnnotation(null);
       setCurrentBrushRange(null);
-      fetchAnnotations(currentDatasetId);
+      syncAnnotations(currentDatasetId);
     } catch (error) {
       console.error("Save annotation failed:", error);
       const errorMsg = error.response?.data?.message || error.message || "保存标注失败";
@@ -524,27 +749,22 @@ const App = () => {
     try {
       await axios.delete(`/api/annotations/${id}`);
       message.success("标注已删除");
-      fetchAnnotations(currentDatasetId);
+      syncAnnotations(currentDatasetId);
     } catch (error) {
       message.error("删除标注失败");
     }
   };
 
-  const handleDownloadRange = async (start, end) => {
+  const handleDownloadRange = (start, end) => {
     try {
-      const params = {
-        start: start,
-        end: end,
-        metric: selectedMetric,
-      };
-      const response = await axios.get(`/api/download/${currentDatasetId}`, {
-        params,
-        responseType: "blob",
-      });
+      const params = new URLSearchParams();
+      if (start) params.append("start", start);
+      if (end) params.append("end", end);
+      if (selectedMetric) params.append("metric", selectedMetric);
 
-      const url = window.URL.createObjectURL(new Blob([response.data]));
+      // 交给浏览器原生下载：服务端流式输出，避免整个文件先读入内存生成 Blob
       const link = document.createElement("a");
-      link.href = url;
+      link.href = `/api/download/${currentDatasetId}?${params.toString()}`;
       link.setAttribute("download", `data_${start}_${end}.csv`);
       document.body.appendChild(link);
       link.click();
@@ -587,42 +807,66 @@ const App = () => {
     inst.dispatchAction({ type: "dataZoom", startValue: start, endValue: end });
   };
 
-  const downsampleData = (data, threshold = 5000) => {
-    if (!data || data.length <= threshold) return data;
+  // 缩放后可见的点数不足图表宽度时，按缩放窗口加载定长瓦片补足细节，并预取左右相邻的瓦片
+  const loadVisibleTiles = async () => {
+    const inst = chartRef.current?.getEchartsInstance?.();
+    const zoom = zoomRef.current;
+    const { datasetId, version, metric, data } = tileStateRef.current;
+    if (!inst || !zoom || !data || !metric || version === null || version === undefined) return;
 
-    const step = Math.ceil(data.length / threshold);
-    const sampled = [];
-    for (let i = 0; i < data.length; i += step) {
-      sampled.push(data[i]);
-    }
-    // 确保最后一个点被包含，保证时间范围完整
-    if (sampled[sampled.length - 1] !== data[data.length - 1]) {
-      sampled.push(data[data.length - 1]);
+    const [from, to] = zoom;
+    const pixels = inst.getWidth();
+    if (countInRange(data.timestamps, from, to) >= pixels) return;
+
+    try {
+      const config = await loadTileConfig();
+      // 瓦片按墙钟时间切分
+      const wallFrom = localToWallClock(from);
+      const wallTo = localToWallClock(to);
+      const level = chooseTileLevel(config, wallTo - wallFrom, pixels);
+      const span = tileSpan(config, level);
+      const first = Math.floor(wallFrom / span);
+      const last = Math.floor(wallTo / span);
+
+      const load = (index) => fetchTile(datasetId, version, metric, level, index);
+      [first - 1, last + 1].forEach((index) => load(index).catch(() => {}));
+      const indexes = Array.from({ length: last - first + 1 }, (_, i) => first + i);
+      const tiles = await Promise.all(indexes.map(load));
+
+      // 等待期间切换了数据集、指标或重新加载了数据：丢弃结果
+      if (tileStateRef.current.data !== data || tileStateRef.current.metric !== metric) return;
+      const merged = mergeTiles(
+        data,
+        tiles,
+        wallClockToLocal(first * span),
+        wallClockToLocal((last + 1) * span)
+      );
+      tileStateRef.current.data = merged;
+      setChartData(merged);
+    } catch (error) {
+      console.error("Failed to load tiles", error);
     }
-    return sampled;
   };
 
   const chartOption = React.useMemo(() => {
-    if (!chartData || !Array.isArray(chartData)) return {};
+    if (!chartData || !chartData.series) return {};
 
     const visibleSeries = [];
-    if (selectedMetric && chartData.length > 0) {
-      // 预处理：如果数据量过大，进行前端降采样
-      const rawData = chartData;
-      const sampledData = downsampleData(rawData);
-
+    const column = chartData.series.find((s) => s.name === selectedMetric);
+    if (column && chartData.points > 0) {
+      // 后端已按像素宽度降采样，列数据直接作为 TypedArray 交给 ECharts
       visibleSeries.push({
         name: selectedMetric,
-        data: sampledData.map((d) => [d.timestamp, d.value]),
+        data: toSeriesData(chartData.timestamps, column.values),
         type: chartType,
         // 大数据量优化配置
         large: true,
         largeThreshold: 2000,
-        animation: sampledData.length < 1000, // 数据量大时关闭动画
+        animation: chartData.points < 1000, // 数据量大时关闭动画
       });
     }
 
-    const isLargeData = visibleSeries.length > 0 && visibleSeries[0].data.length > 2000;
+    const isLargeData = visibleSeries.length > 0 && chartData.points > 2000;
 
     const flatMarkAreaData = annotations.map((ann) => [
       {
@@ -680,11 +924,13 @@ const App = () => {
         boundaryGap: false,
       },
       yAxis: yAxisObj,
+      // 数据更新（如合并瓦片）时保持当前缩放窗口
       dataZoom: [
         {
           type: "slider",
-          start: 0,
-          end: 100,
+          ...(zoomRef.current
+            ? { startValue: zoomRef.current[0], endValue: zoomRef.current[1] }
+            : { start: 0, end: 100 }),
         },
         {
           type: "inside",
@@ -705,6 +951,14 @@ const App = () => {
   }, [chartData, selectedMetric, chartType, annotations, themeColor, selectionRanges, yMin, yMax]);
 
   const onChartEvents = {
+    datazoom: () => {
+      const inst = chartRef.current?.getEchartsInstance();
+      const zoom = inst?.getOption().dataZoom?.[0];
+      if (!zoom) return;
+      zoomRef.current = zoom.start <= 0 && zoom.end >= 100 ? null : [zoom.startValue, zoom.endValue];
+      clearTimeout(tileTimerRef.current);
+      if (zoomRef.current) tileTimerRef.current = setTimeout(loadVisibleTiles, 250);
+    },
     brushEnd: (params) => {
       if (annotateMode) return;
       if (params.areas && params.areas.length > 0) {
@@ -801,6 +1055,18 @@ const App = () => {
             大文件可能需要几分钟进行预处理和降采样，请耐心等待
           </div>
         )}
+        {ingestJob && ingestJob.status === "queued" && (
+          <div style={{ fontSize: 13, color: "#999", marginTop: 8 }}>排队中，等待空闲的解析进程...</div>
+        )}
+        {ingestJob && ingestJob.status === "running" && (
+          <div style={{ width: 320, marginTop: 12 }}>
+            <Progress percent={Math.round(ingestJob.progress * 100)} status="active" />
+            <div style={{ fontSize: 12, color: "#999" }}>
+              已解析 {ingestJob.rows_ingested.toLocaleString()} 行
+              {ingestJob.eta_seconds != null && `，预计剩余 ${Math.ceil(ingestJob.eta_seconds)} 秒`}
+            </div>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -845,6 +1111,7 @@ const App = () => {
           handleUpload={handleUpload}
           uploading={uploading}
           uploadProgress={uploadProgress}
+          uploadStage={uploadStage}
         />
         <Content className="p-4 max-w-[1600px] mx-auto w-full transition-all duration-300">
           {isInitLoading ? (
@@ -944,6 +1211,14 @@ const App = () => {
                       <span className="font-mono">Min: {s.min}</span>
                       <span className="font-mono">Max: {s.max}</span>
                     </div>
+                    {s.std != null && (
+                      <div className="flex justify-between mt-1 text-xs text-gray-400">
+                        <span className="font-mono">σ: {s.std.toFixed(2)}</span>
+                        {s.percentiles && (
+                          <span className="font-mono">P95: {s.percentiles.p95?.toFixed(2)}</span>
+                        )}
+                      </div>
+                    )}
                   </Card>
                 ))}
               </div>
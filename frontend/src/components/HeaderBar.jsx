@@ -43,6 +43,7 @@ export default function HeaderBar({
   handleUpload,
   uploading,
   uploadProgress,
+  uploadStage,
 }) {
   const textColor = getContrastColor(themeColor);
   const isLight = textColor === "#000000";
@@ -173,7 +174,7 @@ export default function HeaderBar({
               className="flex justify-between w-full text-[10px] font-medium opacity-80"
               style={{ color: textColor }}
             >
-              <span>上传中...</span>
+              <span>{uploadStage === "hashing" ? "计算哈希..." : "上传中..."}</span>
               <span>{uploadProgress}%</span>
             </div>
             <Progress
@@ -0,0 +1,59 @@
+// 分片校验和：优先使用 SHA-256（crypto.subtle，仅在 HTTPS / localhost 等安全上下文可用），
+// 否则退化为 CRC32。返回 "sha256:<hex>" 或 "crc32:<hex>"，由后端 /api/upload/chunk 校验。
+
+let crcTable = null;
+
+const getCrcTable = () => {
+  if (crcTable) return crcTable;
+  crcTable = new Uint32Array(256);
+  for (let n = 0; n < 256; n++) {
+    let c = n;
+    for (let k = 0; k < 8; k++) {
+      c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+    }
+    crcTable[n] = c >>> 0;
+  }
+  return crcTable;
+};
+
+const toHex = (bytes) =>
+  Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+
+export const crc32 = (bytes) => {
+  const table = getCrcTable();
+  let crc = 0xffffffff;
+  for (let i = 0; i < bytes.length; i++) {
+    crc = table[(crc ^ bytes[i]) & 0xff] ^ (crc >>> 8);
+  }
+  return (crc ^ 0xffffffff) >>> 0;
+};
+
+const getSubtle = () => (typeof window !== "undefined" ? window.crypto?.subtle : undefined);
+
+// 能否计算内容哈希（contentHash 需要 SHA-256）；纯 HTTP 部署下不可用
+export const canHashContent = () => Boolean(getSubtle());
+
+export const chunkChecksum = async (blob) => {
+  if (!blob) return null;
+  const buffer = await blob.arrayBuffer();
+  const subtle = getSubtle();
+  if (subtle) {
+    try {
+      const digest = await subtle.digest("SHA-256", buffer);
+      return `sha256:${toHex(new Uint8Array(digest))}`;
+    } catch (e) {
+      // 个别浏览器在特定上下文中拒绝 digest，改用 CRC32
+    }
+  }
+  return `crc32:${crc32(new Uint8Array(buffer)).toString(16).padStart(8, "0")}`;
+};
+
+// 文件内容哈希（与后端 uploads.content_hash 一致）：SHA-256("<分片大小>:" + 各分片 SHA-256 十六进制依次拼接)。
+// 只有全部分片都用 SHA-256 校验时才能计算，否则返回 null
+export const contentHash = async (chunkSize, checksums) => {
+  const subtle = getSubtle();
+  if (!subtle || !checksums.every((c) => c?.startsWith("sha256:"))) return null;
+  const text = `${chunkSize}:${checksums.map((c) => c.slice("sha256:".length)).join("")}`;
+  const digest = await subtle.digest("SHA-256", new TextEncoder().encode(text));
+  return toHex(new Uint8Array(digest));
+};
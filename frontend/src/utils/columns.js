@@ -0,0 +1,58 @@
+// /api/data 的二进制列格式（后端 backend/wire.py），请求头 Accept 为 COLUMNS_MIME 时返回：
+//   "DVC1" | uint32 头部长度 | JSON 头部 {points, columns} | 补齐到 8 字节 | 每列 points 个 float64
+// 第一列是时间戳（按 UTC 计算的本地墙钟毫秒数），其余为各指标，缺失值为 NaN。
+// 各列直接包装为 Float64Array，不逐点创建对象（float64 按小端序，与浏览器平台一致）。
+
+export const COLUMNS_MIME = "application/vnd.dataview.columns";
+
+// JSON 格式的时间戳不带时区，ECharts 按本地时间解析；这里做同样的换算
+export const wallClockToLocal = (ms) => {
+  const guess = ms + new Date(ms).getTimezoneOffset() * 60000;
+  return ms + new Date(guess).getTimezoneOffset() * 60000;
+};
+
+// 上面换算的逆运算：图表上的本地时间 → 后端的墙钟毫秒数
+export const localToWallClock = (ms) => ms - new Date(ms).getTimezoneOffset() * 60000;
+
+export const decodeColumns = (buffer) => {
+  const bytes = new Uint8Array(buffer);
+  if (String.fromCharCode(...bytes.subarray(0, 4)) !== "DVC1") {
+    throw new Error("Unknown data format");
+  }
+  const headerLength = new DataView(buffer).getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(bytes.subarray(8, 8 + headerLength)));
+
+  let offset = 8 + headerLength;
+  offset += (8 - (offset % 8)) % 8;
+  const columns = header.columns.map((name) => {
+    const values = new Float64Array(buffer, offset, header.points);
+    offset += header.points * 8;
+    return { name, values };
+  });
+
+  const timestamps = columns[0].values;
+  for (let i = 0; i < timestamps.length; i++) {
+    timestamps[i] = wallClockToLocal(timestamps[i]);
+  }
+  return { points: header.points, timestamps, series: columns.slice(1) };
+};
+
+// ECharts 接受 [x0, y0, x1, y1, ...] 形式的 TypedArray 作为 series.data
+export const toSeriesData = (timestamps, values) => {
+  const data = new Float64Array(timestamps.length * 2);
+  for (let i = 0; i < timestamps.length; i++) {
+    data[i * 2] = timestamps[i];
+    data[i * 2 + 1] = values[i];
+  }
+  return data;
+};
+
+// /api/dashboard 的 data 部分以 base64 传输同一二进制格式
+export const decodeColumnsBase64 = (text) => {
+  const binary = atob(text);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  return decodeColumns(bytes.buffer);
+};
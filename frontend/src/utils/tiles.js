@@ -0,0 +1,90 @@
+// /api/tiles 的定长时间瓦片（后端 backend/tiles.py）：级别 L 的桶宽为 levels[L] 毫秒，
+// 每个瓦片 buckets 个桶，从 1970 年起按固定边界切分（墙钟毫秒数）。同一数据集版本下
+// 瓦片内容不变，带 ?v= 请求时浏览器与 nginx 会长期缓存；这里再加一层会话内的内存缓存。
+import axios from "axios";
+import { COLUMNS_MIME, decodeColumns } from "./columns";
+
+const MAX_CACHED_TILES = 256;
+const tileCache = new Map();
+let tileConfig = null;
+
+export const loadTileConfig = async () => {
+  if (!tileConfig) {
+    const res = await axios.get("/api/tiles");
+    tileConfig = res.data;
+  }
+  return tileConfig;
+};
+
+// 桶宽不小于每像素时长的最细级别
+export const chooseTileLevel = (config, spanMs, pixels) => {
+  const target = spanMs / Math.max(pixels, 1);
+  const level = config.levels.findIndex((ms) => ms >= target);
+  return level < 0 ? config.levels.length - 1 : level;
+};
+
+export const tileSpan = (config, level) => config.levels[level] * config.buckets;
+
+export const fetchTile = (datasetId, version, metric, level, index) => {
+  const key = `${datasetId}|${version}|${metric}|${level}|${index}`;
+  let promise = tileCache.get(key);
+  if (promise) {
+    // 最近使用的移到末尾，超出上限时从头淘汰
+    tileCache.delete(key);
+  } else {
+    promise = axios
+      .get(`/api/tiles/${datasetId}/${encodeURIComponent(metric)}/${level}/${index}`, {
+        params: { v: version },
+        responseType: "arraybuffer",
+        headers: { Accept: COLUMNS_MIME },
+      })
+      .then((res) => decodeColumns(res.data));
+    promise.catch(() => tileCache.delete(key));
+  }
+  tileCache.set(key, promise);
+  while (tileCache.size > MAX_CACHED_TILES) {
+    tileCache.delete(tileCache.keys().next().value);
+  }
+  return promise;
+};
+
+const lowerBound = (array, value) => {
+  let lo = 0;
+  let hi = array.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (array[mid] < value) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+};
+
+// [from, to) 内的点数（timestamps 已排序）
+export const countInRange = (timestamps, from, to) =>
+  lowerBound(timestamps, to) - lowerBound(timestamps, from);
+
+// 用连续的瓦片替换单指标数据中 [from, to) 这一段（均为本地时间毫秒数）
+export const mergeTiles = (base, tiles, from, to) => {
+  const { timestamps } = base;
+  const { name, values } = base.series[0];
+  const lo = lowerBound(timestamps, from);
+  const hi = lowerBound(timestamps, to);
+  const inner = tiles.reduce((sum, tile) => sum + tile.points, 0);
+  const points = lo + inner + (timestamps.length - hi);
+
+  const mergedTimestamps = new Float64Array(points);
+  const mergedValues = new Float64Array(points);
+  mergedTimestamps.set(timestamps.subarray(0, lo));
+  mergedValues.set(values.subarray(0, lo));
+  let offset = lo;
+  for (const tile of tiles) {
+    if (tile.points > 0) {
+      mergedTimestamps.set(tile.timestamps, offset);
+      mergedValues.set(tile.series[0].values, offset);
+      offset += tile.points;
+    }
+  }
+  mergedTimestamps.set(timestamps.subarray(hi), offset);
+  mergedValues.set(values.subarray(hi), offset);
+  return { points, timestamps: mergedTimestamps, series: [{ name, values: mergedValues }] };
+};